@@ -1,12 +1,26 @@
-from flask import Flask, request, jsonify
-import requests
+from flask import Flask, request, jsonify, Response, stream_with_context
+import json
 import sys
 from node import Node
+from transport import Transport
+from storage import open_stores
+from balancer import POLICIES
+import os
+import rope
+import hashing
+import vnodes
 from helper_functions import *
 import threading
+import time
 
 
 app = Flask(__name__)
+# Appended values (rope.Rope) are answered as plain strings.
+app.json.default = rope.json_default
+# The tokens of this process (see vnodes): requests to /v/<i>/... are served by token i, the others by token 0.
+nodes = {}
+node = vnodes.Local(nodes)
+app.wsgi_app = vnodes.Dispatch(app.wsgi_app, nodes)
 
 # --- Chord DHT Operations ---
 @app.route('/shutdown', methods=['POST'])
@@ -21,7 +35,9 @@ def insert():
     value = req.get("value")
     client_ip = req.get("client_ip")
     client_port = req.get("client_port")
-    result = node.insert(key, value, client_ip, client_port)
+    hops = req.get("hops", 0)
+    direct = req.get("direct", False)
+    result = node.insert(key, value, client_ip, client_port, hops, direct, req.get("routing", "recursive"))
     return jsonify(result)
 
 @app.route('/insertReplicas', methods=['POST'])
@@ -37,20 +53,79 @@ def insertReplicas():
     result = node.insertReplicas(key, value, replication_count, join_, starting_node, client_ip, client_port)
     return jsonify(result)
 
+@app.route('/chain_write', methods=['POST'])
+def chain_write():
+    req = request.get_json()
+    result = node.chain_write(req.get("entries", []))
+    return jsonify(result)
+
+@app.route('/chain_ack', methods=['POST'])
+def chain_ack():
+    req = request.get_json()
+    result = node.chain_ack(req.get("acks", []))
+    return jsonify(result)
+
 @app.route('/query', methods=['POST'])
 def query():
     req = request.get_json()
     key = req.get("key")
     client_ip = req.get("client_ip")
     client_port = req.get("client_port")
-    result = node.query(key, client_ip, client_port)
+    hops = req.get("hops", 0)
+    direct = req.get("direct", False)
+    result = node.query(key, client_ip, client_port, hops, direct, req.get("routing", "recursive"))
     return jsonify(result)
 
+@app.route('/query_chain', methods=['POST'])
+def query_chain():
+    req = request.get_json()
+    key = req.get("key")
+    replication_count = req.get("replication_count")
+    starting_id = req.get("starting_id")
+    result = node.query_chain(key, replication_count, starting_id)
+    return jsonify(result)
+
+@app.route('/committed_version', methods=['POST'])
+def committed_version():
+    req = request.get_json()
+    key = req.get("key")
+    replication_count = req.get("replication_count")
+    starting_id = req.get("starting_id")
+    result = node.committed_version(key, replication_count, starting_id)
+    return jsonify(result)
+
+@app.route('/quorum_write', methods=['POST'])
+def quorum_write():
+    req = request.get_json()
+    result = node.quorum_write(req.get("entries", []))
+    return jsonify(result)
+
+@app.route('/quorum_read', methods=['POST'])
+def quorum_read():
+    req = request.get_json()
+    result = node.quorum_copies(req.get("keys", []))
+    return jsonify(result)
+
+@app.route('/replica', methods=['GET'])
+def replica():
+    key = request.args.get("key")
+    return jsonify(node.replica_lookup(key))
+
+@app.route('/value', methods=['GET'])
+def value():
+    # This node's copy of a key streamed as text, segment by segment.
+    segments = node.value_segments(request.args.get("key"))
+    if segments is None:
+        return jsonify({"status": "error", "message": f"Key not found at node {node.node_id}"}), 404
+    return Response(iter(segments), mimetype="text/plain")
+
 @app.route('/delete', methods=['POST'])
 def delete():
     req = request.get_json()
     key = req.get("key")
-    result = node.delete(key)
+    hops = req.get("hops", 0)
+    direct = req.get("direct", False)
+    result = node.delete(key, hops, direct, req.get("routing", "recursive"))
     return jsonify(result)
 
 @app.route('/deleteReplicas', methods=['POST'])
@@ -58,7 +133,64 @@ def deleteReplicas():
     req = request.get_json()
     key = req.get("key")
     replication_count = req.get("replication_count")
-    result = node.deleteReplicas(key, replication_count)
+    starting_node = req.get("starting_node")
+    result = node.deleteReplicas(key, replication_count, starting_node)
+    return jsonify(result)
+
+@app.route('/insert_batch', methods=['POST'])
+def insert_batch():
+    req = request.get_json()
+    items = req.get("items", [])
+    client_ip = req.get("client_ip")
+    client_port = req.get("client_port")
+    hops = req.get("hops", 0)
+    result = node.insert_batch(items, client_ip, client_port, hops)
+    return jsonify(result)
+
+@app.route('/insertReplicas_batch', methods=['POST'])
+def insertReplicas_batch():
+    req = request.get_json()
+    items = req.get("items", [])
+    replication_count = req.get("replication_count")
+    join_ = req.get("join")
+    starting_node = req.get("starting_node")
+    result = node.insert_replicas_batch(items, replication_count, join_, starting_node)
+    return jsonify(result)
+
+@app.route('/query_batch', methods=['POST'])
+def query_batch():
+    req = request.get_json()
+    keys = req.get("keys", [])
+    client_ip = req.get("client_ip")
+    client_port = req.get("client_port")
+    hops = req.get("hops", 0)
+    result = node.multi_get(keys, client_ip, client_port, hops)
+    return jsonify(result)
+
+@app.route('/query_chain_batch', methods=['POST'])
+def query_chain_batch():
+    req = request.get_json()
+    keys = req.get("keys", [])
+    replication_count = req.get("replication_count")
+    starting_id = req.get("starting_id")
+    result = node.query_chain_batch(keys, replication_count, starting_id)
+    return jsonify(result)
+
+@app.route('/delete_batch', methods=['POST'])
+def delete_batch():
+    req = request.get_json()
+    keys = req.get("keys", [])
+    hops = req.get("hops", 0)
+    result = node.delete_batch(keys, hops)
+    return jsonify(result)
+
+@app.route('/deleteReplicas_batch', methods=['POST'])
+def deleteReplicas_batch():
+    req = request.get_json()
+    keys = req.get("keys", [])
+    replication_count = req.get("replication_count")
+    starting_node = req.get("starting_node")
+    result = node.delete_replicas_batch(keys, replication_count, starting_node)
     return jsonify(result)
 
 @app.route('/join', methods=['POST'])
@@ -66,14 +198,19 @@ def join():
     req = request.get_json()
     new_ip = req.get("ip")
     new_port = req.get("port")
-    result = node.join(new_ip, new_port)
+    hops = req.get("hops", 0)
+    result = node.join(new_ip, new_port, hops, req.get("digest"), req.get("replica_digest"),
+                       req.get("routing", "recursive"), req.get("node_id"), req.get("vnode", 0))
     return jsonify(result)
-@app.route('/transfer_replicas', methods=['POST'])
-def transfer_replicas():
+
+@app.route('/find_successor', methods=['POST'])
+def find_successor():
     req = request.get_json()
-    replicas = req.get("replicas")
-    result = node.transfer_replicas(replicas)
+    key_hash = req.get("id")
+    hops = req.get("hops", 0)
+    result = node.find_successor(key_hash, hops, req.get("routing", "recursive"))
     return jsonify(result)
+
 @app.route('/generate_replicas', methods=['POST'])
 def generate_replicas():
     req = request.get_json()
@@ -97,6 +234,12 @@ def update_successor():
     return jsonify(result)
 
 
+@app.route('/invalidate_successors', methods=['POST'])
+def invalidate_successors():
+    req = request.get_json()
+    result = node.invalidate_successors(req.get("remaining", 0))
+    return jsonify(result)
+
 @app.route('/update_predecessor', methods=['POST'])
 def update_predecessor():
     req = request.get_json()
@@ -107,40 +250,85 @@ def update_predecessor():
 
 @app.route('/depart', methods=['POST'])
 def depart():
-    result = node.depart()
-    threading.Thread(target=shutdown_server).start()
+    if node.vnode:
+        # A single token leaves the ring; the process keeps serving its other tokens.
+        return jsonify(node.depart())
+    result = depart_all(nodes)
+    if result.get("status") == "success":
+        threading.Thread(target=shutdown_server).start()
     return jsonify(result)
 
-@app.route('/remove_transferred_replicas', methods=['POST'])
-def remove_transferred_replicas():
-    req = request.get_json()
-    replicas = req.get("keys")
-    result = node.remove_transferred_replicas(replicas)
+@app.route('/handoff', methods=['POST'])
+def handoff():
+    # NDJSON stream from the departing predecessor, read line by line.
+    records = (json.loads(line) for line in request.stream if line.strip())
+    result = node.handoff(records)
     return jsonify(result)
 
-@app.route('/transfer_keys', methods=['POST'])
-def transfer_keys():
+@app.route('/spill_replicas', methods=['POST'])
+def spill_replicas():
     req = request.get_json()
-    keys = req.get("keys")
-    result = node.transfer_keys(keys)
+    departed_id = req.get("departed_id")
+    spill = req.get("spill")
+    remaining = req.get("remaining")
+    source_id = req.get("source_id")
+    result = node.spill_replicas(departed_id, spill, remaining, source_id)
     return jsonify(result)
 
-@app.route('/shift_replicas', methods=['POST'])
-def shift_replicas():
+@app.route('/rebalance_replicas', methods=['POST'])
+def rebalance_replicas():
     req = request.get_json()
-    data = req.get("keys")
-    replicas = req.get("replicas")
-    starting_node = req.get("starting_node")
-    result = node.shift_replicas(data, replicas, starting_node)
+    new_node = req.get("new_node")
+    source_id = req.get("source_id")
+    remaining = req.get("remaining")
+    result = node.rebalance_replicas(new_node, source_id, remaining)
     return jsonify(result)
 
 @app.route('/overlay', methods=['GET'])
 def overlay():
-    # 'visited_ids' is expected to be a list of integers passed as query parameters.
-    visited = request.args.getlist("visited_ids", type=int)
-    result = node.overlay(visited)
+    # Answered from the local membership table; 'version' is the version the caller already holds.
+    result = node.overlay(request.args.get("version", type=int))
+    return jsonify(result)
+
+@app.route('/stabilize', methods=['POST'])
+def stabilize():
+    req = request.get_json()
+    return jsonify(node.notify(req.get("node")))
+
+
+@app.route('/ping', methods=['GET'])
+def ping():
+    return jsonify({"status": "success", "node_id": node.node_id})
+
+
+@app.route('/gossip', methods=['POST'])
+def gossip():
+    req = request.get_json()
+    result = node.gossip(req.get("version"), req.get("members"))
     return jsonify(result)
 
+@app.route('/scan', methods=['GET'])
+def scan():
+    # One page of this node's items as NDJSON; the last line carries the cursor of the next page.
+    cursor = request.args.get("cursor")
+    limit = request.args.get("limit", 1000, type=int)
+    include_replicas = request.args.get("replicas", 1, type=int) == 1
+    page, next_cursor = node.scan_local(cursor, limit, include_replicas)
+    def generate():
+        for item in page:
+            yield rope.dumps(item) + "\n"
+        yield json.dumps({"next_cursor": next_cursor, "node_id": node.node_id}) + "\n"
+    return Response(generate(), mimetype="application/x-ndjson")
+
+@app.route('/scan_ring', methods=['GET'])
+def scan_ring():
+    # Every item of the ring as NDJSON, streamed while the nodes are paged in parallel.
+    include_replicas = request.args.get("replicas", 1, type=int) == 1
+    page_size = request.args.get("page_size", 1000, type=int)
+    records = node.scan_ring(include_replicas, page_size)
+    return Response(stream_with_context(json.dumps(record) + "\n" for record in records),
+                    mimetype="application/x-ndjson")
+
 @app.route('/node_info',methods=['GET'])
 def node_info():
     return jsonify(node.get_node_info())
@@ -148,6 +336,29 @@ def node_info():
 @app.route('/set_config', methods=['POST'])
 def set_config():
     req = request.get_json()
+    return jsonify(configure_tokens(nodes, req))
+
+
+def configure_tokens(nodes, req):
+    """
+    Apply a /set_config request to every token of this process (settings are per process, so all of its
+    tokens are configured alike). Answers with the settings of the first token, or with an error naming
+    every token that could not be configured.
+    """
+    results = {}
+    for vnode, token in sorted(list(nodes.items())):
+        try:
+            results[vnode] = configure_node(token, req)
+        except Exception as e:
+            results[vnode] = {"status": "error", "message": str(e)}
+    failed = {vnode: result["message"] for vnode, result in results.items() if result.get("status") != "success"}
+    if failed:
+        return {"status": "error", "message": f"Configuration failed on {len(failed)} of {len(results)} tokens",
+                "failed": failed}
+    return results[min(results)]
+
+
+def configure_node(node, req):
     consistency = req.get("consistency")
     k_factor = req.get("k_factor")
     # Update the node's configuration; ensure that k_factor is an integer
@@ -155,28 +366,98 @@ def set_config():
         node.consistency = consistency
     if k_factor:
         node.k_factor = int(k_factor)
-    return jsonify({"status": "success", "consistency": node.consistency, "k_factor": node.k_factor})
+    if consistency or k_factor:
+        node.successors = None  # rebuilt for the new replica set
+    # Connection pool size and timeouts (seconds) of the peer transport
+    node.transport.configure(pool_size=req.get("pool_size"), timeout=req.get("timeout"),
+                             connect_timeout=req.get("connect_timeout"))
+    # Chain replication: whether writes wait for the tail's ack, and for how long
+    if req.get("chain_wait") is not None:
+        node.chain_wait = bool(req.get("chain_wait"))
+    if req.get("chain_timeout"):
+        node.chain_timeout = float(req.get("chain_timeout"))
+    # Bulk replica generation (generate_replicas): items per batch and batches in flight
+    if req.get("replication_batch_size"):
+        node.replication_batch_size = int(req.get("replication_batch_size"))
+    if req.get("replication_concurrency"):
+        node.replication_concurrency = int(req.get("replication_concurrency"))
+    # Quorum consistency: copies a write waits for (W) and copies a read asks (R), out of N = k_factor
+    if req.get("w"):
+        node.quorum_w = int(req.get("w"))
+    if req.get("r"):
+        node.quorum_r = int(req.get("r"))
+    # Failure detection: heartbeat period, silence after which a neighbour is declared failed (seconds),
+    # and the length of the successor list
+    if req.get("heartbeat_interval"):
+        node.heartbeat_interval = float(req.get("heartbeat_interval"))
+    if req.get("failure_timeout"):
+        node.failure_timeout = float(req.get("failure_timeout"))
+    if req.get("successor_list_size"):
+        node.successor_list_size = int(req.get("successor_list_size"))
+    # Eventual consistency reads: replica choice ("random", "p2c", "least_outstanding") and the latency
+    # percentile after which a read is hedged (0 turns hedging off)
+    if req.get("read_policy") in POLICIES:
+        node.read_selector.policy = req.get("read_policy")
+    if req.get("hedge_percentile") is not None:
+        node.read_selector.hedge_percentile = float(req.get("hedge_percentile")) or None
+    _, write_quorum, read_quorum = node.quorum_sizes()
+    return {"status": "success", "consistency": node.consistency, "k_factor": node.k_factor,
+            "pool_size": node.transport.pool_size, "timeout": node.transport.timeout,
+            "chain_wait": node.chain_wait, "chain_timeout": node.chain_timeout,
+            "replication_batch_size": node.replication_batch_size,
+            "replication_concurrency": node.replication_concurrency, "w": write_quorum, "r": read_quorum,
+            "heartbeat_interval": node.heartbeat_interval, "failure_timeout": node.failure_timeout,
+            "successor_list_size": node.successor_list_size, "read_policy": node.read_selector.policy,
+            "hedge_percentile": node.read_selector.hedge_percentile}
+
 
 
+def pop_option(name):
+    """
+    Remove "--name value" from sys.argv and return value (or None), so positional arguments keep their places.
+    """
+    if name not in sys.argv:
+        return None
+    index = sys.argv.index(name)
+    value = sys.argv[index + 1]
+    del sys.argv[index:index + 2]
+    return value
+
 
 def initialize_node():
+    """
+    Create this process's first token from the command line, alone in a new ring or joined through the
+    bootstrap node. Returns (node, number of tokens of the process, storage directory).
+    """
+    storage_dir = pop_option("--data-dir")
+    m_bits = pop_option("--m-bits")
+    # Tokens (virtual nodes) of this process on the ring; the first one is created here, see join_vnodes.
+    vnode_count = int(pop_option("--vnodes") or 1)
     if len(sys.argv) < 3:
-        print("Usage: python app.py <IP> <PORT> [BOOTSTRAP_IP] [BOOTSTRAP_PORT] [consistency] [kfactor]")
+        print("Usage: python app.py <IP> <PORT> [BOOTSTRAP_IP] [BOOTSTRAP_PORT] [consistency] [kfactor]"
+              " [--data-dir DIR] [--m-bits M] [--vnodes V]")
         sys.exit(1)
+    if m_bits is not None:
+        # Size of the identifier space; joining nodes adopt the bootstrap's value.
+        hashing.configure(m_bits)
 
     node_ip, node_port = sys.argv[1], int(sys.argv[2])
+    # Durable stores recover whatever this node held before a restart; without --data-dir they start empty.
+    data_store, replicas = open_stores(storage_dir)
 
     # If only IP and PORT are provided, ask for configuration interactively
     if len(sys.argv) == 3:
         while True:
             try:
-                consistency = input("Consistency (linearizability(l) or eventual(e)): ").strip().lower()
+                consistency = input("Consistency (linearizability(l), eventual(e) or quorum(q)): ").strip().lower()
                 if consistency == "l":
                     consistency = "linearizability"
                 elif consistency == "e":
                     consistency = "eventual"
+                elif consistency == "q":
+                    consistency = "quorum"
                 else:
-                    print("Invalid consistency type. Please choose 'linearizability' or 'eventual'.")
+                    print("Invalid consistency type. Please choose 'linearizability', 'eventual' or 'quorum'.")
                     continue  # prompt again
 
                 k_factor = int(input("Kfactor: "))
@@ -193,32 +474,121 @@ def initialize_node():
                 k_factor = 4
                 break
 
-        return Node(ip=node_ip, port=node_port, consistency=consistency, k_factor=k_factor)
+        return Node(ip=node_ip, port=node_port, consistency=consistency, k_factor=k_factor,
+                    data_store=data_store, replicas=replicas), vnode_count, storage_dir
 
     elif len(sys.argv) == 5:
-        bootstrap_ip, bootstrap_port = sys.argv[3], int(sys.argv[4])
-        response = requests.post(f"http://{bootstrap_ip}:{bootstrap_port}/join",
-                                 json={"ip": node_ip, "port": node_port})
-        print(response)
-        response = response.json()
-        if response.get("status") == "success":
-            successor, predecessor = response["new_successor"], response["new_predecessor"]
-            consistency = response.get("consistency")
-            k_factor = response.get("k_factor")
-            data_store = response.get("transferred_keys", {})
-            replicas = response.get("transferred_replicas", {})
-            print(f"[JOINED] Successor: {successor['node_id']}, Predecessor: {predecessor['node_id']},"
-                  f" Consistency: {consistency}, K-factor: {k_factor},"
-                  f" Data Store: {data_store}, Replicas: {replicas}")
-        else:
-            print("[JOIN FAILED]", response)
-        return Node(ip=node_ip, port=node_port, consistency=consistency, k_factor=k_factor,
-                    successor=successor, predecessor=predecessor, data_store=data_store, replicas=replicas)
+        bootstrap = {"ip": sys.argv[3], "port": int(sys.argv[4])}
+        node = join_ring(bootstrap, node_ip, node_port, data_store, replicas)
+        if node is None:
+            sys.exit(1)
+        return node, vnode_count, storage_dir
+
+
+def join_ring(bootstrap, node_ip, node_port, data_store, replicas, vnode=0, node_id=None):
+    """
+    Join the ring through the member bootstrap as token vnode of this process, at ring position node_id
+    (hash(ip:port) for the first token). Returns the new Node, or None if the join failed.
+    """
+    # The joining node drives the lookup of its successor itself (iterative routing).
+    response = Transport().iterate(bootstrap, "/join",
+                                   {"ip": node_ip, "port": node_port, "node_id": node_id, "vnode": vnode,
+                                    "digest": store_digest(data_store), "replica_digest": store_digest(replicas)})
+    print(response.get("status"), f"after {response.get('hops', 0)} hops")
+    if response.get("status") != "success":
+        print("[JOIN FAILED]", response)
+        return None
+    successor, predecessor = response["new_successor"], response["new_predecessor"]
+    consistency = response.get("consistency")
+    k_factor = response.get("k_factor")
+    if hashing.configure(response.get("m_bits", hashing.M_BITS)):
+        data_store.reindex()
+        replicas.reindex()
+    # Only the delta against what was recovered locally is sent back.
+    data_store.update(response.get("transferred_keys", {}))
+    replicas.update(response.get("transferred_replicas", {}))
+    for key in response.get("stale_keys", []):
+        data_store.pop(key, None)
+    for key in response.get("stale_replicas", []):
+        replicas.pop(key, None)
+    print(f"[JOINED] Successor: {successor['node_id']}, Predecessor: {predecessor['node_id']},"
+          f" Consistency: {consistency}, K-factor: {k_factor},"
+          f" Data Store: {data_store}, Replicas: {replicas}")
+    node = Node(ip=node_ip, port=node_port, consistency=consistency, k_factor=k_factor,
+                successor=successor, predecessor=predecessor, data_store=data_store, replicas=replicas,
+                vnode=vnode, node_id=node_id)
+    # Quorum sizes are ring-wide settings too.
+    node.quorum_w, node.quorum_r = response.get("w"), response.get("r")
+    # Start from the successor's view of the ring; gossip keeps it current.
+    node.membership.merge(response.get("membership", []))
+    return node
+
+
+def join_vnodes(nodes, vnode_count, storage_dir, start, retry_interval=2):
+    """
+    Join the other tokens of this process one by one, through its first token, once this process serves
+    requests (the ring reaches a joined token through it). Each token is placed where it shares replica chains
+    with as few tokens of this process as possible (see vnodes.choose_token), keeps its position across
+    restarts and stores its data under storage_dir/v<i>; start(node) starts its background threads.
+    """
+    first = nodes[0]
+    while True:
+        try:
+            first.transport.get(first.address(), "/ping", timeout=1).raise_for_status()
+            break
+        except Exception:
+            time.sleep(0.1)
+    for vnode in range(1, vnode_count):
+        directory = os.path.join(storage_dir, f"v{vnode}") if storage_dir else None
+        data_store, replicas = open_stores(directory)
+        while not first.departed:
+            node_id = vnodes.saved_token(directory, lambda: vnodes.choose_token(
+                first.ip, first.port, vnode, first.membership.alive(), first.k_factor))
+            token = join_ring(first.address(), first.ip, first.port, data_store, replicas, vnode, node_id)
+            if token is not None:
+                nodes[vnode] = token
+                start(token)
+                # Place the next token knowing this one (and the ring as its successor saw it), ahead of gossip.
+                first.membership.merge(token.membership.entries())
+                break
+            time.sleep(retry_interval)
+
+
+def start_node(node):
+    """
+    Start the background threads of a token.
+    """
+    # Build the finger table and keep it fresh while the ring changes.
+    threading.Thread(target=node.run_fix_fingers, daemon=True, name="fix_fingers").start()
+    # Spread the membership table.
+    threading.Thread(target=node.run_gossip, daemon=True, name="gossip").start()
+    # Watch the neighbours and close the ring around failed nodes.
+    threading.Thread(target=node.run_stabilize, daemon=True, name="stabilize").start()
+
+
+def depart_all(nodes):
+    """
+    Depart every token of this process, the first one last, stopping at a failed hand-off.
+    """
+    first = nodes[0]
+    if all(vnodes.host(member) == vnodes.host(first.address()) for member in first.membership.alive()):
+        return {"status": "error", "message": f"Node {first.node_id} is the last node of the ring"}
+    result = None
+    for vnode in sorted(nodes, reverse=True):
+        if nodes[vnode].departed:
+            continue
+        result = nodes[vnode].depart()
+        if result.get("status") != "success":
+            break
+    return result
+
 
 if __name__ == "__main__":
     # Initialize the node (with bootstrap parameters as required).
-    node = initialize_node()
-
-    threading.Thread(target=replica_handler, args=(node,), daemon=True).start()
+    nodes[0], vnode_count, storage_dir = initialize_node()
+    start_node(nodes[0])
+    if vnode_count > 1:
+        threading.Thread(target=join_vnodes, args=(nodes, vnode_count, storage_dir, start_node), daemon=True,
+                         name="join_vnodes").start()
     # Make sure every process on this port is killed before starting the server
-    app.run(host=node.ip, port=node.port)
+    app.run(host=nodes[0].ip, port=nodes[0].port)
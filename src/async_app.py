@@ -0,0 +1,530 @@
+import asyncio
+import contextlib
+import functools
+import json
+import threading
+from aiohttp import web
+import helper_functions as hf
+from helper_functions import shutdown_server
+from app import initialize_node, configure_tokens, join_vnodes, start_node, depart_all
+from async_transport import AsyncTransport
+from scan import scan_nodes_async
+import rope
+import vnodes
+
+# asyncio serving mode for a Chord node.
+#
+# Same endpoints and JSON shapes as app.py, but requests are served by an aiohttp event loop:
+# forwarding along the ring, chain replication (insertReplicas) and chain reads (query_chain) are awaited
+# instead of blocking a thread per hop, so a single node keeps thousands of requests in flight.
+# Rare control-plane operations (join hand-over, depart, transfers) still run the synchronous
+# Node methods, in worker threads.
+#
+# Usage: python async_app.py <IP> <PORT> [BOOTSTRAP_IP] [BOOTSTRAP_PORT] [--vnodes V]
+
+routes = web.RouteTableDef()
+# The tokens of this process (see vnodes): requests to /v/<i>/... are served by token i, the others by token 0.
+nodes = {}
+node = vnodes.Local(nodes)
+peers = None
+# Appended values (rope.Rope) are answered as plain strings.
+json_response = functools.partial(web.json_response, dumps=rope.dumps)
+
+
+@contextlib.asynccontextmanager
+async def write_guard():
+    """
+    Hold the node's write gate (see Node.write_guard). While a hand-off is in progress the wait
+    happens in a worker thread so the event loop keeps serving.
+    """
+    if not node.try_enter_write():
+        await asyncio.to_thread(node.enter_write)
+    try:
+        yield
+    finally:
+        node.exit_write()
+
+
+def replica_write(handler):
+    """
+    Run a replica-chain handler inside the write gate; once the node has departed, relay the request
+    unchanged to the successor.
+    """
+    @functools.wraps(handler)
+    async def wrapper(request):
+        async with write_guard():
+            if node.departed:
+                return json_response(await peers.post(node.successor, vnodes.split_path(request.path)[1],
+                                                      await request.json()))
+            return await handler(request)
+    return wrapper
+
+
+async def forward(key_hash, endpoint, payload):
+    """
+    Await the next hop towards key_hash (closest preceding finger), falling back to the successor.
+    """
+    hop = node.next_hop(key_hash)
+    payload = dict(payload, hops=int(payload.get("hops", 0)) + 1)
+    try:
+        return await peers.post(hop, endpoint, payload)
+    except Exception as e:
+        if hop["node_id"] == node.successor["node_id"]:
+            raise
+        print(f"[ROUTE] Finger {hop['node_id']} unreachable ({e}), falling back to successor")
+        return await peers.post(node.successor, endpoint, payload)
+
+
+async def replicate(successor, payload):
+    """
+    Awaitable counterpart of Node.forward_replicate.
+    """
+    try:
+        await peers.post(successor, "/insertReplicas", payload)
+    except Exception as e:
+        print(f"[ERROR] Forward replication failed at node {node.node_id}: {e}")
+
+
+async def forward_delete_replicas(following, payload):
+    """
+    Awaitable counterpart of Node.forward_delete_replicas.
+    """
+    try:
+        await peers.post(following, "/deleteReplicas", payload)
+    except Exception as e:
+        print(f"[ERROR] Forward delete replication failed at node {node.node_id}: {e}")
+
+
+async def await_acks(message, acks):
+    """
+    Awaitable counterpart of Node.await_acks: wait for the chain tail's acks (or the write quorum) without
+    holding a thread.
+    """
+    if not acks or not node.chain_wait:
+        return message
+    waiting = {asyncio.wrap_future(ack): ack for ack in acks}
+    done, missing = await asyncio.wait(waiting, timeout=node.chain_timeout)
+    if missing:
+        # Like Node.await_acks: only the acks still outstanding are forgotten.
+        node.chain_acks.forget([waiting[ack] for ack in missing])
+        return dict(message, status="pending",
+                    message=f"{len(missing)} writes not acknowledged by the chain tail within {node.chain_timeout}s")
+    failed = [ack for ack in done if ack.result() is False]
+    if failed:
+        return dict(message, status="error", message=f"Write quorum not reached for {len(failed)} writes")
+    return message
+
+
+async def quorum_peers():
+    """
+    Node.quorum_peers, rebuilding a missing successor list in a worker thread.
+    """
+    if node.successors is None and node.k_factor > 1:
+        await asyncio.to_thread(node.refresh_successors)
+    return node.quorum_peers()
+
+
+async def quorum_read(keys):
+    """
+    Awaitable counterpart of Node.quorum_read.
+    """
+    _, _, read_quorum = node.quorum_sizes()
+    replicas = await quorum_peers()
+    needed = min(read_quorum, len(replicas) + 1) - 1
+    answers = [(None, node.quorum_copies(keys)["copies"])]
+
+    async def fetch(position):
+        try:
+            return position, (await peers.post(replicas[position], "/quorum_read", {"keys": keys}))["copies"]
+        except Exception as e:
+            print(f"[ERROR] Quorum read from node {replicas[position]['node_id']} failed at node {node.node_id}: {e}")
+            return position, None
+
+    pending = {asyncio.create_task(fetch(position)) for position in range(needed)}
+    spares = iter(range(needed, len(replicas)))
+    while pending:
+        done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            position, copies = task.result()
+            if copies is not None:
+                answers.append((position, copies))
+                continue
+            position = next(spares, None)
+            if position is not None:
+                pending.add(asyncio.create_task(fetch(position)))
+    return node.quorum_replies(keys, answers, needed + 1, replicas)
+
+
+# --- Chord DHT Operations ---
+@routes.post('/insert')
+async def insert(request):
+    req = await request.json()
+    key = req.get("key")
+    value = req.get("value")
+    client_ip = req.get("client_ip")
+    client_port = req.get("client_port")
+    hops = req.get("hops", 0)
+    key_hash = hf.hash_function(key)
+    acks = None
+    if node.consistency == "quorum":
+        await quorum_peers()
+    async with write_guard():
+        if node.is_responsible(key_hash):
+            # Same write path as the synchronous server; only the wait for acks is awaited here.
+            result, acks = node.apply_insert(key, value, client_ip, client_port, hops)
+    if acks is not None:
+        return json_response(await await_acks(result, acks))
+    result = node.unrouted_reply(key, key_hash, hops, req.get("direct"), req.get("routing"))
+    if result is None:
+        result = await forward(key_hash, "/insert", {"key": key, "value": value, "client_ip": client_ip,
+                                                     "client_port": client_port, "hops": hops})
+    return json_response(result)
+
+
+@routes.post('/insertReplicas')
+@replica_write
+async def insertReplicas(request):
+    req = await request.json()
+    wrapped, forward_request = node.replica_step(req.get("key"), req.get("value"), req.get("replication_count"),
+                                                 req.get("join"), req.get("starting_node"), req.get("client_ip"),
+                                                 req.get("client_port"))
+    if forward_request is not None:
+        await replicate(*forward_request)
+    return json_response(wrapped)
+
+
+@routes.post('/query')
+async def query(request):
+    req = await request.json()
+    key = req.get("key")
+    client_ip = req.get("client_ip")
+    client_port = req.get("client_port")
+    hops = req.get("hops", 0)
+    if key == "*":
+        result = await asyncio.to_thread(node.query_all_nodes)
+    else:
+        # Same plan as Node.query; reads of other nodes are awaited (or run in a worker thread) here.
+        key_hash = hf.hash_function(key)
+        routed = not req.get("direct") and req.get("routing") != "iterative"
+        action, result = node.plan_query(key, key_hash, routed)
+        if action == "replicas":
+            result = await asyncio.to_thread(node.replica_read, key, key_hash)
+            action = "forward" if result is None else "reply"
+        if action == "forward":
+            result = node.unrouted_reply(key, key_hash, hops, req.get("direct"), req.get("routing"))
+            if result is None:
+                result = await forward(key_hash, "/query", {"key": key, "client_ip": client_ip,
+                                                            "client_port": client_port, "hops": hops})
+        else:
+            if action == "chain":
+                result = await check_version(key, node.k_factor, node.node_id)
+            elif action == "quorum":
+                result = (await quorum_read([key]))[key]
+            node.notify_client(client_ip, client_port, result)
+    result.setdefault("hops", hops)
+    return json_response(result)
+
+
+@routes.post('/query_chain')
+async def query_chain(request):
+    req = await request.json()
+    key = req.get("key")
+    replication_count = req.get("replication_count")
+    starting_id = req.get("starting_id")
+    action, result = node.chain_read_step(key, replication_count, starting_id)
+    if action == "next":
+        result = await peers.post(result, "/query_chain", {"key": key, "replication_count": replication_count - 1,
+                                                           "starting_id": starting_id})
+    elif action == "check":
+        result = await check_version(key, result, starting_id)
+    return json_response(result)
+
+
+async def check_version(key, replication_count, starting_id):
+    """
+    Awaitable counterpart of Node.check_version (CRAQ read of a dirty key).
+    """
+    check = await peers.post(node.chain_successor(starting_id) or node.successor, "/committed_version", {
+        "key": key, "replication_count": replication_count - 1, "starting_id": starting_id})
+    reply = node.versioned_reply(key, check)
+    if reply is None:
+        reply = node.tail_reply(key, await peers.get(check["node"], "/replica", {"key": key}))
+    return reply
+
+
+@routes.post('/committed_version')
+async def committed_version(request):
+    req = await request.json()
+    key = req.get("key")
+    replication_count = req.get("replication_count")
+    starting_id = req.get("starting_id")
+    action, result = node.committed_version_step(key, replication_count, starting_id)
+    if action == "next":
+        result = await peers.post(result, "/committed_version", {
+            "key": key, "replication_count": replication_count - 1, "starting_id": starting_id})
+    return json_response(result)
+
+
+@routes.post('/chain_ack')
+async def chain_ack(request):
+    req = await request.json()
+    return json_response(node.chain_ack(req.get("acks", [])))
+
+
+@routes.post('/quorum_read')
+async def quorum_read_copies(request):
+    req = await request.json()
+    return json_response(node.quorum_copies(req.get("keys", [])))
+
+
+@routes.get('/replica')
+async def replica(request):
+    return json_response(node.replica_lookup(request.query.get("key")))
+
+
+@routes.get('/value')
+async def value(request):
+    segments = node.value_segments(request.query.get("key"))
+    if segments is None:
+        return json_response({"status": "error", "message": f"Key not found at node {node.node_id}"}, status=404)
+    response = web.StreamResponse(headers={"Content-Type": "text/plain"})
+    await response.prepare(request)
+    for segment in segments:
+        await response.write(segment.encode())
+    await response.write_eof()
+    return response
+
+
+@routes.post('/delete')
+async def delete(request):
+    req = await request.json()
+    key = req.get("key")
+    hops = req.get("hops", 0)
+    key_hash = hf.hash_function(key)
+    acks = None
+    if node.consistency == "quorum":
+        await quorum_peers()
+    async with write_guard():
+        if node.is_responsible(key_hash):
+            # Same delete path as the synchronous server; only the wait for acks is awaited here.
+            result, acks = node.apply_delete(key, hops)
+    if acks is not None:
+        return json_response(await await_acks(result, acks))
+    result = node.unrouted_reply(key, key_hash, hops, req.get("direct"), req.get("routing"))
+    if result is None:
+        result = await forward(key_hash, "/delete", {"key": key, "hops": hops})
+    return json_response(result)
+
+
+@routes.post('/deleteReplicas')
+@replica_write
+async def deleteReplicas(request):
+    req = await request.json()
+    result, forward_request = node.delete_replica_step(req.get("key"), req.get("replication_count"),
+                                                       req.get("starting_node"))
+    if forward_request is not None:
+        await forward_delete_replicas(*forward_request)
+    return json_response(result)
+
+
+@routes.post('/join')
+async def join(request):
+    req = await request.json()
+    new_ip = req.get("ip")
+    new_port = req.get("port")
+    hops = req.get("hops", 0)
+    digest, replica_digest = req.get("digest"), req.get("replica_digest")
+    # A later token of a process joins at the ring position it was given (see vnodes.choose_token).
+    token_id, vnode = req.get("node_id"), req.get("vnode", 0)
+    new_node_id = hf.hash_function(f"{new_ip}:{new_port}") if token_id is None else int(token_id)
+    if hf.in_interval(new_node_id, node.predecessor["node_id"], node.node_id):
+        # The hand-over itself talks to the old predecessor and the replica chain synchronously.
+        return json_response(await asyncio.to_thread(node.join, new_ip, new_port, hops, digest, replica_digest,
+                                                     "recursive", token_id, vnode))
+    if req.get("routing") == "iterative":
+        return json_response(node.next_hop_reply(new_node_id, hops))
+    return json_response(await forward(new_node_id, "/join", {"ip": new_ip, "port": new_port, "hops": hops,
+                                                                  "digest": digest,
+                                                                  "replica_digest": replica_digest,
+                                                                  "node_id": token_id, "vnode": vnode}))
+
+
+@routes.post('/find_successor')
+async def find_successor(request):
+    req = await request.json()
+    key_hash = req.get("id")
+    hops = req.get("hops", 0)
+    if node.is_responsible(key_hash) or hf.in_interval(key_hash, node.node_id, node.successor["node_id"]):
+        return json_response(node.find_successor(key_hash, hops))
+    if req.get("routing") == "iterative":
+        return json_response(node.next_hop_reply(key_hash, hops))
+    return json_response(await forward(key_hash, "/find_successor", {"id": key_hash, "hops": hops}))
+
+
+def threaded(method, *fields, **defaults):
+    """
+    Build a handler that runs a synchronous Node method in a worker thread,
+    passing the given JSON body fields (or their defaults) as positional arguments.
+    """
+    async def handler(request):
+        req = await request.json()
+        args = (req.get(field, defaults.get(field)) for field in fields)
+        result = await asyncio.to_thread(getattr(node, method), *args)
+        return json_response(result)
+    return handler
+
+
+@routes.post('/set_config')
+async def set_config(request):
+    req = await request.json()
+    result = configure_tokens(nodes, req)
+    peers.pool_size = node.transport.pool_size
+    peers.timeout = node.transport.timeout
+    peers.connect_timeout = node.transport.connect_timeout
+    return json_response(result)
+
+
+@routes.post('/shutdown')
+async def shutdown(request):
+    threading.Thread(target=shutdown_server).start()
+    return json_response({"status": "success"})
+
+
+@routes.post('/depart')
+async def depart(request):
+    if node.vnode:
+        # A single token leaves the ring; the process keeps serving its other tokens.
+        return json_response(await asyncio.to_thread(node.depart))
+    result = await asyncio.to_thread(depart_all, nodes)
+    if result.get("status") == "success":
+        threading.Thread(target=shutdown_server).start()
+    return json_response(result)
+
+
+@routes.post('/handoff')
+async def handoff(request):
+    # NDJSON stream from the departing predecessor: staged here, applied in one step by the node.
+    records = []
+    async for line in request.content:
+        if line.strip():
+            records.append(json.loads(line))
+    return json_response(await asyncio.to_thread(node.handoff, records))
+
+
+@routes.get('/overlay')
+async def overlay(request):
+    return json_response(node.overlay(request.query.get("version")))
+
+
+@routes.post('/gossip')
+async def gossip(request):
+    req = await request.json()
+    return json_response(node.gossip(req.get("version"), req.get("members")))
+
+
+@routes.get('/ping')
+async def ping(request):
+    return json_response({"status": "success", "node_id": node.node_id})
+
+
+@routes.get('/scan')
+async def scan(request):
+    cursor = request.query.get("cursor")
+    limit = int(request.query.get("limit", 1000))
+    include_replicas = request.query.get("replicas", "1") == "1"
+    page, next_cursor = node.scan_local(cursor, limit, include_replicas)
+    response = web.StreamResponse(headers={"Content-Type": "application/x-ndjson"})
+    await response.prepare(request)
+    for item in page:
+        await response.write((rope.dumps(item) + "\n").encode())
+    await response.write((json.dumps({"next_cursor": next_cursor, "node_id": node.node_id}) + "\n").encode())
+    await response.write_eof()
+    return response
+
+
+@routes.get('/scan_ring')
+async def scan_ring(request):
+    include_replicas = request.query.get("replicas", "1") == "1"
+    page_size = int(request.query.get("page_size", 1000))
+    members = node.overlay()["overlay"]
+    response = web.StreamResponse(headers={"Content-Type": "application/x-ndjson"})
+    await response.prepare(request)
+    records = scan_nodes_async(peers, members, include_replicas, page_size)
+    try:
+        async for record in records:
+            await response.write((json.dumps(record) + "\n").encode())
+    finally:
+        # Also when the client went away: stop paging the nodes.
+        await records.aclose()
+    await response.write_eof()
+    return response
+
+
+@routes.get('/node_info')
+async def node_info(request):
+    return json_response(node.get_node_info())
+
+
+def add_routes(app):
+    app.add_routes(routes)
+    # Batches fan out per owner from a worker thread: one thread per batch, not per key.
+    app.router.add_post('/insert_batch', threaded("insert_batch", "items", "client_ip", "client_port", "hops",
+                                                           hops=0))
+    app.router.add_post('/insertReplicas_batch',
+                        threaded("insert_replicas_batch", "items", "replication_count", "join", "starting_node"))
+    app.router.add_post('/chain_write', threaded("chain_write", "entries"))
+    app.router.add_post('/quorum_write', threaded("quorum_write", "entries"))
+    app.router.add_post('/query_batch', threaded("multi_get", "keys", "client_ip", "client_port", "hops", hops=0))
+    app.router.add_post('/query_chain_batch',
+                        threaded("query_chain_batch", "keys", "replication_count", "starting_id"))
+    app.router.add_post('/delete_batch', threaded("delete_batch", "keys", "hops", hops=0))
+    app.router.add_post('/deleteReplicas_batch',
+                        threaded("delete_replicas_batch", "keys", "replication_count", "starting_node"))
+    app.router.add_post('/generate_replicas', threaded("generate_replicas", "keys"))
+    app.router.add_post('/updateReplicas', threaded("updateReplicas", "replicas", "new_node_id"))
+    app.router.add_post('/update_successor', threaded("update_successor", "new_successor"))
+    app.router.add_post('/update_predecessor', threaded("update_predecessor", "new_predecessor"))
+    app.router.add_post('/invalidate_successors', threaded("invalidate_successors", "remaining"))
+    app.router.add_post('/stabilize', threaded("notify", "node"))
+    app.router.add_post('/spill_replicas',
+                        threaded("spill_replicas", "departed_id", "spill", "remaining", "source_id"))
+    app.router.add_post('/rebalance_replicas', threaded("rebalance_replicas", "new_node", "source_id", "remaining"))
+
+
+@web.middleware
+async def select_vnode(request, handler):
+    """
+    Serve a request to /v/<i>/... with token i of this process (see vnodes.Local).
+    """
+    vnode, _ = vnodes.split_path(request.path)
+    if vnode not in nodes:
+        return json_response({"status": "error", "message": f"No virtual node {vnode} here"}, status=404)
+    vnodes.current.set(vnode)
+    return await handler(request)
+
+
+def create_app(vnode_count=1):
+    app = web.Application(client_max_size=1024 ** 3, middlewares=[select_vnode])
+    add_routes(app)
+    # The same endpoints for every later token of the process, under its /v/<i> prefix.
+    for vnode in range(1, vnode_count):
+        token_app = web.Application(client_max_size=1024 ** 3)
+        add_routes(token_app)
+        app.add_subapp(f"/v/{vnode}", token_app)
+
+    async def close_peers(app):
+        await peers.close()
+    app.on_cleanup.append(close_peers)
+    return app
+
+
+if __name__ == "__main__":
+    nodes[0], vnode_count, storage_dir = initialize_node()
+    peers = AsyncTransport(pool_size=nodes[0].transport.pool_size, timeout=nodes[0].transport.timeout,
+                           connect_timeout=nodes[0].transport.connect_timeout)
+
+    start_node(nodes[0])
+    if vnode_count > 1:
+        threading.Thread(target=join_vnodes, args=(nodes, vnode_count, storage_dir, start_node), daemon=True,
+                         name="join_vnodes").start()
+    web.run_app(create_app(vnode_count), host=nodes[0].ip, port=nodes[0].port, print=None)
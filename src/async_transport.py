@@ -0,0 +1,60 @@
+import aiohttp
+import rope
+import vnodes
+
+
+class AsyncTransport:
+    """
+    Non-blocking counterpart of transport.Transport for the asyncio server.
+
+    A single aiohttp ClientSession is shared by all peers; its connector keeps up to
+    pool_size keep-alive connections per peer.
+    """
+
+    def __init__(self, pool_size=16, timeout=None, connect_timeout=None):
+        self.pool_size = int(pool_size)
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self._session = None
+
+    def session(self):
+        """
+        Return the shared ClientSession (created lazily inside the running event loop).
+        """
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=0, limit_per_host=self.pool_size)
+            timeout = aiohttp.ClientTimeout(total=None, sock_connect=self.connect_timeout, sock_read=self.timeout)
+            self._session = aiohttp.ClientSession(connector=connector, timeout=timeout, json_serialize=rope.dumps)
+        return self._session
+
+    async def post(self, peer, endpoint, json=None):
+        """
+        POST to endpoint on peer (a ring member or client, see vnodes.url) and return the decoded JSON body.
+        """
+        url = vnodes.url(peer, endpoint)
+        async with self.session().post(url, json=json) as response:
+            return await response.json(content_type=None)
+
+    async def get(self, peer, endpoint, params=None):
+        """
+        GET endpoint on peer (a ring member or client, see vnodes.url) and return the decoded JSON body.
+        """
+        url = vnodes.url(peer, endpoint)
+        async with self.session().get(url, params=params) as response:
+            return await response.json(content_type=None)
+
+    async def iterate(self, peer, endpoint, payload, max_hops=256):
+        """
+        Awaitable counterpart of Transport.iterate: follow "next_hop" answers until a node serves the request.
+        """
+        payload = dict(payload, routing="iterative")
+        for _ in range(max_hops):
+            result = await self.post(peer, endpoint, payload)
+            if not isinstance(result, dict) or result.get("status") != "next_hop":
+                return result
+            peer, payload = result["next_hop"], dict(payload, hops=result["hops"])
+        raise RuntimeError(f"Iterative lookup for {endpoint} did not converge in {max_hops} hops")
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
@@ -0,0 +1,185 @@
+import asyncio
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import wait, FIRST_COMPLETED
+
+POLICIES = ("random", "p2c", "least_outstanding")
+
+
+class ReplicaSelector:
+    """
+    Chooses which replica of a key serves a read, and when to hedge it.
+
+    Every read sent through `call` counts as outstanding at its replica until it returns, and its latency is
+    kept per replica (exponentially weighted) and in a window of recent reads. Read policies:
+      - "random":            any replica.
+      - "p2c":               the better of two random replicas (power of two choices).
+      - "least_outstanding": the replica with the fewest reads in flight.
+    "Better" means fewer reads in flight, then a lower latency. A failed read counts as failure_penalty
+    seconds, so a dead replica is avoided until faster answers bring its latency down again.
+    """
+
+    def __init__(self, policy="p2c", hedge_percentile=95, window=1000, min_samples=20, failure_penalty=1.0):
+        self.policy = policy
+        # Reads are hedged once they take longer than this percentile of recent latencies (None: never).
+        self.hedge_percentile = hedge_percentile
+        self.min_samples = min_samples
+        self.failure_penalty = failure_penalty
+        self._latencies = deque(maxlen=window)
+        self._outstanding = {}
+        self._latency = {}
+        self._lock = threading.Lock()
+        self.reads = 0
+        self.hedged = 0
+
+    def load(self, peer):
+        return self._outstanding.get(peer["node_id"], 0), self._latency.get(peer["node_id"], 0.0)
+
+    def pick(self, peers):
+        """
+        The replica to read from with the current policy.
+        """
+        if self.policy == "random" or len(peers) == 1:
+            return random.choice(peers)
+        if self.policy == "p2c":
+            return min(random.sample(peers, 2), key=self.load)
+        # Shuffled first, so idle replicas share the reads.
+        return min(random.sample(peers, len(peers)), key=self.load)
+
+    def call(self, peer, request):
+        """
+        Run request(peer), counting it as outstanding at peer and recording its latency.
+        """
+        start = self._begin(peer)
+        failed = True
+        try:
+            result = request(peer)
+            failed = False
+            return result
+        finally:
+            self._end(peer, start, failed)
+
+    async def call_async(self, peer, request):
+        """
+        Awaitable counterpart of call: await request(peer).
+        """
+        start = self._begin(peer)
+        failed = True
+        try:
+            result = await request(peer)
+            failed = False
+            return result
+        finally:
+            self._end(peer, start, failed)
+
+    def _begin(self, peer):
+        with self._lock:
+            self._outstanding[peer["node_id"]] = self._outstanding.get(peer["node_id"], 0) + 1
+        return time.monotonic()
+
+    def _end(self, peer, start, failed):
+        node_id, latency = peer["node_id"], time.monotonic() - start
+        with self._lock:
+            self._outstanding[node_id] -= 1
+            sample = max(latency, self.failure_penalty) if failed else latency
+            previous = self._latency.get(node_id)
+            self._latency[node_id] = sample if previous is None else 0.8 * previous + 0.2 * sample
+            if not failed:
+                self._latencies.append(latency)
+
+    def hedge_delay(self):
+        """
+        Seconds to wait for a read before hedging it, or None (hedging is off, or too few reads were seen).
+        """
+        if not self.hedge_percentile:
+            return None
+        with self._lock:
+            if len(self._latencies) < self.min_samples:
+                return None
+            ordered = sorted(self._latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * float(self.hedge_percentile) / 100))]
+
+    def read(self, pool, peers, request, accept):
+        """
+        Read from one of the replicas `peers`: send request(peer) (run in pool) to the replica picked by the
+        policy, send it to a second one if no answer came within the hedge delay, and move on to another
+        replica when one fails or its answer is not accepted. Returns (peer, answer) of the first accepted
+        answer, otherwise of the last answer received ((None, None) if every replica failed).
+        """
+        remaining, pending, last, hedged = list(peers), {}, (None, None), False
+        self.reads += 1
+
+        def send():
+            peer = self.pick(remaining)
+            remaining.remove(peer)
+            pending[pool.submit(self.call, peer, request)] = peer
+
+        send()
+        while pending:
+            done, _ = wait(pending, timeout=None if hedged or not remaining else self.hedge_delay(),
+                           return_when=FIRST_COMPLETED)
+            if not done:
+                # The replica is slower than usual: ask another one too and take whichever answers first.
+                hedged = True
+                self.hedged += 1
+                send()
+                continue
+            for future in done:
+                peer = pending.pop(future)
+                try:
+                    answer = future.result()
+                except Exception as e:
+                    print(f"[READ] Replica {peer['node_id']} failed: {e}")
+                    continue
+                if accept(answer):
+                    return peer, answer
+                last = peer, answer
+            if not pending and remaining:
+                send()
+        return last
+
+    async def read_async(self, peers, request, accept):
+        """
+        Awaitable counterpart of read: request(peer) is a coroutine function and the replicas are asked in tasks.
+        """
+        remaining, pending, last, hedged = list(peers), {}, (None, None), False
+        self.reads += 1
+
+        def send():
+            peer = self.pick(remaining)
+            remaining.remove(peer)
+            task = asyncio.ensure_future(self.call_async(peer, request))
+            # A read left running after another replica answered still records its latency; its error is
+            # only reported if it was awaited.
+            task.add_done_callback(lambda done: done.cancelled() or done.exception())
+            pending[task] = peer
+
+        send()
+        while pending:
+            done, _ = await asyncio.wait(pending, timeout=None if hedged or not remaining else self.hedge_delay(),
+                                         return_when=asyncio.FIRST_COMPLETED)
+            if not done:
+                hedged = True
+                self.hedged += 1
+                send()
+                continue
+            for task in done:
+                peer = pending.pop(task)
+                try:
+                    answer = task.result()
+                except Exception as e:
+                    print(f"[READ] Replica {peer['node_id']} failed: {e}")
+                    continue
+                if accept(answer):
+                    return peer, answer
+                last = peer, answer
+            if not pending and remaining:
+                send()
+        return last
+
+    def stats(self):
+        return {"policy": self.policy, "hedge_percentile": self.hedge_percentile, "hedge_delay": self.hedge_delay(),
+                "reads": self.reads, "hedged": self.hedged,
+                "outstanding": {node_id: count for node_id, count in self._outstanding.items() if count}}
@@ -0,0 +1,131 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+
+class OrderedSender:
+    """
+    FIFO link to one peer endpoint, used to pipeline chain replication.
+
+    Messages are queued without waiting and sent by a single thread, in order, as batches of up to
+    max_batch messages: `send(batch)` performs one request and raises on failure. A failed batch is
+    retried `retries` times with exponential backoff, then every backoff * 2^retries seconds for as long as
+    `keep_trying()` holds (e.g. until the peer is declared failed: `send` then reaches its replacement), and
+    is only dropped after that. A batch is only sent once the previous one has been delivered, so the peer
+    sees the messages in queue order.
+    """
+
+    def __init__(self, send, max_batch=500, retries=3, backoff=0.05, name="CHAIN", keep_trying=None):
+        self.send = send
+        self.max_batch = max_batch
+        self.retries = retries
+        self.backoff = backoff
+        self.keep_trying = keep_trying
+        self.name = name
+        self._queue = deque()
+        self._sending = 0
+        self._cond = threading.Condition()
+        self._thread = None
+        self.sent = 0
+        self.dropped = 0
+
+    def submit(self, message):
+        with self._cond:
+            self._queue.append(message)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True, name=f"{self.name.lower()}_sender")
+                self._thread.start()
+            self._cond.notify_all()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._queue:
+                    self._cond.wait()
+                batch = [self._queue.popleft() for _ in range(min(len(self._queue), self.max_batch))]
+                self._sending = len(batch)
+            self._deliver(batch)
+            with self._cond:
+                self._sending = 0
+                self._cond.notify_all()
+
+    def _deliver(self, batch):
+        attempts = 0
+        while True:
+            try:
+                self.send(batch)
+                self.sent += len(batch)
+                return
+            except Exception as e:
+                error = e
+            attempts += 1
+            if attempts > self.retries and (self.keep_trying is None or not self.keep_trying()):
+                break
+            time.sleep(self.backoff * 2 ** min(attempts - 1, self.retries))
+        self.dropped += len(batch)
+        print(f"[{self.name}] Dropped {len(batch)} messages after {attempts} attempts: {error}")
+
+    def drain(self, timeout=None):
+        """
+        Wait until everything queued so far has been sent. Returns False on timeout.
+        """
+        deadline = None if timeout is None else time.time() + timeout
+        with self._cond:
+            while self._queue or self._sending:
+                remaining = None if deadline is None else deadline - time.time()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def stats(self):
+        with self._cond:
+            return {"queued": len(self._queue) + self._sending, "sent": self.sent, "dropped": self.dropped}
+
+
+class AckTracker:
+    """
+    Futures of the chain writes a head is waiting on, keyed by (key, sequence number).
+    The tail's ack resolves them.
+    """
+
+    def __init__(self):
+        self._pending = {}
+        self._cond = threading.Condition()
+
+    def expect(self, key, seq):
+        future = Future()
+        with self._cond:
+            self._pending[(key, seq)] = future
+        return future
+
+    def resolve(self, key, seq, result=True):
+        with self._cond:
+            future = self._pending.pop((key, seq), None)
+            if not self._pending:
+                self._cond.notify_all()
+        if future is not None:
+            future.set_result(result)
+
+    def forget(self, futures):
+        """
+        Stop tracking writes whose caller gave up waiting.
+        """
+        futures = set(futures)
+        with self._cond:
+            for entry, future in list(self._pending.items()):
+                if future in futures:
+                    del self._pending[entry]
+            if not self._pending:
+                self._cond.notify_all()
+
+    def wait_idle(self, timeout=None):
+        """
+        Wait until no write is waiting for its ack. Returns False on timeout.
+        """
+        with self._cond:
+            return self._cond.wait_for(lambda: not self._pending, timeout)
+
+    def __len__(self):
+        return len(self._pending)
@@ -0,0 +1,394 @@
+import asyncio
+import bisect
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+import helper_functions as hf
+import hashing
+import vnodes
+from transport import Transport
+from async_transport import AsyncTransport
+from scan import scan_nodes, scan_nodes_async
+from balancer import ReplicaSelector
+
+
+class RingView:
+    """
+    Client-side cache of the ring membership, built from a node's /overlay answer.
+
+    Keys are hashed locally with the same hash function as the nodes, so the client can
+    tell which node is the primary (owner) of a key and which one is the tail of its chain
+    (chains skip the tokens of a process already in them, as on the nodes, see vnodes.chain).
+    The view carries the version of the node's membership table, so a refresh of an unchanged
+    ring is answered with "not_modified" instead of the whole list.
+    """
+
+    def __init__(self):
+        self.nodes = []  # sorted by node_id
+        self.ids = []
+        self.consistency = "linearizability"
+        self.k_factor = 1
+        self.version = None
+        self.updated = 0.0
+
+    def params(self):
+        """
+        Query parameters of an /overlay refresh.
+        """
+        return {"version": self.version} if self.nodes and self.version is not None else None
+
+    def update(self, overlay):
+        """
+        Replace the cached view with an /overlay response.
+        """
+        if overlay.get("status") == "not_modified":
+            self.updated = time.time()
+            return
+        self.version = overlay.get("version")
+        self.nodes = sorted(overlay["overlay"], key=lambda node: node["node_id"])
+        self.ids = [node["node_id"] for node in self.nodes]
+        self.consistency = overlay.get("consistency", self.consistency)
+        self.k_factor = int(overlay.get("k_factor", self.k_factor))
+        # Hash keys in the same identifier space as the ring.
+        hashing.configure(overlay.get("m_bits", hashing.M_BITS))
+        self.updated = time.time()
+
+    def owner_index(self, key):
+        """
+        Index of the node responsible for key: the first node whose id is >= hash(key), wrapping around.
+        """
+        index = bisect.bisect_left(self.ids, hf.hash_function(key))
+        return index % len(self.nodes)
+
+    def owner(self, key):
+        return self.nodes[self.owner_index(key)]
+
+    def tail(self, key):
+        """
+        The last node of the key's replica chain, or None when the owner itself must answer
+        (eventual consistency, k_factor 1 or a single node).
+        """
+        chain = self.replicas(key)
+        if self.consistency != "linearizability" or len(chain) <= 1:
+            return None
+        return chain[-1]
+
+    def replicas(self, key):
+        """
+        The members of the key's replica chain, primary first.
+        """
+        return vnodes.chain(self.nodes, hf.hash_function(key), self.k_factor)
+
+    def reader(self, key):
+        """
+        A random member of the key's chain to read from (every member serves linearizable reads, see
+        Node.chain_read_step) with the replication count left from it to the tail, or None to read
+        through the owner.
+        """
+        chain = self.replicas(key)
+        if self.consistency != "linearizability" or len(chain) <= 1:
+            return None
+        position = random.randrange(len(chain))
+        if position == 0:
+            return None
+        return chain[position], len(chain) - position
+
+
+def is_success(result):
+    return str(result.get("status", "")).startswith("success")
+
+
+class ChordifyClient:
+    """
+    Synchronous Chordify client.
+
+    Inserts and deletes go straight to the key's primary, linearizable reads to a random member
+    of the key's chain and eventual reads to a member picked by read_policy (hedged when slow, see
+    balancer.ReplicaSelector), using a cached view of the ring. When a node answers "not_responsible" the view
+    is refreshed and the request retried. Connections are pooled per node.
+
+    With routing="iterative" the client keeps no ring view: it asks the seed node and follows the
+    "next_hop" answers itself, so no node on the way waits for the rest of the lookup.
+    routing="recursive" lets the nodes forward the request.
+    """
+
+    def __init__(self, ip, port, client_ip=None, client_port=8888, pool_size=16, timeout=5, refresh_interval=30,
+                 max_workers=16, routing="direct", read_policy="p2c"):
+        self.seeds = [{"ip": ip, "port": int(port)}]
+        self.routing = routing
+        self.client_ip = client_ip
+        self.client_port = client_port
+        self.refresh_interval = refresh_interval
+        self.max_workers = max_workers
+        self.transport = Transport(pool_size=pool_size, timeout=timeout)
+        self.ring = RingView()
+        self.read_selector = ReplicaSelector(read_policy)
+        self.read_pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="read")
+
+    def refresh(self):
+        """
+        Reload the ring view from any reachable known node.
+        """
+        last_error = None
+        for peer in self.ring.nodes + self.seeds:
+            try:
+                self.ring.update(self.transport.get(peer, "/overlay", params=self.ring.params()).json())
+                return self.ring.nodes
+            except Exception as e:
+                last_error = e
+        raise ConnectionError(f"No Chordify node reachable: {last_error}")
+
+    def ensure_ring(self):
+        if not self.ring.nodes or time.time() - self.ring.updated > self.refresh_interval:
+            self.refresh()
+
+    def callback(self):
+        return {"client_ip": self.client_ip, "client_port": self.client_port}
+
+    def direct(self, endpoint, key, payload):
+        """
+        Send payload to the owner of key, refreshing the ring view once if the node disowns the key.
+        If the ring is still moving, fall back to letting the nodes route the request.
+        """
+        self.ensure_ring()
+        for _ in range(2):
+            try:
+                result = self.transport.post(self.ring.owner(key), endpoint, json=dict(payload, direct=True)).json()
+                if result.get("status") != "not_responsible":
+                    return result
+            except Exception as e:
+                print(f"[CLIENT] Direct request to owner of '{key}' failed: {e}")
+            self.refresh()
+        return self.transport.post(self.ring.owner(key), endpoint, json=payload).json()
+
+    def route(self, endpoint, key, payload):
+        """
+        Send a request for key with the client's routing mode.
+        """
+        if self.routing == "direct":
+            return self.direct(endpoint, key, payload)
+        if self.routing == "iterative":
+            return self.transport.iterate(self.seeds[0], endpoint, payload)
+        return self.transport.post(self.seeds[0], endpoint, json=payload).json()
+
+    def lookup(self, key):
+        """
+        Find the node responsible for key by an iterative /find_successor walk.
+        """
+        self.ensure_ring()  # hashes must use the ring's identifier space
+        return self.transport.iterate(self.seeds[0], "/find_successor", {"id": hf.hash_function(key)})
+
+    def insert(self, key, value):
+        return self.route("/insert", key, {"key": key, "value": value, **self.callback()})
+
+    def delete(self, key):
+        return self.route("/delete", key, {"key": key})
+
+    def query(self, key):
+        if self.routing != "direct":
+            return self.route("/query", key, {"key": key, **self.callback()})
+        self.ensure_ring()
+        if self.ring.consistency == "eventual" and self.ring.k_factor > 1:
+            _, result = self.read_selector.read(
+                self.read_pool, self.ring.replicas(key),
+                lambda member: self.transport.post(member, "/query", json={"key": key, "direct": True,
+                                                                           **self.callback()}).json(),
+                is_success)
+            if result is not None and is_success(result):
+                return result
+        reader = self.ring.reader(key)
+        if reader is not None:
+            member, replication_count = reader
+            try:
+                result = self.transport.post(member, "/query_chain", json={
+                    "key": key,
+                    "replication_count": replication_count,
+                    "starting_id": self.ring.owner(key)["node_id"]
+                }).json()
+                if is_success(result):
+                    return result
+            except Exception as e:
+                print(f"[CLIENT] Chain read of '{key}' failed: {e}")
+        # Missing key or stale view: read through the owner.
+        return self.direct("/query", key, {"key": key, **self.callback()})
+
+    def insert_batch(self, items):
+        """
+        Insert a list of {"key", "value"} items, sending one /insert_batch per owner concurrently.
+        """
+        self.ensure_ring()
+        groups = {}
+        for item in items:
+            owner = self.ring.owner(item["key"])
+            groups.setdefault(owner["node_id"], (owner, []))[1].append(item)
+        results = []
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, max(1, len(groups)))) as executor:
+            futures = [executor.submit(self.transport.post, owner, "/insert_batch", json={"items": group})
+                       for owner, group in groups.values()]
+            for future in futures:
+                results.extend(future.result().json().get("results", []))
+        return {"status": "success", "results": results}
+
+    def multi_get(self, keys):
+        """
+        Read many keys: per tail /query_chain_batch (linearizability) or per owner /query_batch (eventual),
+        all in parallel. Keys the tails could not serve are re-read through their owners.
+        """
+        self.ensure_ring()
+        groups = {}
+        for key in dict.fromkeys(keys):
+            tail = self.ring.tail(key)
+            owner = self.ring.owner(key)
+            target = tail if tail is not None else owner
+            groups.setdefault((target["node_id"], owner["node_id"]), (target, tail is not None, []))[2].append(key)
+
+        def read_group(group_key):
+            (_, owner_id), (target, from_tail, group) = group_key, groups[group_key]
+            if from_tail:
+                payload = {"keys": group, "replication_count": 1, "starting_id": owner_id}
+                return self.transport.post(target, "/query_chain_batch", json=payload).json()
+            return self.transport.post(target, "/query_batch", json={"keys": group}).json()
+
+        results = {}
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, max(1, len(groups)))) as executor:
+            for response in executor.map(read_group, list(groups)):
+                results.update(response.get("results", {}))
+        for key in dict.fromkeys(keys):
+            if not is_success(results.get(key, {})):
+                results[key] = self.route("/query", key, {"key": key})
+        return {"status": "success", "results": results}
+
+    def scan(self, include_replicas=True, page_size=1000):
+        """
+        Stream every item of the ring, paging all known nodes in parallel (see scan.scan_nodes).
+        """
+        self.ensure_ring()
+        return scan_nodes(self.transport, self.ring.nodes, include_replicas, page_size)
+
+    def close(self):
+        self.read_pool.shutdown(wait=False)
+        self.transport.close()
+
+
+class AsyncChordifyClient:
+    """
+    asyncio flavour of ChordifyClient with the same routing rules and the same operations (hedged eventual
+    reads, per-owner batches, ring scans), built on AsyncTransport.
+    """
+
+    def __init__(self, ip, port, client_ip=None, client_port=8888, pool_size=16, timeout=5, refresh_interval=30,
+                 routing="direct", read_policy="p2c"):
+        self.seeds = [{"ip": ip, "port": int(port)}]
+        self.routing = routing
+        self.client_ip = client_ip
+        self.client_port = client_port
+        self.refresh_interval = refresh_interval
+        self.transport = AsyncTransport(pool_size=pool_size, timeout=timeout)
+        self.ring = RingView()
+        self.read_selector = ReplicaSelector(read_policy)
+
+    async def refresh(self):
+        last_error = None
+        for peer in self.ring.nodes + self.seeds:
+            try:
+                self.ring.update(await self.transport.get(peer, "/overlay", self.ring.params()))
+                return self.ring.nodes
+            except Exception as e:
+                last_error = e
+        raise ConnectionError(f"No Chordify node reachable: {last_error}")
+
+    async def ensure_ring(self):
+        if not self.ring.nodes or time.time() - self.ring.updated > self.refresh_interval:
+            await self.refresh()
+
+    def callback(self):
+        return {"client_ip": self.client_ip, "client_port": self.client_port}
+
+    async def direct(self, endpoint, key, payload):
+        await self.ensure_ring()
+        for _ in range(2):
+            try:
+                result = await self.transport.post(self.ring.owner(key), endpoint, dict(payload, direct=True))
+                if result.get("status") != "not_responsible":
+                    return result
+            except Exception as e:
+                print(f"[CLIENT] Direct request to owner of '{key}' failed: {e}")
+            await self.refresh()
+        return await self.transport.post(self.ring.owner(key), endpoint, payload)
+
+    async def route(self, endpoint, key, payload):
+        if self.routing == "direct":
+            return await self.direct(endpoint, key, payload)
+        if self.routing == "iterative":
+            return await self.transport.iterate(self.seeds[0], endpoint, payload)
+        return await self.transport.post(self.seeds[0], endpoint, payload)
+
+    async def lookup(self, key):
+        await self.ensure_ring()
+        return await self.transport.iterate(self.seeds[0], "/find_successor", {"id": hf.hash_function(key)})
+
+    async def insert(self, key, value):
+        return await self.route("/insert", key, {"key": key, "value": value, **self.callback()})
+
+    async def delete(self, key):
+        return await self.route("/delete", key, {"key": key})
+
+    async def query(self, key):
+        if self.routing != "direct":
+            return await self.route("/query", key, {"key": key, **self.callback()})
+        await self.ensure_ring()
+        if self.ring.consistency == "eventual" and self.ring.k_factor > 1:
+            _, result = await self.read_selector.read_async(
+                self.ring.replicas(key),
+                lambda member: self.transport.post(member, "/query", {"key": key, "direct": True, **self.callback()}),
+                is_success)
+            if result is not None and is_success(result):
+                return result
+        reader = self.ring.reader(key)
+        if reader is not None:
+            member, replication_count = reader
+            try:
+                result = await self.transport.post(member, "/query_chain", {
+                    "key": key,
+                    "replication_count": replication_count,
+                    "starting_id": self.ring.owner(key)["node_id"]
+                })
+                if is_success(result):
+                    return result
+            except Exception as e:
+                print(f"[CLIENT] Chain read of '{key}' failed: {e}")
+        return await self.direct("/query", key, {"key": key, **self.callback()})
+
+    async def insert_batch(self, items):
+        """
+        Insert a list of {"key", "value"} items, sending one /insert_batch per owner concurrently.
+        """
+        await self.ensure_ring()
+        groups = {}
+        for item in items:
+            owner = self.ring.owner(item["key"])
+            groups.setdefault(owner["node_id"], (owner, []))[1].append(item)
+        responses = await asyncio.gather(*(self.transport.post(owner, "/insert_batch", {"items": group})
+                                           for owner, group in groups.values()))
+        return {"status": "success", "results": [result for response in responses
+                                                 for result in response.get("results", [])]}
+
+    async def multi_get(self, keys):
+        keys = list(dict.fromkeys(keys))
+        values = await asyncio.gather(*(self.query(key) for key in keys))
+        return {"status": "success", "results": dict(zip(keys, values))}
+
+    async def scan(self, include_replicas=True, page_size=1000):
+        """
+        Stream every item of the ring (an async generator), paging all known nodes concurrently.
+        """
+        await self.ensure_ring()
+        records = scan_nodes_async(self.transport, self.ring.nodes, include_replicas, page_size)
+        try:
+            async for record in records:
+                yield record
+        finally:
+            await records.aclose()
+
+    async def close(self):
+        await self.transport.close()
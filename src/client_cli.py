@@ -12,6 +12,7 @@ import threading
 import sys
 import time
 import logging
+from chordify_client import ChordifyClient
 
 cli_server = Flask(__name__)
 
@@ -27,8 +28,10 @@ def print_help():
   {Fore.CYAN}insert <key> <value>{Style.RESET_ALL}   - Insert a (key, value) pair into the DHT.
   {Fore.CYAN}delete <key>{Style.RESET_ALL}           - Delete the (key, value) pair for the key.
   {Fore.CYAN}query <key>{Style.RESET_ALL}            - Retrieve the value for the key (use "*" for all).
+  {Fore.CYAN}multi_get <keys...>{Style.RESET_ALL}    - Retrieve the values of many keys at once.
   {Fore.CYAN}overlay{Style.RESET_ALL}                - Display the Chord ring topology.
   {Fore.CYAN}depart{Style.RESET_ALL}                 - Instruct the node to gracefully leave the DHT.
+  {Fore.CYAN}config{Style.RESET_ALL}                 - Set options on every node (e.g. consistency=quorum w=2 r=2).
   {Fore.CYAN}file_launch{Style.RESET_ALL}            - Launch a file from a node.
   {Fore.CYAN}file_parallel{Style.RESET_ALL}          - Launch files in parallel to different nodes.
   {Fore.CYAN}help{Style.RESET_ALL}                   - Display this help message.
@@ -48,8 +51,19 @@ def send_request(method, base_url, endpoint, data=None, params=None):
         return {"status": "error", "message": str(e)}
     
 
-def launch_file(i, node_ip, node_port, launch_type, client_ip):
-    base_url = f"http://{node_ip}:{node_port}"
+def client_request(method, *args):
+    # Same error contract as send_request, for calls made through the client library.
+    try:
+        return method(*args)
+    except Exception as e:
+        return {"status": "error", "message": str(e)}
+
+
+def launch_file(i, node_ip, node_port, launch_type, client_ip, client=None):
+    # Requests are routed by the client library straight to the responsible nodes;
+    # node_ip:node_port is only the entry point used to learn the ring.
+    if client is None:
+        client = ChordifyClient(node_ip, node_port, client_ip=client_ip, client_port=8888)
     if launch_type == "insert":
         file_path = os.path.join("..", "data", "insert_" + str(i) + ".txt")
         with open(file_path, "r") as file:
@@ -60,9 +74,14 @@ def launch_file(i, node_ip, node_port, launch_type, client_ip):
                     if not line:  # Break if end of file
                         break
                     count+=1
-                    data = {"key": line.strip(), "value": f"{node_ip}:{node_port}", "client_ip": client_ip, "client_port": 8888}
-                    ins_resp = send_request("POST", base_url, "/insert", data=data)
+                    ins_resp = client_request(client.insert, line.strip(), f"{node_ip}:{node_port}")
                     #print(str(ins_resp) + f" | Command {count} from file {i}", file=f, flush=True)
+    elif launch_type == "insert_batch":
+        # Send the whole file as one batch per owner.
+        file_path = os.path.join("..", "data", "insert_" + str(i) + ".txt")
+        with open(file_path, "r") as file:
+            items = [{"key": line.strip(), "value": f"{node_ip}:{node_port}"} for line in file if line.strip()]
+        batch_resp = client_request(client.insert_batch, items)
     elif launch_type == "query":
         file_path = os.path.join("..", "data", "query_" + str(i) + ".txt")
         with open(file_path, "r") as file:
@@ -73,9 +92,14 @@ def launch_file(i, node_ip, node_port, launch_type, client_ip):
                     if not line:  # Break if end of file
                         break
                     count+=1
-                    data = {"key": line.strip(), "client_ip": client_ip, "client_port": 8888}
-                    q_resp = send_request("POST", base_url, "/query", data=data)
+                    q_resp = client_request(client.query, line.strip())
                     #print(str(q_resp) + f" | Command {count} from file {i}", file=f, flush=True)
+    elif launch_type == "query_batch":
+        # Read the whole file with a single scatter-gather multi-get.
+        file_path = os.path.join("..", "data", "query_" + str(i) + ".txt")
+        with open(file_path, "r") as file:
+            keys = [line.strip() for line in file if line.strip()]
+        batch_resp = client_request(client.multi_get, keys)
     elif launch_type == "request":
         file_path = os.path.join("..", "data", "requests_" + str(i) + ".txt")
         with open(file_path, "r") as file:
@@ -90,16 +114,14 @@ def launch_file(i, node_ip, node_port, launch_type, client_ip):
                     request_type = parts[0]
                     key = parts[1]
                     if request_type == "query":
-                        data = {"key": key, "client_ip": client_ip, "client_port": 8888}
-                        q_resp = send_request("POST", base_url, "/query", data=data)
+                        q_resp = client_request(client.query, key)
 
                     elif request_type == "insert":
                         value = parts[2]
-                        data = {"key": key, "value": value, "client_ip": client_ip, "client_port": 8888}
-                        ins_resp = send_request("POST", base_url, "/insert", data=data)
+                        ins_resp = client_request(client.insert, key, value)
                         #print(str(ins_resp) + f" | Command {count} from file {i}", file=f, flush=True)
     else:
-        print("Available type of launch: insert, query, request")
+        print("Available type of launch: insert, insert_batch, query, query_batch, request")
 
 
 
@@ -124,11 +146,15 @@ def reception():
         if not data:
             return jsonify({"status": "error", "message": "No data received"}), 400
         
+        # Nodes send the messages queued for this client together as {"batch": [...]}
+        messages = data["batch"] if "batch" in data else [data]
+
         # Write to output file
         with open("output.txt", "a") as f:
-            print(str(data), file=f, flush=True)
+            for message in messages:
+                print(str(message), file=f, flush=True)
 
-        return jsonify({"status": "success", "message": "Data written to output file"}), 200
+        return jsonify({"status": "success", "message": f"{len(messages)} messages written to output file"}), 200
     
     except Exception as e:
         return jsonify({"status": "error", "message": str(e)}), 500
@@ -186,15 +212,41 @@ def cli_loop(client_ip):
             print(resp)
         elif cmd == "query":
             if len(tokens) < 4:
-                print("Usage: query <key> <node_ip> <node_port>")
+                print("Usage: query <key> <node_ip> <node_port>  (query * <node_ip> <node_port> [no_replicas])")
                 continue
             key = tokens[1]
             node_ip = tokens[2]
             node_port = tokens[3]
+            if key == "*":
+                # Stream the whole ring item by item instead of one giant response.
+                include_replicas = not (len(tokens) > 4 and tokens[4] == "no_replicas")
+                client = ChordifyClient(node_ip, node_port)
+                try:
+                    count = 0
+                    for record in client.scan(include_replicas=include_replicas):
+                        print(record)
+                        count += 1
+                    print(f"{count} items")
+                except Exception as e:
+                    print({"status": "error", "message": str(e)})
+                finally:
+                    client.close()
+                continue
             data = {"key": key, "client_ip": client_ip, "client_port": 8888}
             base_url = f"http://{node_ip}:{node_port}"
             resp = send_request("POST", base_url, "/query", data=data)
             print(resp)
+        elif cmd == "multi_get":
+            if len(tokens) < 4:
+                print("Usage: multi_get <node_ip> <node_port> <key1> [<key2> ...]")
+                continue
+            node_ip = tokens[1]
+            node_port = tokens[2]
+            keys = tokens[3:]
+            data = {"keys": keys, "client_ip": client_ip, "client_port": 8888}
+            base_url = f"http://{node_ip}:{node_port}"
+            resp = send_request("POST", base_url, "/query_batch", data=data)
+            print(resp)
         elif cmd == "overlay":
             if len(tokens) < 3:
                 print("Usage: overlay <node_ip> <node_port>")
@@ -222,6 +274,20 @@ def cli_loop(client_ip):
             base_url = f"http://{node_ip}:{node_port}"
             resp = send_request("GET", base_url, "/node_info")
             print(resp)
+        elif cmd == "config":
+            if len(tokens) < 4:
+                print("Usage: config <node_ip> <node_port> <option=value> [...]  (e.g. consistency=quorum k_factor=3 w=2 r=2)")
+                continue
+            node_ip = tokens[1]
+            node_port = tokens[2]
+            options = dict(token.split("=", 1) for token in tokens[3:])
+            options = {name: int(value) if value.isdigit() else value for name, value in options.items()}
+            # The consistency mode and quorum sizes are ring-wide: apply them to every node
+            # (once per process: a process configures all of its tokens).
+            overlay = send_request("GET", f"http://{node_ip}:{node_port}", "/overlay")
+            for address in dict.fromkeys((peer['ip'], peer['port']) for peer in overlay.get("overlay", [])):
+                resp = send_request("POST", f"http://{address[0]}:{address[1]}", "/set_config", data=options)
+                print(f"{address[0]}:{address[1]}", resp)
 ###################################### single launch ######################################            
         elif cmd == "file_launch":
             with open("output.txt", "w") as f:
@@ -243,16 +309,18 @@ def cli_loop(client_ip):
             node_ip = tokens[1]
             node_port = tokens[2]
             launch_type = tokens[3]
-            base_url = f"http://{node_ip}:{node_port}"
-            resp = send_request("GET", base_url, "/overlay")
-            node_list = [(node["ip"], node["port"]) for node in resp["overlay"]]
+            # One shared client: a single ring view and connection pool for all workers.
+            client = ChordifyClient(node_ip, node_port, client_ip=client_ip, client_port=8888)
+            # One worker per process, not per token (a process with virtual nodes is listed once per token).
+            node_list = list(dict.fromkeys((node["ip"], node["port"]) for node in client.refresh()))
             start  = time.time()
             with ThreadPoolExecutor(max_workers=len(node_list)) as executor:
                 for i, (ip, port) in enumerate(node_list):
-                    executor.submit(launch_file, i, ip, port, launch_type, client_ip)
+                    executor.submit(launch_file, i, ip, port, launch_type, client_ip, client)
             end = time.time()
             elapsed = end - start
             throughput = 50 * len(node_list)/elapsed
+            print(f"Consistency: {client.ring.consistency}, K-factor: {client.ring.k_factor}")
             print(f"Elapsed time: {elapsed} seconds")
             print(f"Throughput: {throughput} seconds/commands")
         else:
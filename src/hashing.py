@@ -0,0 +1,59 @@
+import hashlib
+import os
+from functools import lru_cache
+
+# Size of the identifier space: node ids and key hashes live in [0, 2^M_BITS).
+# Every node of a ring must use the same value; joining nodes take it from the bootstrap.
+M_BITS = int(os.environ.get("CHORDIFY_M_BITS", 16))
+RING_SIZE = 2 ** M_BITS
+
+# Node ids and hot keys are hashed on every hop, so recent results are memoized.
+CACHE_SIZE = 1 << 16
+
+_sha1 = hashlib.sha1
+_from_bytes = int.from_bytes
+
+
+def _digest_width(m_bits):
+    # Only the trailing bytes of the digest can affect the low m_bits of the hash.
+    return -((m_bits + 7) // 8)
+
+
+_width = _digest_width(M_BITS)
+_mask = RING_SIZE - 1
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def hash_key(key):
+    """
+    Compute SHA-1 of key reduced to the identifier space (mod 2^M_BITS).
+    Equivalent to int(sha1(key).hexdigest(), 16) % RING_SIZE, read straight from the digest bytes.
+    """
+    return _from_bytes(_sha1(key.encode()).digest()[_width:], "big") & _mask
+
+
+def hash_many(keys):
+    """
+    Hash a batch of keys (e.g. a key transfer), returning the hashes in the same order.
+    The batch bypasses the hash_key cache: its keys are mostly seen once, and would only evict the
+    hot keys and node ids the cache is for.
+    """
+    sha1, from_bytes, width, mask = _sha1, _from_bytes, _width, _mask
+    return [from_bytes(sha1(key.encode()).digest()[width:], "big") & mask for key in keys]
+
+
+def configure(m_bits):
+    """
+    Switch to a 2^m_bits identifier space. Must be called before a node id or key is hashed.
+    Returns True if the space changed.
+    """
+    global M_BITS, RING_SIZE, _width, _mask
+    m_bits = int(m_bits)
+    if not 1 <= m_bits <= 160:
+        raise ValueError("m_bits must be between 1 and 160 (the SHA-1 digest size)")
+    if m_bits == M_BITS:
+        return False
+    M_BITS, RING_SIZE = m_bits, 2 ** m_bits
+    _width, _mask = _digest_width(m_bits), RING_SIZE - 1
+    hash_key.cache_clear()
+    return True
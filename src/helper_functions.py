@@ -1,39 +1,51 @@
-import hashlib
+import zlib
 import time
-import subprocess
-import requests
 import os
+import hashing
+import rope
+
 
 def in_interval(x, start, end):
     """
-    Check if x is in the circular interval (start, end] modulo 2^16.
-    Assumes the values are already reduced modulo 2^16.
+    Check if x is in the circular interval (start, end] modulo 2^M_BITS.
+    Assumes the values are already reduced modulo 2^M_BITS.
     """
     if start < end:
         return start < x <= end
     return x > start or x <= end
 
-def hash_function(key):
-    """Compute SHA-1 hash of a key mod 2^16."""
-    return int(hashlib.sha1(key.encode()).hexdigest(), 16) % (2 ** 16)
+def in_open_interval(x, start, end):
+    """
+    Check if x is in the circular open interval (start, end).
+    When start == end the interval covers the whole ring except start itself.
+    """
+    if start == end:
+        return x != start
+    return in_interval(x, start, end) and x != end
+
+# SHA-1 of a key mod 2^M_BITS (memoized, see hashing.hash_key).
+hash_function = hashing.hash_key
+
+def value_digest(value):
+    """Short fingerprint (CRC-32 of the JSON encoding) of a stored value or replica tuple."""
+    return zlib.crc32(rope.dumps(value).encode())
+
+def store_digest(store):
+    """Map every key of a store to the fingerprint of its value."""
+    return {key: value_digest(value) for key, value in store.items()}
+
+def store_delta(current, digest):
+    """
+    Compare the authoritative items in current with a peer's digest of its copy.
+    Return (changed, stale): the items the peer lacks or holds a different value for,
+    and the keys the peer holds that are no longer in current.
+    """
+    changed = {key: value for key, value in current.items()
+               if digest.get(key) != value_digest(value)}
+    stale = [key for key in digest if key not in current]
+    return changed, stale
 
 def shutdown_server():
     # Shut down the server using os._exit() to avoid the SystemExit exception
     time.sleep(1)
     os._exit(0)
-
-
-def replica_handler(node):
-    time.sleep(1)
-    if node.data_store is not None:
-        node.generate_replicas(node.data_store)
-
-    if node.successor["node_id"] != node.node_id:
-        # Fix my successor's replicas
-        url_node_info = f"http://{node.successor['ip']}:{node.successor['port']}/node_info"
-        resp_info = requests.get(url_node_info).json()
-        node_info = resp_info
-        data_succ = node_info.get("data_store")
-        if data_succ is not None:
-            url_gen_pred = f"http://{node.successor['ip']}:{node.successor['port']}/generate_replicas"
-            requests.post(url_gen_pred, json={"keys": data_succ})
\ No newline at end of file
@@ -0,0 +1,82 @@
+import hashlib
+import threading
+import time
+import vnodes
+
+
+class MembershipTable:
+    """
+    Versioned view of the ring's members, kept by every node and spread by gossip.
+
+    Every entry {"node_id", "ip", "port", "status", "version"} (plus "vnode" for the later tokens of a process,
+    see vnodes) is the latest known event of one node: "alive" once it joined, "left" once it departed and
+    "failed" once a neighbour stopped hearing its heartbeats (kept, so that gossip from a node that missed the
+    event does not bring it back). Entry versions are the events' times in milliseconds and a merge keeps the
+    newer entry of every node. The table version is a digest of the entries (the XOR of a 64-bit hash of each,
+    updated as entries are replaced): tables with different entries have different versions, except for a
+    hash collision, so peers and clients compare versions instead of whole tables.
+    """
+
+    def __init__(self):
+        self._entries = {}  # node_id -> entry
+        self._lock = threading.Lock()
+        self.version = 0
+        self.down = frozenset()  # ids of the nodes that left or failed, skipped by routing
+        self.shared_hosts = False  # whether a process has several tokens in the ring (see vnodes)
+
+    def record(self, node, status):
+        """
+        Record an event of node ("alive", "left" or "failed") observed by this node, stamped now.
+        """
+        with self._lock:
+            previous = self._entries.get(node["node_id"])
+            stamp = time.time_ns() // 1_000_000
+            if previous is not None:
+                stamp = max(stamp, previous["version"] + 1)
+        entry = {"node_id": node["node_id"], "ip": node["ip"], "port": int(node["port"]), "status": status,
+                 "version": stamp}
+        if node.get("vnode"):
+            entry["vnode"] = node["vnode"]
+        self.merge([entry])
+
+    def merge(self, entries):
+        """
+        Merge entries received from another node. Returns whether the table changed.
+        """
+        changed = False
+        with self._lock:
+            for entry in entries:
+                previous = self._entries.get(entry["node_id"])
+                if previous is not None and previous["version"] >= entry["version"]:
+                    continue
+                self._entries[entry["node_id"]] = dict(entry)
+                self.version ^= entry_digest(entry) ^ (entry_digest(previous) if previous else 0)
+                changed = True
+            if changed:
+                self.down = frozenset(node_id for node_id, entry in self._entries.items() if entry["status"] != "alive")
+                alive = [vnodes.host(entry) for entry in self._entries.values() if entry["status"] == "alive"]
+                self.shared_hosts = len(set(alive)) < len(alive)
+        return changed
+
+    def entries(self):
+        with self._lock:
+            return [dict(entry) for entry in self._entries.values()]
+
+    def alive(self):
+        """
+        The members currently in the ring, sorted by node id.
+        """
+        with self._lock:
+            return [vnodes.peer(entry["ip"], entry["port"], entry["node_id"], entry.get("vnode", 0))
+                    for _, entry in sorted(self._entries.items()) if entry["status"] == "alive"]
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def entry_digest(entry):
+    """
+    64-bit hash of a membership entry, the unit of the table version.
+    """
+    text = "|".join(str(entry.get(field, "")) for field in ("node_id", "ip", "port", "vnode", "status", "version"))
+    return int.from_bytes(hashlib.blake2b(text.encode(), digest_size=8).digest(), "big")
@@ -1,84 +1,572 @@
-import requests
+import bisect
+import functools
+import inspect
+import json
+import random
 import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from contextlib import closing, contextmanager
 import helper_functions as hf
+import hashing
+import rope
+import vnodes
+from transport import Transport
+from scan import scan_nodes
+from storage import MemoryStore
+from replication import ReplicationPipeline, ReplicationQueue
+from notifier import ClientOutbox
+from chain import OrderedSender, AckTracker
+from quorum import quorum, version_order
+from membership import MembershipTable
+from balancer import ReplicaSelector
+
+
+def replica_write(endpoint):
+    """
+    Run a Node method that writes replicas inside the node's write gate. Once the node has departed,
+    the same request is relayed unchanged to the successor, which took this node's place in the chain.
+    """
+    def decorator(method):
+        signature = inspect.signature(method)
+
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            with self.write_guard():
+                if self.departed:
+                    arguments = signature.bind(self, *args, **kwargs).arguments
+                    payload = {name: value for name, value in arguments.items() if name != "self"}
+                    return self.transport.post(self.successor, endpoint, json=payload).json()
+                return method(self, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def sent_entries(entries, resync=()):
+    """
+    Replicated writes as sent to a replica: an appended segment travels without the sender's copy of the
+    whole value ("full"), except at the positions in resync, where that value replaces the replica's.
+    """
+    sent = []
+    for position, entry in enumerate(entries):
+        entry = dict(entry)
+        full = entry.pop("full", None)
+        if position in resync:
+            entry.update(value=full, replace=True)
+        sent.append(entry)
+    return sent
 
 
 class Node:
 
     def __init__(self, ip, port, consistency="linearizability", k_factor=1, successor=None, predecessor=None,
-                 data_store={}, replicas={}):
+                 data_store={}, replicas={}, pool_size=16, timeout=60, connect_timeout=2, vnode=0, node_id=None):
 
         self.ip = ip
         self.port = port
-        self.node_id = hf.hash_function(f"{ip}:{port}")
-        self.data_store = data_store
+        # Token vnode of the process ip:port (see vnodes). The first token sits at hash(ip:port); the others
+        # are given their ring positions when they join.
+        self.vnode = int(vnode)
+        self.node_id = hf.hash_function(f"{ip}:{port}") if node_id is None else int(node_id)
+        # Stores may be durable (storage.LogStore, recovered from disk) or plain dicts to wrap in memory.
+        self.data_store = data_store if isinstance(data_store, MemoryStore) else MemoryStore(data_store)
 
         # Set consistency mode and replication factor (k-factor)
         self.consistency = consistency
         self.k_factor = int(k_factor)
-        self.replicas = replicas  # Local replica store
+        self.replicas = replicas if isinstance(replicas, MemoryStore) else MemoryStore(replicas)  # Local replica store
         if successor and predecessor:
             self.successor = successor
             self.predecessor = predecessor
         else:
             # Initially, the node is alone in the ring so its successor and predecessor are itself.
-            self.successor = {"ip": self.ip, "port": self.port, "node_id": self.node_id}
-            self.predecessor = {"ip": self.ip, "port": self.port, "node_id": self.node_id}
+            self.successor = self.address()
+            self.predecessor = self.address()
             # self.predecessor = Node(self.predecessor["ip"], self.predecessor["port"])
             # self.successor = Node(self.successor["ip"], self.successor["port"])
 
-        print(f"[START] Node {self.node_id} at {self.ip}:{self.port}")
+        # Bulk replica generation: batch size, batches in flight, and progress of the latest run.
+        self.replication_batch_size = 500
+        self.replication_concurrency = 4
+        self.replication_progress = None
+
+        # Eventual consistency: writes are replicated in the background by a fixed worker pool,
+        # coalescing pending updates per key (see flush_replication).
+        self.replication_queue = ReplicationQueue(self.flush_replication)
+        # key -> length of its value at the last flush the replicas accepted: the next flush sends what follows.
+        # Deletes drop their keys (a delete and a later write of a key coalesce into one update) and bump
+        # replicated_epoch, so a flush that overlapped a delete does not record lengths (see flush_replication).
+        self.replicated_lengths = {}
+        self.replicated_epoch = 0
+        self.replicated_lock = threading.Lock()
+
+        # Pooled keep-alive connections to every peer this node talks to. Requests to a dead peer fail within
+        # connect_timeout; a peer that accepts a request but does not answer is given up after timeout.
+        self.transport = Transport(pool_size=pool_size, timeout=timeout, connect_timeout=connect_timeout)
+
+        # Linearizability: pipelined chain replication. The head numbers every write (the counter starts
+        # from the clock, so it keeps growing across restarts), writes flow down the chain over one ordered
+        # link per node, and the tail acks each write back to its head (see chain_head / chain_write).
+        self.chain_lock = threading.Lock()
+        self.chain_seq = time.time_ns()
+        self.chain_applied = {}  # key -> (head node_id, seq) of the last chain write applied here
+        # CRAQ: keys with writes not yet known to be committed by the tail, as
+        # key -> {"clean": (version, value), "pending": [(version, value), ...]} (a value of None is a delete).
+        # A key not listed is clean and any chain member answers reads of it locally (see chain_read_step).
+        self.dirty = {}
+        self.chain_acks = AckTracker()
+        # A chain batch the successor does not take is retried until stabilize replaces a failed successor,
+        # and then goes to the new one.
+        self.chain_sender = OrderedSender(self.send_chain_batch, name="CHAIN",
+                                          keep_trying=lambda: self.successor["node_id"] != self.node_id
+                                          and not self.departed)
+        self.ack_senders = {}  # head (ip, port, vnode) -> OrderedSender of /chain_ack
+        # Whether a write waits for the tail's ack (or its write quorum) before answering, and for how long (seconds).
+        self.chain_wait = True
+        self.chain_timeout = 30
+
+        # Quorum consistency: N = k_factor copies, writes wait for W of them and reads ask R of them
+        # (None means a majority of N, see quorum_sizes). Writes and reads fan out to the next N - 1
+        # successors in parallel from a shared pool (the head of the successor list, see stabilize).
+        self.quorum_w = None
+        self.quorum_r = None
+        self.quorum_pool = ThreadPoolExecutor(max_workers=32, thread_name_prefix="quorum")
+        self.quorum_sends = set()  # replica writes still being sent (a departure waits for them)
+
+        # Eventual consistency: a node without a copy of a queried key reads it from one of the key's replicas,
+        # picked by the read policy and hedged when slow (see replica_read).
+        self.read_selector = ReplicaSelector()
+        self.read_pool = ThreadPoolExecutor(max_workers=32, thread_name_prefix="read")
+
+        # Stabilization: every heartbeat_interval seconds the node stabilizes with its successor, which answers
+        # with its own successor list, and pings its predecessor. A neighbour not heard from for failure_timeout
+        # seconds is declared failed: the ring closes around it and its replica chains are re-extended
+        # (see successor_failed and notify). The successor list holds the next successor_list_size nodes
+        # (at least the k_factor - 1 replicas) and is rebuilt by walking the ring when it is unknown.
+        self.successors = None
+        self.successors_generation = 0  # bumped whenever the list is dropped, so a stale reply is not kept
+        self.successor_list_size = 4
+        self.heartbeat_interval = 0.2
+        self.failure_timeout = 0.8
+        self.join_grace = 5  # seconds a new neighbour gets to start serving before its heartbeats count
+        self.last_seen = {}  # neighbour node_id -> time of its last heartbeat
+
+        # Result messages to clients are delivered in the background, batched per client.
+        self.outbox = ClientOutbox(
+            lambda client, message, timeout: self.transport.post(client, "/reception", json=message, timeout=timeout))
+
+        # Graceful departure: writes in progress are counted so a hand-off starts from a quiet store,
+        # and writes arriving during a hand-off wait for it (see write_guard).
+        self.handoff_lock = threading.Lock()
+        self.write_gate = threading.Condition()
+        self.active_writes = 0
+        self.departing = False
+        self.departed = False
+
+        # Finger table: entry i points to successor(node_id + 2^i). Entry 0 is always the successor.
+        self.fingers = [self.successor] * hashing.M_BITS
+
+        # Membership table: updated on joins and departures and spread by gossip, so /overlay is answered locally.
+        self.membership = MembershipTable()
+        self.membership.record(self.address(), "alive")
+        # Membership version the replicas were last aligned with, the version seen one gossip round ago and the
+        # chain of this node's keys at the last alignment (see align_replicas).
+        self.aligned = {"version": None, "seen": None, "chain": None}
+
+        print(f"[START] Node {self.node_id} at {self.ip}:{self.port}" + (f" (token {self.vnode})" if self.vnode else ""))
         print(f"[CONFIG] Consistency: {self.consistency}, Replication Factor: {self.k_factor}")
 
-    def insert(self, key, value, client_ip, client_port):
+    def address(self):
+        """
+        This node as a ring member (see vnodes.peer).
+        """
+        return vnodes.peer(self.ip, self.port, self.node_id, self.vnode)
+
+    # ROUTING RELATED METHODS
+    def is_responsible(self, key_hash):
+        """
+        Check whether this node is the primary for the given hash, i.e. key_hash is in (predecessor, self].
+        A node that has handed its data off to its successor owns nothing.
+        """
+        if self.departed:
+            return False
+        return self.node_id == self.predecessor["node_id"] or hf.in_interval(key_hash, self.predecessor["node_id"],
+                                                                             self.node_id)
+
+    def closest_preceding_node(self, key_hash):
+        """
+        Return the finger that most closely precedes key_hash, or this node if no finger does.
+        Fingers known to have left or failed are skipped.
+        """
+        down = self.membership.down
+        for finger in reversed(self.fingers):
+            if finger["node_id"] not in down and hf.in_open_interval(finger["node_id"], self.node_id, key_hash):
+                return finger
+        return self.address()
+
+    def next_hop(self, key_hash):
+        """
+        Pick the node a request for key_hash should be forwarded to.
+        If the key falls between this node and its successor the successor is the owner,
+        otherwise jump to the closest preceding finger.
+        """
+        if hf.in_interval(key_hash, self.node_id, self.successor["node_id"]):
+            return self.successor
+        hop = self.closest_preceding_node(key_hash)
+        if hop["node_id"] == self.node_id:
+            return self.successor
+        return hop
+
+    def forward(self, key_hash, endpoint, payload):
+        """
+        Forward a request to the next hop towards key_hash and return its JSON response.
+        The hop counter in the payload is incremented. If a finger does not answer
+        (e.g. it departed and our table is stale) fall back to the successor.
+        """
+        return self.send_to_hop(self.next_hop(key_hash), endpoint, payload)
+
+    def send_to_hop(self, hop, endpoint, payload):
+        """
+        Send a routed request to a chosen next hop, with the same hop counting and fallback as forward().
+        """
+        payload = dict(payload, hops=int(payload.get("hops", 0)) + 1)
+        try:
+            return self.transport.post(hop, endpoint, json=payload).json()
+        except Exception as e:
+            if hop["node_id"] == self.successor["node_id"]:
+                raise
+            print(f"[ROUTE] Finger {hop['node_id']} unreachable ({e}), falling back to successor")
+            return self.transport.post(self.successor, endpoint, json=payload).json()
+
+    def group_by_next_hop(self, keys):
+        """
+        Split keys into the ones this node is responsible for and per-next-hop groups.
+        Returns (local_keys, {hop_node_id: (hop, keys)}), preserving the input order inside each group.
+        """
+        local, groups = [], {}
+        for key in keys:
+            key_hash = hf.hash_function(key)
+            if self.is_responsible(key_hash):
+                local.append(key)
+                continue
+            hop = self.next_hop(key_hash)
+            groups.setdefault(hop["node_id"], (hop, []))[1].append(key)
+        return local, groups
+
+    def not_responsible(self, key):
+        """
+        Reply to a direct request for a key this node does not own, so the client can refresh its ring view.
+        """
+        return {"status": "not_responsible", "message": f"Node {self.node_id} is not responsible for key '{key}'",
+                "node_id": self.node_id, "predecessor": self.predecessor, "successor": self.successor}
+
+    def next_hop_reply(self, key_hash, hops=0):
+        """
+        Reply to an iterative request for a hash this node does not own: instead of forwarding the request
+        (and waiting for the answer), tell the caller where to send it next.
+        """
+        return {"status": "next_hop", "node_id": self.node_id, "next_hop": self.next_hop(key_hash),
+                "best_finger": self.closest_preceding_node(key_hash), "successor": self.successor,
+                "hops": int(hops) + 1}
+
+    def notify_client(self, client_ip, client_port, message):
+        """
+        Queue a result message for the client's /reception endpoint (if the client gave one).
+        Delivery is asynchronous and batched (see notifier.ClientOutbox).
+        """
+        if not client_ip:
+            return
+        self.outbox.put(client_ip, client_port, message)
+
+    def find_successor(self, key_hash, hops=0, routing="recursive"):
+        """
+        Resolve the node responsible for key_hash using closest-preceding-finger routing.
+        """
+        if self.is_responsible(key_hash):
+            return {"status": "success", "node": self.address(),
+                    "hops": hops}
+        if hf.in_interval(key_hash, self.node_id, self.successor["node_id"]):
+            return {"status": "success", "node": self.successor, "hops": hops}
+        if routing == "iterative":
+            return self.next_hop_reply(key_hash, hops)
+        return self.forward(key_hash, "/find_successor", {"id": key_hash, "hops": hops})
+
+    def fix_fingers(self):
+        """
+        Refresh every entry of the finger table.
+        Consecutive starts that fall before the previously resolved finger reuse it,
+        so only about log(N) lookups are issued per refresh.
+        """
+        fingers = [self.successor]
+        for i in range(1, hashing.M_BITS):
+            start = (self.node_id + 2 ** i) % hashing.RING_SIZE
+            previous = fingers[-1]
+            if hf.in_interval(start, self.node_id, previous["node_id"]):
+                fingers.append(previous)
+                continue
+            try:
+                fingers.append(self.find_successor(start)["node"])
+            except Exception as e:
+                print(f"[FINGERS] Node {self.node_id} failed to resolve finger {i}: {e}")
+                fingers.append(previous)
+        self.fingers = fingers
+
+    def run_fix_fingers(self, interval=5):
+        """
+        Periodically refresh the finger table (meant to run in a daemon thread).
+        """
+        # A departed node clears its successor; stop refreshing then.
+        while self.successor is not None:
+            self.fix_fingers()
+            time.sleep(interval)
+
+    # STABILIZATION AND FAILURE DETECTION
+    def successor_list_length(self):
+        """
+        Length of the successor list: successor_list_size, and at least the k_factor - 1 replicas of a key.
+        """
+        return max(int(self.successor_list_size), self.k_factor - 1)
+
+    def heartbeat_missed(self, peer):
+        """
+        Whether peer has not been heard from for failure_timeout seconds. A neighbour seen for the first time
+        gets join_grace seconds first: a joining node starts serving only once its join has completed.
+        """
+        now = time.time()
+        return now - self.last_seen.setdefault(peer["node_id"], now + self.join_grace) > self.failure_timeout
+
+    def stabilize(self):
+        """
+        Send a heartbeat to the successor, which also notifies it of this node (see notify), and rebuild the
+        successor list from its reply: the successor followed by the successor's own list. A successor not heard
+        from for failure_timeout seconds is replaced (see successor_failed). Joins and departures set the ring
+        pointers explicitly, so unlike Chord's stabilize the successor's predecessor is not adopted.
+        """
+        successor, generation = self.successor, self.successors_generation
+        if successor["node_id"] == self.node_id:
+            return
+        try:
+            reply = self.transport.post(successor, "/stabilize",
+                                        json={"node": self.address()},
+                                        timeout=self.failure_timeout / 2).json()
+        except Exception as e:
+            if self.heartbeat_missed(successor):
+                print(f"[FAILURE] Node {self.node_id} lost its successor {successor['node_id']}: {e}")
+                self.successor_failed(successor)
+            return
+        self.last_seen[successor["node_id"]] = time.time()
+        if reply.get("successors") is None:
+            return  # the successor's list is being rebuilt; keep ours until it is known
+        successors = [successor]
+        for peer in reply["successors"]:
+            if peer["node_id"] == self.node_id or len(successors) >= self.successor_list_length():
+                break
+            successors.append(peer)
+        if generation == self.successors_generation and successor is self.successor:
+            self.successors = successors
+
+    def check_predecessor(self):
+        """
+        Ping the predecessor. One not heard from for failure_timeout seconds is declared failed; the node before
+        it then notifies this node, which takes over the failed node's keys (see notify).
+        """
+        predecessor = self.predecessor
+        if predecessor["node_id"] == self.node_id or predecessor["node_id"] in self.membership.down:
+            return
+        try:
+            self.transport.get(predecessor, "/ping", timeout=self.failure_timeout / 2)
+            self.last_seen[predecessor["node_id"]] = time.time()
+        except Exception as e:
+            if self.heartbeat_missed(predecessor):
+                print(f"[FAILURE] Node {self.node_id} lost its predecessor {predecessor['node_id']}: {e}")
+                self.membership_event(predecessor, "failed")
+
+    def notify(self, node):
+        """
+        Handle a stabilize request from the node before this one: answer with this node's predecessor and
+        successor list. A node other than the predecessor is accepted in its place only once the predecessor
+        has failed; this node then takes over the failed node's keys (see take_over).
+        """
+        predecessor = self.predecessor
+        if node["node_id"] != predecessor["node_id"] and predecessor["node_id"] != self.node_id and (
+                predecessor["node_id"] in self.membership.down or self.heartbeat_missed(predecessor)):
+            self.take_over(predecessor, node)
+        return {"status": "success", "predecessor": self.predecessor, "successors": self.successors}
+
+    def successor_failed(self, failed):
+        """
+        Replace a failed successor with the first node of the successor list that answers (this node itself if
+        none does), route around the failed node and re-extend the replica chains that ran through it.
+        """
+        self.membership_event(failed, "failed")
+        replacement = self.address()
+        for peer in self.successors or []:
+            if peer["node_id"] in (failed["node_id"], self.node_id) or peer["node_id"] in self.membership.down:
+                continue
+            try:
+                self.transport.get(peer, "/ping", timeout=self.failure_timeout)
+                replacement = peer
+                break
+            except Exception:
+                self.membership_event(peer, "failed")
+        self.fingers = [replacement if finger["node_id"] == failed["node_id"] else finger for finger in self.fingers]
+        if replacement["node_id"] == self.node_id:
+            # Nobody else is left: this node owns the whole ring.
+            self.take_over(failed, replacement)
+            self.update_successor(replacement)
+            return
+        self.update_successor(replacement)
+        try:
+            # Tell the new successor about the failure before notifying it, so it accepts this node at once.
+            self.transport.post(replacement, "/gossip", json={"members": self.membership.entries()},
+                                timeout=self.failure_timeout)
+        except Exception as e:
+            print(f"[GOSSIP] Node {self.node_id} could not reach node {replacement['node_id']}: {e}")
+        self.stabilize()
+        if self.k_factor > 1:
+            threading.Thread(target=self.extend_chains, daemon=True, name="extend_chains").start()
+
+    def take_over(self, failed, new_predecessor):
+        """
+        Become the primary of the keys of a failed predecessor. They hash into (new predecessor, self] and
+        every copy of them held here is a replica (count k_factor - 1 for the failed node's own keys): these
+        are promoted to primaries and their chains rebuilt from this node. With k_factor 1 they are lost.
+        """
+        with self.handoff_lock:
+            promoted = self.replicas.items_in_range(new_predecessor["node_id"], self.node_id)
+            for key, (value, _) in promoted.items():
+                self.replicas.pop(key, None)
+                self.data_store[key] = value
+            self.predecessor = new_predecessor
+        if failed["node_id"] not in self.membership.down:
+            self.membership_event(failed, "failed")
+        print(f"[FAILURE] Node {self.node_id} took over {len(promoted)} keys of failed node {failed['node_id']}")
+        if promoted and self.k_factor > 1:
+            threading.Thread(target=self.generate_replicas, args=({key: value for key, (value, _) in promoted.items()},),
+                             daemon=True, name="take_over").start()
+
+    def extend_chains(self):
+        """
+        Re-extend the replica chains that ran through a failed successor, which are one node short now:
+        this node's keys and the replicas it passed on (count above 1) are sent down the new chain again with
+        their counts, overwriting the counts of the nodes that moved up and filling in the new tails.
+        """
+        report = self.generate_replicas(dict(self.data_store))
+        by_count = {}
+        for key, (value, rep_count) in list(self.replicas.items()):
+            if rep_count > 1:
+                by_count.setdefault(rep_count, []).append({"key": key, "value": value})
+        for rep_count, items in by_count.items():
+            for start in range(0, len(items), self.replication_batch_size):
+                self.forward_replicate_batch(items[start:start + self.replication_batch_size], rep_count, True,
+                                             self.node_id)
+        print(f"[FAILURE] Node {self.node_id} re-extended the chains of {report.get('items', 0)} keys and "
+              f"{sum(len(items) for items in by_count.values())} replicas")
+
+    def run_stabilize(self):
+        """
+        Stabilize with the successor and check the predecessor every heartbeat_interval seconds, rebuilding an
+        unknown successor list (meant to run in a daemon thread).
+        """
+        while not self.departed:
+            self.stabilize()
+            self.check_predecessor()
+            if self.successors is None and self.successor["node_id"] != self.node_id:
+                self.refresh_successors()
+            neighbours = (self.successor["node_id"], self.predecessor["node_id"])
+            self.last_seen = {node_id: seen for node_id, seen in self.last_seen.items() if node_id in neighbours}
+            time.sleep(self.heartbeat_interval)
+
+    def insert(self, key, value, client_ip, client_port, hops=0, direct=False, routing="recursive"):
         """
         Primary insertion method.
 
         For eventual consistency:
           - Write locally and return immediately.
-          - Propagate the update asynchronously (decrementing replication_count so that
-            exactly kfactor replicas are updated).
+          - Queue the key for replication; the replication workers send the latest value
+            down the chain in batches (see flush_replication).
 
         For chain replication (linearizable consistency):
           - Check if this node is primary (responsible) for the key.
             If not, forward the request.
-          - If primary, write locally and then call insertReplicas if replication_count > 1.
+          - If primary, write locally and send the write down the chain (pipelined, see chain_head);
+            the answer waits for the tail's ack.
+
+        For quorum consistency:
+          - The primary writes locally and sends the new value to the other N - 1 replicas in parallel;
+            the answer waits for W of the N copies (see quorum_head).
+
+        A direct request (sent by a client that routed it itself) is not forwarded:
+        a node that is not the primary answers "not_responsible" instead.
+        With iterative routing it answers with the next hop and the caller continues the lookup.
         """
-        client_url = f"http://{client_ip}:{client_port}/reception"
-        
         # Check if the node is primary for the key.
         key_hash = hf.hash_function(key)
-        if not (self.node_id == self.predecessor["node_id"] or hf.in_interval(key_hash, self.predecessor["node_id"],
-                                                                              self.node_id)):
-            url = f"http://{self.successor['ip']}:{self.successor['port']}/insert"
-            response = requests.post(url, json={"key": key, "value": value, "client_ip": client_ip, "client_port": client_port})
-            print(f"[WRITE] Forwarded insert request for key '{key}' to node {self.successor['node_id']}")
-            return response.json()
+        with self.write_guard():
+            if self.is_responsible(key_hash):
+                result, acks = self.apply_insert(key, value, client_ip, client_port, hops)
+            else:
+                result = None
+        if result is not None:
+            return self.await_acks(result, acks)
+        result = self.unrouted_reply(key, key_hash, hops, direct, routing)
+        if result is not None:
+            return result
+        print(f"[WRITE] Forwarding insert request for key '{key}' towards node owning {key_hash}")
+        return self.forward(key_hash, "/insert", {"key": key, "value": value, "client_ip": client_ip,
+                                                  "client_port": client_port, "hops": hops})
+
+    def unrouted_reply(self, key, key_hash, hops, direct=False, routing="recursive"):
+        """
+        The answer to a request for a key this node is not responsible for when the caller routes the request
+        itself: "not_responsible" to a direct request, the next hop with iterative routing. None if this node
+        forwards it (recursive routing).
+        """
+        if direct:
+            return self.not_responsible(key)
+        if routing == "iterative":
+            return self.next_hop_reply(key_hash, hops)
+        return None
 
+    def apply_insert(self, key, value, client_ip, client_port, hops=0):
+        """
+        Write a key owned by this node and replicate it down the chain.
+        Returns the answer and the acks it has to wait for (see await_acks).
+        """
         replication_count = self.k_factor
         if self.consistency == "eventual":
             # Write locally into the primary data store.
-            self.data_store[key] = self.data_store.get(key, "") + value
-            print(f"[WRITE-EC] Node {self.node_id} stored key '{key}' with value '{self.data_store[key]}'")
+            self.store_primary(key, value)
+            print(f"[WRITE-EC] Node {self.node_id} appended '{value}' to key '{key}'")
             # Asynchronously propagate the update if needed.
-            # Call the successor to insert replicas.
-            t = threading.Thread(target=self.forward_replicate,
-                                 args=(key, value, replication_count, False, self.node_id, client_ip, client_port), daemon=True,
-                                 name="forward_replicate")
-            t.start()  # Start the thread
+            if replication_count > 1:
+                self.replication_queue.submit(key, "set")
             ## TODO return from first (primary) node, check
-            client_message = {"status": "success", "message": f"Eventually inserted at node {self.ip}:{self.port}", "key": key, "value": value}
-            requests.post(client_url, json=client_message)
-            return client_message
+            client_message = {"status": "success", "message": f"Eventually inserted at node {self.ip}:{self.port}", "key": key, "value": value, "hops": hops}
+            self.notify_client(client_ip, client_port, client_message)
+            return client_message, []
+        elif self.consistency == "quorum":
+            ack = self.quorum_head([("set", key, value)])
+            client_message = {"status": "success", "message": f"Inserted at node {self.ip}:{self.port} (quorum)",
+                              "key": key, "value": value, "hops": hops}
+            # The client hears of the write once W copies hold it.
+            ack.add_done_callback(lambda done: done.result() and self.notify_client(client_ip, client_port, client_message))
+            return client_message, [ack]
         else:
             assert self.consistency == "linearizability", "Chain replication is only supported with linearizable consistency"
-            # If primary, apply the write locally.
-            self.data_store[key] = self.data_store.get(key, "") + value # Concatenate the value if the key already exists
-            print(f"[WRITE] Node {self.node_id} stored key '{key}' with value '{self.data_store[key]}'")
-            # Call the successor to insert replicas.
-            self.forward_replicate(key, value, replication_count, False, self.node_id, client_ip, client_port)
-            return {"status": "success", "message": f"Inserted at node {self.ip}:{self.port}", "key": key, "value": value} # Return success message
+            # If primary, apply the write locally and send it down the chain.
+            ack = self.chain_head("set", key, value, client_ip, client_port)
+            print(f"[WRITE] Node {self.node_id} appended '{value}' to key '{key}'")
+            return {"status": "success", "message": f"Inserted at node {self.ip}:{self.port}", "key": key, "value": value, "hops": hops}, [ack] # Return success message
 
+    def store_primary(self, key, value):
+        """
+        Apply a write to the primary copy of a key, appending the value if the key already exists.
+        Appends do not copy the stored value (see rope.Rope). Returns the new value.
+        """
+        return self.data_store.append(key, value)
+
+    @replica_write("/insertReplicas")
     def insertReplicas(self, key, value, replication_count, join=False, starting_node=None, client_ip=None, client_port=None):
         """
         Replica insertion method for chain replication.
@@ -86,6 +574,46 @@ class Node:
         This method stores the key into the replicas dictionary on the current node,
         then (if needed) forwards the request to the successor with a decremented replication_count.
         """
+        wrapped, request = self.replica_step(key, value, replication_count, join, starting_node, client_ip,
+                                             client_port)
+        if request is not None:
+            self.forward_replicate(*request)
+        return wrapped
+
+    def replica_step(self, key, value, replication_count, join, starting_node, client_ip=None, client_port=None):
+        """
+        Store a replica write arriving down the chain (see insertReplicas). Returns a message if the chain
+        wrapped around to the primary (None otherwise), and the next member with its /insertReplicas payload
+        if the write goes on (None at the end of the chain, where the tail tells the client, see tail_message).
+        """
+        wrapped = self.store_replica(key, value, replication_count, join)
+        if wrapped is not None:
+            return wrapped, None
+        # If more replicas are needed, forward the request (the stored count tells where the chain ends).
+        replication_count = self.replicas.get(key, (None, replication_count))[1]
+        successor = self.replication_next(replication_count, starting_node)
+        if successor is None:
+            # return from last node of the chain, only from linearizability
+            client_message = self.tail_message(key, value, client_ip)
+            if client_message:
+                self.notify_client(client_ip, client_port, client_message)
+            return None, None
+        return None, (successor, {
+            "key": key,
+            "value": value,
+            "replication_count": int(replication_count) - 1,
+            "join": join,
+            "starting_node": starting_node,
+            "client_ip": client_ip,
+            "client_port": client_port
+        })
+
+    def store_replica(self, key, value, replication_count, join=False, replace=False):
+        """
+        Write a replica locally, saving its value and its replica count.
+        A replace write carries the whole current value of the key instead of a value to append.
+        Returns a message if the chain wrapped around to the primary (nothing is stored), otherwise None.
+        """
         # Check if the node is the starting point after completing a circle
         if key in self.data_store:
             return {"status": "success",
@@ -93,63 +621,100 @@ class Node:
 
         # Write the replica locally saving its value and its replica count.
         if not join:
-            # If the key already exists, append the new value to the existing one when we have insertion replicas
-            self.replicas[key] = self.replicas.get(key, ("", 0))[0] + value, int(replication_count)
+            # If the key already exists, append the new value to the existing one when we have insertion replicas.
+            # An existing replica keeps its count: only joins and departures move replicas along the chain,
+            # and a write that raced with one may carry a stale count.
+            if replace:
+                self.replicas[key] = value, int(self.replicas.get(key, (None, replication_count))[1])
+            else:
+                self.replicas.append(key, value, int(replication_count))
             print(
-                f"[WRITE_INSERT] Node {self.node_id} stored replica key '{key}' with value '{self.replicas[key]}' and replica_count:{replication_count}")
+                f"[WRITE_INSERT] Node {self.node_id} stored replica key '{key}' with value '{value}' and replica_count:{replication_count}")
         else:
             # If the key already exists, append the new value to the existing one when we have join replicas
             self.replicas[key] = (value, int(replication_count))
             print(
                 f"[WRITE_JOIN/DEPART] Node {self.node_id} stored replica key '{key}' with value '{self.replicas[key]}' and replica_count:{replication_count}")
-        # If more replicas are needed, forward the request.
-        self.forward_replicate(key, value, replication_count, join, starting_node, client_ip, client_port)
+        return None
 
-    def forward_replicate(self, key, value, replication_count, join, starting_node, client_ip=None, client_port=None):
+    def replica_append(self, key, entry, replication_count, versioned=True):
         """
-        Asynchronously propagate the write for eventual consistency.
-        Decrement replication_count before sending to ensure exactly kfactor copies.
+        Apply a replicated write of key that carries only the appended segment, on top of the copy it was
+        appended to: the sender's copy had length entry["offset"] and (if versioned) version entry["base"].
+        A replace write carries the whole value instead. Returns "resync" if this node's copy is a different
+        one (nothing is stored: the sender has to send the whole value), "wrapped" if the chain wrapped around
+        to the primary, otherwise None.
         """
-        if client_ip:
-            client_url = f"http://{client_ip}:{client_port}/reception"
-        
-        if self.successor["node_id"] != starting_node:
-            print(key)
-            print(value)
-            if int(replication_count) > 1:
-                try:
-                    url = f"http://{self.successor['ip']}:{self.successor['port']}/insertReplicas"
-                    requests.post(url, json={
-                        "key": key,
-                        "value": value,
-                        "replication_count": int(replication_count) - 1,
-                        "join": join,
-                        "starting_node": starting_node,
-                        "client_ip": client_ip,
-                        "client_port": client_port
-                    })
-                except Exception as e:
-                    print(f"[ERROR] Forward replication failed at node {self.node_id}: {e}")
-            else:
-                #return from last node of the chain, only from linearizability, check
-                if(self.consistency == "linearizability" and client_ip):
-                    client_message = {"status": "success", "message": f"Inserted at tail node {self.ip}:{self.port}", "key": key, "value": value}
-                    requests.post(client_url, json=client_message)
-                print(f"Circular replication completed for key '{key}'")
-        else:
-            #return from last node of the chain, check
-            if(self.consistency == "linearizability" and client_ip):
-                client_message = {"status": "success", "message": f"Inserted at tail node {self.ip}:{self.port}", "key": key, "value": value}
-                requests.post(client_url, json=client_message)
-            print(f"Circular replication completed for key '{key}'")
+        if not entry.get("replace") and key not in self.data_store:
+            current = self.replicas.get(key, (None, 0))[0]
+            base = tuple(entry["base"]) if entry.get("base") else None
+            if len(current or "") != entry["offset"] or (versioned and self.chain_applied.get(key) != base):
+                return "resync"
+        if self.store_replica(key, entry["value"], replication_count, replace=bool(entry.get("replace"))) is not None:
+            return "wrapped"
+        return None
+
+    def replication_next(self, replication_count, starting_node):
+        """
+        Return the node a chain write must be forwarded to (see chain_successor), or None if this node is the
+        end of the chain (the replication count is exhausted or the chain wrapped around the ring).
+        """
+        if int(replication_count) > 1:
+            return self.chain_successor(starting_node)
+        return None
+
+    def chain_successor(self, starting_node):
+        """
+        The node after this one in the replica chain of the keys of starting_node (their primary), or None
+        if the chain wraps around to it. That is the successor, unless the successor's process already has
+        a token in the chain (virtual nodes): then the first ring member after it from another process, so
+        no process holds two copies of a key.
+        """
+        successor = self.successor
+        if successor["node_id"] == starting_node:
+            return None
+        if not self.membership.shared_hosts:
+            return successor
+        members = self.membership.alive()
+        chain = self.chain_from(starting_node, members)
+        position = next((i for i, member in enumerate(chain) if member["node_id"] == self.node_id), None)
+        if position is None:
+            return successor  # not in the chain by this node's view of the ring: keep to the successor
+        hosts = {vnodes.host(member) for member in chain[:position + 1]}
+        start = bisect.bisect_right([member["node_id"] for member in members], self.node_id)
+        for peer in [successor] + [members[(start + offset) % len(members)] for offset in range(len(members))]:
+            if peer["node_id"] in (starting_node, self.node_id):
+                return None
+            if vnodes.host(peer) not in hosts and peer["node_id"] not in self.membership.down:
+                return peer
+        return None
 
-    def query(self, key, client_ip, client_port):
+    def tail_message(self, key, value, client_ip):
+        """
+        Message the tail of the chain sends to the client (linearizability only), or None.
+        """
+        print(f"Circular replication completed for key '{key}'")
+        if self.consistency == "linearizability" and client_ip:
+            return {"status": "success", "message": f"Inserted at tail node {self.ip}:{self.port}", "key": key, "value": value}
+        return None
+
+    def forward_replicate(self, successor, payload):
+        """
+        Send a replica write (a replica_step payload, with the decremented replication_count) to the next
+        member of the chain.
+        """
+        try:
+            self.transport.post(successor, "/insertReplicas", json=payload)
+        except Exception as e:
+            print(f"[ERROR] Forward replication failed at node {self.node_id}: {e}")
+
+    def query(self, key, client_ip, client_port, hops=0, direct=False, routing="recursive"):
         """
         Query operation supporting both eventual and linearizable consistency.
 
         For eventual consistency:
           - Look up the key in the local primary store, and if not found,
-            in the replica store. If still not found, forward the query.
+            in the replica store. If still not found, read it from one of its replicas (see replica_read).
 
         For linearizable consistency (chain replication):
           - If no read_count is provided, this is the initial query.
@@ -157,269 +722,1211 @@ class Node:
             the query to the responsible node. If responsible, start the chain
             query with a replication count of self.k_factor.
           - If read_count is provided, we are already in the chain query.
+
+        The returned message carries the number of routing hops the request took.
         """
-        client_url = f"http://{client_ip}:{client_port}/reception"
+        result = self._query(key, client_ip, client_port, hops, direct, routing)
+        result.setdefault("hops", hops)
+        return result
 
+    def _query(self, key, client_ip, client_port, hops, direct=False, routing="recursive"):
         if key == "*":
              return self.query_all_nodes()
-            
+
         key_hash = hf.hash_function(key)
-        
+        # A caller that routes the request itself is told where to go instead of reading another replica.
+        action, client_message = self.plan_query(key, key_hash, routed=not direct and routing != "iterative")
+        if action == "replicas":
+            client_message = self.replica_read(key, key_hash)
+            action = "forward" if client_message is None else "reply"
+        if action == "forward":
+            # Forward the query to the responsible node.
+            return self.unrouted_reply(key, key_hash, hops, direct, routing) or self.forward(
+                key_hash, "/query", {"key": key, "client_ip": client_ip, "client_port": client_port, "hops": hops})
+        if action == "chain":
+            # Dirty key: ask the tail which version is committed.
+            client_message = self.check_version(key, self.k_factor, self.node_id)
+        if action == "quorum":
+            client_message = self.quorum_read([key])[key]
+        self.notify_client(client_ip, client_port, client_message)
+        return client_message
+
+    def plan_query(self, key, key_hash, routed=True):
+        """
+        Decide locally how a (non "*") query is served; routed tells whether this node may route the query
+        itself (recursive routing). Returns (action, message) where action is:
+          - "reply":   this node answers with message.
+          - "forward": the query must be forwarded towards the responsible node.
+          - "chain":   this node is the primary, its copy is dirty and the committed version must be
+                       asked from the chain tail (see versioned_reply).
+          - "quorum":  this node is the primary and reads the key from R copies (see quorum_read).
+          - "replicas": eventual consistency, this node has no copy and reads one of the key's replicas
+                        (only when routed, otherwise the query is "forward").
+        """
         if self.consistency == "eventual":
-            
-            should_be_here = self.node_id == self.predecessor["node_id"] or hf.in_interval(key_hash,
-                                                                                       self.predecessor["node_id"],
-                                                                                       self.node_id)
             #Handle eventual consistency query by checking local primary and replica stores.
 
             # Check primary data store if the key is in the interval.
-            if should_be_here:
+            if self.is_responsible(key_hash):
                 primary_value = self.data_store.get(key, "Key not found")
                 if primary_value != "Key not found":
                     print(f"[READ-EC] Node {self.node_id} found primary for '{key}' with value '{primary_value}'")
-                    ##TODO return original, check             
                     client_message = {"status": f"success from  NODE {self.ip}:{self.port}", "key": key, "value": primary_value}
-
                 else:
-                    ##TODO not found, check
                     client_message = {"status": "error", "message": f"Key '{key}' not found in node {self.node_id}"}
-
-                requests.post(client_url, json=client_message)
-                return client_message    
+                return "reply", client_message
             # Check replica store (stale values are acceptable).
             replica_value, _ = self.replicas.get(key, ("Key not found", 0))
             if replica_value != "Key not found":
                 print(f"[READ-EC] Node {self.node_id} found replica for '{key}' with value '{replica_value}'")
-                ## TODO return replica, check               
                 client_message = {"status": f"success from  replica NODE {self.ip}:{self.port}", "key": key, "replica value": replica_value}
-                requests.post(client_url, json=client_message)
-                return client_message
-            
-            # Forward the query to the responsible node.
-            url = f"http://{self.successor['ip']}:{self.successor['port']}/query"
-            response = requests.post(url, json={"key": key, "client_ip": client_ip, "client_port": client_port})
-            return response.json()
-            
-        else:
-            assert self.consistency == "linearizability"
-            # Linearizable consistency
-
-            # Corner case: if the node is the only one in the ring
-            if self.node_id == self.predecessor["node_id"]:
-                if key in self.data_store:
-                    ## TODO return original, one node, check
-                    client_message = {"status": f"success from  NODE {self.ip}:{self.port}", "key": key, "value": self.data_store[key]}
-                    requests.post(client_url, json=client_message)
-                    return client_message
-                
-                else:
-                    ## TODO not found, check
-                    client_message = {"status": "error", "message": f"Key '{key}' not found in the only node in the ring"}
-                    requests.post(client_url, json=client_message)
-                    return client_message
-
-            # Initial query: ensure the query starts at the node responsible for the key.
-            if not hf.in_interval(key_hash, self.predecessor["node_id"], self.node_id):
-                # Forward the query to the responsible node.
-                url = f"http://{self.successor['ip']}:{self.successor['port']}/query"
-                response = requests.post(url, json={"key": key, "client_ip": client_ip, "client_port": client_port})
-                return response.json()
-            else:
-                # case of kfactor 1.
-                if(self.k_factor == 1):
-                    if key in self.data_store:
-                        client_message = {"status": f"success from  NODE {self.ip}:{self.port}", "key": key, "value": self.data_store[key]}
-                        requests.post(client_url, json=client_message)
-                        return client_message
-                    else:
-                        client_message = {"status": "error", "message": f"Key '{key}' not found in node {self.node_id}"}
-                        requests.post(client_url, json=client_message)
-                        return client_message
-                    
-                return self.query_chain(self.successor['ip'], self.successor['port'], key, self.k_factor - 1,
-                                        self.node_id, client_ip, client_port)
+                return "reply", client_message
+            return ("replicas", None) if routed else ("forward", None)
+
+        if self.consistency == "quorum":
+            # The primary coordinates the read of R copies.
+            return ("quorum", None) if self.is_responsible(key_hash) else ("forward", None)
+
+        assert self.consistency == "linearizability"
+        # Linearizable consistency
+
+        # Corner case: if the node is the only one in the ring
+        if self.node_id == self.predecessor["node_id"]:
+            if key in self.data_store:
+                return "reply", {"status": f"success from  NODE {self.ip}:{self.port}", "key": key, "value": self.data_store[key]}
+            return "reply", {"status": "error", "message": f"Key '{key}' not found in the only node in the ring"}
+
+        # Initial query: ensure the query starts at the node responsible for the key.
+        if not hf.in_interval(key_hash, self.predecessor["node_id"], self.node_id):
+            return "forward", None
+        # case of kfactor 1, or a clean key (CRAQ): the primary answers itself.
+        if self.k_factor == 1 or key not in self.dirty:
+            if key in self.data_store:
+                return "reply", {"status": f"success from  NODE {self.ip}:{self.port}", "key": key, "value": self.data_store[key]}
+            return "reply", {"status": "error", "message": f"Key '{key}' not found in node {self.node_id}"}
+        return "chain", None
+
+    def replica_set(self, key_hash):
+        """
+        The nodes holding a copy of the key with this hash, primary first, from the membership table.
+        """
+        return self.chain_from(key_hash, self.membership.alive())
+
+    def chain_from(self, key_hash, members):
+        """
+        The replica chain of the key hash key_hash among the ring members `members` (sorted by node id): its
+        primary, then the next members, skipping the tokens of a process already in the chain, up to k_factor.
+        """
+        return vnodes.chain(members, key_hash, self.k_factor)
+
+    def replica_read(self, key, key_hash):
+        """
+        Eventual consistency read of a key this node has no copy of: ask one of the key's replicas for its copy,
+        chosen by the read policy and hedged to a second replica when slow (see balancer.ReplicaSelector.read).
+        Returns None if no replica answered, so the query is forwarded as before.
+        """
+        members = self.replica_set(key_hash)
+        replicas = [peer for peer in members if peer["node_id"] != self.node_id]
+        if not replicas:
+            return None
+        peer, copies = self.read_selector.read(
+            self.read_pool, replicas,
+            lambda peer: self.transport.post(peer, "/quorum_read", json={"keys": [key]}).json()["copies"],
+            lambda copies: copies[key]["value"] is not None)
+        if copies is None:
+            return None
+        value = copies[key]["value"]
+        if value is None:
+            return {"status": "error", "message": f"Key '{key}' not found in its replicas"}
+        print(f"[READ-EC] Node {self.node_id} read '{key}' from node {peer['node_id']}")
+        if peer["node_id"] == members[0]["node_id"]:
+            return {"status": f"success from  NODE {peer['ip']}:{peer['port']}", "key": key, "value": value}
+        return {"status": f"success from  replica NODE {peer['ip']}:{peer['port']}", "key": key,
+                "replica value": value}
 
     def query_all_nodes(self):
         """
         Retrieve all data and replica values from all nodes in the DHT.
+        Built on the paginated scan, fetching all nodes in parallel (see scan_ring).
         """
-        all_data = []
-        current_node = self
-        starting_node_id = self.node_id
+        all_data = {}
+        with closing(self.scan_ring()) as records:
+            for record in records:
+                if "error" in record:
+                    return {"status": "error", "message": f"Failed to scan node {record['node_id']}: {record['error']}"}
+                node_data = all_data.setdefault(record["node_id"], {"node_id": record["node_id"], "data": {},
+                                                                    "replica_values": {}})
+                if record["replica"]:
+                    node_data["replica_values"][record["key"]] = (record["value"], record["replication_count"])
+                else:
+                    node_data["data"][record["key"]] = record["value"]
+        return {"status": "success", "all_data": list(all_data.values())}
 
-        while True:
-            node_info = {
-                "node_id": current_node.node_id,
-                "data": current_node.data_store,
-                "replica_values": current_node.replicas
-            }
-            all_data.append(node_info)
+    def scan_local(self, cursor=None, limit=1000, include_replicas=True):
+        """
+        Return one page of the items stored on this node and the cursor of the next page (None at the end).
 
-            if current_node.successor["node_id"] == starting_node_id:
-                break
-            url = f"http://{current_node.successor['ip']}:{current_node.successor['port']}/node_info"
-            response = requests.get(url)
-            if response.status_code != 200:
-                return {"status": "error", "message": f"Failed to get node info from successor: {response.text}"}
-            node_info = response.json()
-            current_node = Node(node_info["ip"], node_info["port"], data_store=node_info["data_store"],
-                                replicas=node_info["replicas"], successor=node_info["successor"],
-                                predecessor=node_info["predecessor"])
-            
-        return {"status": "success", "all_data": all_data}
+        Primary items come first, then replicas, each in key hash order. The cursor is "d:<hash>:<key>" or
+        "r:<hash>:<key>" (the last item returned); the page is read from the stores' hash index by bisection,
+        so a page costs O(log n + limit).
+        """
+        stores = [("d", self.data_store)]
+        if include_replicas:
+            stores.append(("r", self.replicas))
+        position = None
+        if cursor:
+            kind_after, key_hash, key_after = cursor.split(":", 2)
+            position = (int(key_hash), key_after)
+        else:
+            kind_after = "d"
+        page = []
+        for kind, store in stores:
+            if kind < kind_after:
+                continue
+            keys = store.keys_after(position if kind == kind_after else None, limit - len(page))
+            for key in keys:
+                try:
+                    item = store[key]
+                except KeyError:
+                    continue
+                if kind == "d":
+                    page.append({"key": key, "value": item, "replica": False, "node_id": self.node_id})
+                else:
+                    value, rep_count = item
+                    page.append({"key": key, "value": value, "replica": True, "replication_count": rep_count,
+                                 "node_id": self.node_id})
+            if len(page) >= limit:
+                last = page[-1]
+                return page, f"{'r' if last['replica'] else 'd'}:{hashing.hash_key(last['key'])}:{last['key']}"
+        return page, None
 
-    def query_chain(self, ip, port, key, replication_count, starting_id, client_ip, client_port):
+    def scan_ring(self, include_replicas=True, page_size=1000):
+        """
+        Stream the items of every node in the ring. The membership comes from the overlay and all
+        nodes are paged through /scan in parallel, so the results never have to fit in memory at once.
+        """
+        nodes = self.overlay()["overlay"]
+        return scan_nodes(self.transport, nodes, include_replicas, page_size)
+
+    def query_chain(self, key, replication_count, starting_id):
         """
         Handle a linearizable consistency query as part of a chain replication.
 
         Check the local replica store. If the replica's replication counter is 1,
         then this node is the tail and returns the final value. Otherwise, forward
-        the query to the successor with a decremented replication count.
-        """
-        client_url = f"http://{client_ip}:{client_port}/reception"
-        # Get the info of current node
-        url = f"http://{ip}:{port}/node_info"
-        response = requests.get(url)
-        if response.status_code != 200:
-            return {"status": "error", "message": f"Failed to get node info from successor: {response.text}"}
-        replicas = response.json().get("replicas")  # Get the replicas of the current node
-        successor = response.json().get("successor")  # Get the successor of the current node in case of mismatch
-        if key in replicas:
-            replica_value, rep_count = replicas[key]
-        else:
-            replica_value = "Key not found"
-            rep_count = 0
-        if replica_value != "Key not found" and (
-                rep_count == 1 or successor['node_id'] == starting_id):  # Only the tail node returns the final value.
-            print(f"[READ-LIN] Tail node {port} returning final value '{replica_value}' for key '{key}'")
-            ## TODO return original from tail, check
-            client_message = {"status": f"success from TAIL NODE {ip}:{port}", "key": key, "value": replica_value}
-            requests.post(client_url, json=client_message)
-            return client_message
-        else:
-            if replication_count > 1:
-                print(f"[READ-LIN] Node {port} forwarding query for key '{key}' to node {successor['port']}")
-                return self.query_chain(successor['ip'], successor['port'], key, replication_count - 1, starting_id, client_ip, client_port)
-            else:
-                ## TODO not found, check
-                client_message = {"status": "error", "message": f"Key '{key}' not found in linearizable chain"}
-                requests.post(client_url, json=client_message)
-                return client_message
+        the query to the successor (/query_chain) with a decremented replication count.
+        Only the requested key travels between chain members.
+        """
+        action, result = self.chain_read_step(key, replication_count, starting_id)
+        if action == "next":
+            print(f"[READ-LIN] Node {self.port} forwarding query for key '{key}' to node {result['port']}")
+            response = self.transport.post(result, "/query_chain", json={
+                "key": key,
+                "replication_count": replication_count - 1,
+                "starting_id": starting_id
+            })
+            return response.json()
+        if action == "check":
+            return self.check_version(key, result, starting_id)
+        return result
+
+    def chain_read_step(self, key, replication_count, starting_id):
+        """
+        Evaluate this node as a member of a read chain.
+        Returns ("reply", message) if the chain read ends here, ("next", successor) to continue, or
+        ("check", replication_count) if the version committed by the tail must be checked (see check_version).
+
+        Reads are apportioned (CRAQ): the tail answers with its value, any other member answers a clean key
+        from its own copy and, for a dirty key, asks the tail which version is committed.
+        """
+        replica_value, rep_count = self.replicas.get(key, ("Key not found", 0))
+        following = self.chain_successor(starting_id)
+        is_tail = rep_count == 1 or following is None
+        if replica_value != "Key not found" and is_tail:  # Only the tail node returns the final value.
+            print(f"[READ-LIN] Tail node {self.port} returning final value '{replica_value}' for key '{key}'")
+            return "reply", {"status": f"success from TAIL NODE {self.ip}:{self.port}", "key": key, "value": replica_value}
+        if key in self.dirty and not is_tail:
+            return "check", rep_count or replication_count
+        if replica_value != "Key not found":
+            print(f"[READ-LIN] Node {self.port} returning clean value '{replica_value}' for key '{key}'")
+            return "reply", {"status": f"success from CLEAN NODE {self.ip}:{self.port}", "key": key, "value": replica_value}
+        if replication_count > 1 and following is not None:
+            return "next", following
+        return "reply", {"status": "error", "message": f"Key '{key}' not found in linearizable chain"}
+
+    def committed_version(self, key, replication_count, starting_id):
+        """
+        Version check of a dirty read: walk down the chain to the tail and return the version of key it has
+        committed (None if it has none), with the tail's address.
+        """
+        action, result = self.committed_version_step(key, replication_count, starting_id)
+        if action == "next":
+            return self.transport.post(result, "/committed_version", json={
+                "key": key,
+                "replication_count": replication_count - 1,
+                "starting_id": starting_id
+            }).json()
+        return result
+
+    def committed_version_step(self, key, replication_count, starting_id):
+        """
+        Evaluate this node as a member of a version check: ("next", member) if the check goes on to the next
+        member of the chain (see chain_successor), otherwise ("reply", the version this node has committed).
+        """
+        rep_count = self.replicas.get(key, (None, replication_count))[1]
+        following = self.chain_successor(starting_id)
+        if rep_count > 1 and replication_count > 1 and following is not None:
+            return "next", following
+        return "reply", {"status": "success", "key": key, "version": self.chain_applied.get(key),
+                         "node": self.address()}
+
+    def check_version(self, key, replication_count, starting_id):
+        """
+        Answer a read of a dirty key: ask the tail for the committed version and return this node's copy
+        of that version, or the tail's value if this node does not hold that version.
+        """
+        check = self.transport.post(self.chain_successor(starting_id) or self.successor, "/committed_version", json={
+            "key": key,
+            "replication_count": replication_count - 1,
+            "starting_id": starting_id
+        }).json()
+        reply = self.versioned_reply(key, check)
+        if reply is None:
+            reply = self.tail_reply(key, self.transport.get(check["node"], "/replica", params={"key": key}).json())
+        return reply
+
+    def versioned_reply(self, key, check):
+        """
+        The read answer for key at the committed version reported by the tail (a /committed_version result),
+        marking that version clean; None if this node does not hold that version (the tail's value is read then).
+        """
+        if not check.get("version"):
+            return None  # the tail got the key outside the chain (join or hand-off): no version to compare
+        version = tuple(check["version"])
+        with self.chain_lock:
+            record = self.dirty.get(key)
+            versions = [record["clean"]] + record["pending"] if record else []
+            match = [value for entry_version, value in versions if entry_version == version]
+            self.mark_clean(key, version)
+        if not match:
+            return None
+        if match[0] is None:
+            return {"status": "error", "message": f"Key '{key}' not found in linearizable chain"}
+        print(f"[READ-CRAQ] Node {self.port} returning committed value '{match[0]}' for key '{key}'")
+        return {"status": f"success from NODE {self.ip}:{self.port} (committed version)", "key": key,
+                "value": match[0]}
+
+    def tail_reply(self, key, replica):
+        """
+        Read answer built from the tail's /replica result.
+        """
+        if replica.get("status") != "success":
+            return {"status": "error", "message": f"Key '{key}' not found in linearizable chain"}
+        return {"status": f"success from TAIL NODE {replica['node_id']}", "key": key, "value": replica["value"]}
+
+    def mark_dirty(self, key, version, value, previous):
+        """
+        Record an uncommitted version of key (callers hold chain_lock). previous is the (version, value) the
+        write replaces; if the key was clean it becomes the clean version.
+        """
+        record = self.dirty.get(key)
+        if record is None:
+            record = self.dirty[key] = {"clean": previous, "pending": []}
+        record["pending"].append((version, value))
+
+    def mark_clean(self, key, version):
+        """
+        The tail committed this version of key: it and the older pending versions are clean
+        (callers hold chain_lock). The key is clean again once no newer version is pending.
+        """
+        record = self.dirty.get(key)
+        if record is None or version is None:
+            return
+        versions = [entry_version for entry_version, _ in record["pending"]]
+        if version not in versions:
+            return
+        position = versions.index(version)
+        record["clean"] = record["pending"][position]
+        del record["pending"][:position + 1]
+        if not record["pending"]:
+            del self.dirty[key]
+
+    def clean_version(self, key):
+        """
+        The newest version of key known to be committed (callers hold chain_lock).
+        """
+        record = self.dirty.get(key)
+        return record["clean"][0] if record else self.chain_applied.get(key)
+
+    def replica_lookup(self, key):
+        """
+        Return the local replica of a single key with its replication count (position in the chain).
+        """
+        if key not in self.replicas:
+            return {"status": "error", "message": f"Replica '{key}' not found at node {self.node_id}"}
+        value, rep_count = self.replicas[key]
+        return {"status": "success", "key": key, "value": value, "replication_count": rep_count,
+                "node_id": self.node_id, "successor": self.successor}
+
+    def local_value(self, key):
+        """
+        This node's copy of key (primary, else replica), or None.
+        """
+        value = self.data_store.get(key)
+        if value is None:
+            value = self.replicas.get(key, (None, 0))[0]
+        return value
 
-    def delete(self, key):
+    def value_segments(self, key):
+        """
+        This node's copy of key (primary, else replica) as the list of its segments, for a read that streams
+        the value without joining it; None if this node holds no copy.
+        """
+        value = self.local_value(key)
+        if value is None:
+            return None
+        return value.segments() if isinstance(value, rope.Rope) else [value]
+
+    def delete(self, key, hops=0, direct=False, routing="recursive"):
         """
         Delete a key from the DHT.
-        If this node is responsible, delete locally; otherwise, forward the request to the successor.
+        If this node is responsible, delete locally; otherwise, forward the request towards the owner.
         """
         key_hash = hf.hash_function(key)
-        should_be_here = self.node_id == self.predecessor["node_id"] or hf.in_interval(key_hash,
-                                                                                    self.predecessor["node_id"],
-                                                                                    self.node_id)
-        if should_be_here:
-            self.data_store.pop(key, "Key not inserted")
-            if self.consistency == "eventual":
-                if self.k_factor > 1:
-                    # Open a thread to forward delete replicas and return immediately
-                    t = threading.Thread(target=self.forward_delete_replicas,
-                                        args=(key, self.k_factor - 1, self.node_id), daemon=True,
-                                        name="forward_delete_replicas")
-                    t.start()  # Start the thread
-                return {"status": "success", "message": f"Deleted '{key}' from node {self.node_id} (eventual consistency)"}
+        with self.write_guard():
+            if self.is_responsible(key_hash):
+                result, acks = self.apply_delete(key, hops)
             else:
-                assert self.consistency == "linearizability"
-                if self.k_factor > 1:
-                    # I need to delete the replicas of this key on the other nodes
-                    self.forward_delete_replicas(key, self.k_factor - 1, self.node_id)
-                return {"status": "success", "message": f"Deleted '{key}' from node {self.node_id} (linearizability)"}
+                result = None
+        if result is not None:
+            return self.await_acks(result, acks)
+        return self.unrouted_reply(key, key_hash, hops, direct, routing) or self.forward(
+            key_hash, "/delete", {"key": key, "hops": hops})
+
+    def apply_delete(self, key, hops=0):
+        """
+        Delete a key owned by this node and its replicas down the chain.
+        Returns the answer and the acks it has to wait for (see await_acks).
+        """
+        if self.consistency == "eventual":
+            self.data_store.pop(key, "Key not inserted")
+            if self.k_factor > 1:
+                # Queue the delete for the replication workers and return immediately
+                self.forget_replicated([key])
+                self.replication_queue.submit(key, "del")
+            return {"status": "success", "message": f"Deleted '{key}' from node {self.node_id} (eventual consistency)",
+                    "hops": hops}, []
+        elif self.consistency == "quorum":
+            ack = self.quorum_head([("del", key, None)])
+            return {"status": "success", "message": f"Deleted '{key}' from node {self.node_id} (quorum)",
+                    "hops": hops}, [ack]
         else:
-            url = f"http://{self.successor['ip']}:{self.successor['port']}/delete"
-            response = requests.post(url, json={"key": key})
-            return response.json()
-    
-    def deleteReplicas(self, key, replication_count):
+            assert self.consistency == "linearizability"
+            # Delete locally and send the delete down the chain, in order with the writes of the key
+            ack = self.chain_head("del", key)
+            return {"status": "success", "message": f"Deleted '{key}' from node {self.node_id} (linearizability)",
+                    "hops": hops}, [ack]
+
+    @replica_write("/deleteReplicas")
+    def deleteReplicas(self, key, replication_count, starting_node=None):
         """
         Delete a key from the replicas.
+        starting_node is the primary of the key's chain; a sender that does not say leaves it to this node's
+        view of the ring (see primary_of).
         """
-        result = self.replicas.pop(key, None)
-        if result is None:
-            return {"status": "success", "message": f"Replica '{key}' not found at node {self.node_id}, stopping propagation"}
-        if replication_count > 1:
-            self.forward_delete_replicas(key, replication_count - 1, self.node_id)
-        return {"status": "success", "message": f"Deleted replicas of '{key}' from node {self.node_id}"}
+        result, request = self.delete_replica_step(key, replication_count, starting_node)
+        if request is not None:
+            self.forward_delete_replicas(*request)
+        return result
 
-    def forward_delete_replicas(self, key, replication_count, starting_node):
+    def delete_replica_step(self, key, replication_count, starting_node=None):
         """
-        Propagate the delete for replicas.
-        Decrement replication_count before sending to ensure exactly kfactor copies are deleted.
+        Delete the local replica of key for a chain delete (see deleteReplicas). Returns the answer, and the next
+        member of the key's chain (see chain_successor) with its /deleteReplicas payload, or None where the
+        delete stops.
         """
-        if self.successor["node_id"] != starting_node:
-            try:
-                url = f"http://{self.successor['ip']}:{self.successor['port']}/deleteReplicas"
-                response = requests.post(url, json={
-                    "key": key,
-                    "replication_count": replication_count
-                })
-                if response.status_code != 200:
-                    print(f"[ERROR] Forward delete replication failed at node {self.node_id}: {response.text}")
-            except Exception as e:
-                print(f"[ERROR] Forward delete replication failed at node {self.node_id}: {e}")
-        else:
+        if self.replicas.pop(key, None) is None:
+            return {"status": "success", "message": f"Replica '{key}' not found at node {self.node_id}, stopping propagation"}, None
+        result = {"status": "success", "message": f"Deleted replicas of '{key}' from node {self.node_id}"}
+        if replication_count <= 1:
+            return result, None
+        starting_node = starting_node or self.primary_of(key)
+        following = self.chain_successor(starting_node)
+        if following is None:
             print(f"Circular delete replication completed for key '{key}'")
+            return result, None
+        # Decrement replication_count before sending to ensure exactly kfactor copies are deleted.
+        return result, (following, {"key": key, "replication_count": replication_count - 1,
+                                    "starting_node": starting_node})
+
+    def primary_of(self, key):
+        """
+        Node id of the primary of key by the membership table.
+        """
+        return self.replica_set(hf.hash_function(key))[0]["node_id"]
+
+    def forward_delete_replicas(self, following, payload):
+        """
+        Propagate the delete for replicas (a delete_replica_step payload) to the next member of the key's chain.
+        """
+        try:
+            response = self.transport.post(following, "/deleteReplicas", json=payload)
+            if response.status_code != 200:
+                print(f"[ERROR] Forward delete replication failed at node {self.node_id}: {response.text}")
+        except Exception as e:
+            print(f"[ERROR] Forward delete replication failed at node {self.node_id}: {e}")
+
+    # CHAIN REPLICATION PIPELINE
+    def chain_head(self, op, key, value=None, client_ip=None, client_port=None):
+        """
+        Apply a linearizable write ("set" appends value, "del" removes the key) at the head of the key's chain
+        and queue it for the successor with the next sequence number. Does not wait for the chain:
+        returns a future the tail's ack resolves (already resolved when there is no chain to replicate to).
+        Replicas receive the appended value with the version and length of the value it was appended to
+        (see replica_append), and the whole value only if their copy is not that one.
+        """
+        with self.chain_lock:
+            previous = (self.chain_applied.get(key), self.data_store.get(key))
+            full = None
+            if op == "set":
+                full = self.store_primary(key, value)
+            else:
+                self.data_store.pop(key, None)
+            self.chain_seq += 1
+            seq = self.chain_seq
+            ack = self.chain_acks.expect(key, seq)
+            # The entry also carries the newest committed version, so members can drop older dirty versions.
+            entry = {"op": op, "key": key, "value": value, "seq": seq, "count": self.k_factor - 1,
+                     "head": self.address(), "base": previous[0], "offset": len(previous[1] or ""),
+                     "committed": self.clean_version(key), "client_ip": client_ip, "client_port": client_port}
+            if self.replication_next(self.k_factor, self.node_id) is not None:
+                self.mark_dirty(key, (self.node_id, seq), full, previous)
+                self.chain_applied[key] = (self.node_id, seq)
+                self.chain_sender.submit(dict(entry, full=full))
+                return ack
+            self.chain_applied[key] = (self.node_id, seq)
+        # No replicas: this node is also the tail.
+        self.chain_tail(entry)
+        return ack
+
+    @replica_write("/chain_write")
+    def chain_write(self, entries):
+        """
+        Apply a batch of chain writes received from the predecessor, in order, and pass each one on to the
+        successor (or ack it if this node is the tail). Returns as soon as they are queued downstream.
+        A write already applied here (same head, sequence number not newer) is skipped. An appended value that
+        does not fit this node's copy (see replica_append) is not applied, nor are the later writes of its key
+        in the batch: their positions are returned as "resync", for the sender to send again as whole values.
+        """
+        applied, resync, deferred = 0, [], set()
+        with self.chain_lock:
+            for position, entry in enumerate(entries):
+                key, head_id, count = entry["key"], entry["head"]["node_id"], entry["count"]
+                if key in deferred:
+                    resync.append(position)
+                    continue
+                last = self.chain_applied.get(key)
+                if last is not None and last[0] == head_id and entry["seq"] <= last[1]:
+                    continue
+                previous = (self.chain_applied.get(key), self.replicas.get(key, (None, 0))[0])
+                outcome = self.replica_append(key, entry, count) if entry["op"] == "set" else None
+                if outcome == "resync":
+                    deferred.add(key)
+                    resync.append(position)
+                    continue
+                if entry.get("committed"):
+                    self.mark_clean(key, tuple(entry["committed"]))
+                self.chain_applied[key] = (head_id, entry["seq"])
+                applied += 1
+                if outcome == "wrapped":
+                    # The chain wrapped around to the primary: it ends here.
+                    self.chain_tail(entry)
+                    continue
+                full = None
+                if entry["op"] == "set":
+                    full, count = self.replicas[key]
+                else:
+                    self.replicas.pop(key, None)
+                if self.replication_next(count, head_id) is not None:
+                    self.mark_dirty(key, (head_id, entry["seq"]), full, previous)
+                    self.chain_sender.submit(dict(entry, count=count - 1, full=full))
+                else:
+                    # The tail commits the write: its copy is always clean.
+                    self.dirty.pop(key, None)
+                    self.chain_tail(entry)
+        return {"status": "success", "message": f"Applied {applied} chain writes at node {self.node_id}",
+                "resync": resync}
+
+    def chain_tail(self, entry):
+        """
+        The write reached the end of its chain: ack it to the head and tell the client.
+        """
+        head = entry["head"]
+        if head["node_id"] == self.node_id:
+            self.chain_acks.resolve(entry["key"], entry["seq"])
+        else:
+            self.ack_sender(head).submit({"key": entry["key"], "seq": entry["seq"]})
+        if entry["op"] == "set":
+            client_message = self.tail_message(entry["key"], entry["value"], entry.get("client_ip"))
+            if client_message:
+                self.notify_client(entry["client_ip"], entry["client_port"], client_message)
+
+    def chain_ack(self, acks):
+        """
+        Tail acks for writes this node is the head of.
+        """
+        with self.chain_lock:
+            for ack in acks:
+                self.mark_clean(ack["key"], (self.node_id, ack["seq"]))
+        for ack in acks:
+            self.chain_acks.resolve(ack["key"], ack["seq"])
+        return {"status": "success"}
+
+    def send_chain_batch(self, entries):
+        """
+        Deliver a batch of chain writes to the next member of their chains (the chain sender's send function):
+        the successor, or with virtual nodes the member chain_successor picks, one request per member in queue
+        order. The whole value of the writes a member could not append (see chain_write) is sent right after.
+        """
+        groups = {}
+        for entry in entries:
+            peer = self.chain_successor(entry["head"]["node_id"]) or self.successor
+            groups.setdefault(peer["node_id"], (peer, []))[1].append(entry)
+        for peer, group in groups.values():
+            response = self.transport.post(peer, "/chain_write", json={"entries": sent_entries(group)})
+            response.raise_for_status()
+            resync = response.json().get("resync")
+            if resync:
+                print(f"[CHAIN] Node {self.node_id} sending {len(resync)} whole values to node {peer['node_id']}")
+                group = [group[position] for position in resync]
+                response = self.transport.post(peer, "/chain_write",
+                                               json={"entries": sent_entries(group, range(len(group)))})
+                response.raise_for_status()
+
+    def ack_sender(self, head):
+        """
+        The ordered link carrying acks back to a head (one per head, created on first use).
+        """
+        peer = (head["ip"], int(head["port"]), head.get("vnode", 0))
+        sender = self.ack_senders.get(peer)
+        if sender is None:
+            def send(acks, head=dict(head)):
+                self.transport.post(head, "/chain_ack", json={"acks": acks}).raise_for_status()
+
+            def keep_trying(head_id=head["node_id"]):
+                # Acks are owed until the head is declared failed (its writes then end with it).
+                return head_id not in self.membership.down and not self.departed
+            # setdefault keeps a single sender if two threads get here at once
+            sender = self.ack_senders.setdefault(peer, OrderedSender(send, name="CHAIN-ACK", keep_trying=keep_trying))
+        return sender
+
+    def await_acks(self, message, acks):
+        """
+        Wait for the tail's acks of a request's chain writes, or for the write quorum of its quorum writes
+        (outside the write gate, so a hand-off is not held up).
+        Without chain_wait the request answers right away; an ack that does not arrive within chain_timeout
+        turns the answer into "pending", and a write quorum that can no longer be reached into an error.
+        """
+        if not acks or not self.chain_wait:
+            return message
+        done, missing = wait(acks, timeout=self.chain_timeout)
+        if missing:
+            self.chain_acks.forget(missing)
+            return dict(message, status="pending",
+                        message=f"{len(missing)} writes not acknowledged by the chain tail within {self.chain_timeout}s")
+        failed = [ack for ack in done if ack.result() is False]
+        if failed:
+            return dict(message, status="error", message=f"Write quorum not reached for {len(failed)} writes")
+        return message
+
+    # QUORUM REPLICATION
+    def quorum_sizes(self):
+        """
+        (N, W, R) of quorum consistency: N is k_factor, W and R default to a majority of N and are kept within [1, N].
+        """
+        majority = self.k_factor // 2 + 1
+        write_quorum = min(max(int(self.quorum_w or majority), 1), self.k_factor)
+        read_quorum = min(max(int(self.quorum_r or majority), 1), self.k_factor)
+        return self.k_factor, write_quorum, read_quorum
+
+    def quorum_peers(self):
+        """
+        The other replicas of the keys this node owns: its next k_factor - 1 successors (fewer in a smaller ring),
+        skipping the tokens of a process that already holds a copy (virtual nodes, see chain_successor).
+        """
+        if self.k_factor <= 1:
+            return []
+        successors = self.successors
+        if successors is None:
+            successors = self.refresh_successors()
+        if not self.membership.shared_hosts:
+            return successors[:self.k_factor - 1]
+        members = self.membership.alive()
+        start = bisect.bisect_right([member["node_id"] for member in members], self.node_id)
+        peers, hosts, seen = [], {vnodes.host(self.address())}, set()
+        for peer in successors + [members[(start + offset) % len(members)] for offset in range(len(members))]:
+            if len(peers) == self.k_factor - 1 or peer["node_id"] == self.node_id:
+                break
+            if peer["node_id"] in seen or peer["node_id"] in self.membership.down or vnodes.host(peer) in hosts:
+                continue
+            peers.append(peer)
+            hosts.add(vnodes.host(peer))
+            seen.add(peer["node_id"])
+        return peers
+
+    def refresh_successors(self):
+        """
+        Rebuild the successor list by asking every successor for its own successor.
+        A list that could not be completed is used but not kept, so the next use tries again.
+        """
+        successors, peer, length = [], self.successor, self.successor_list_length()
+        try:
+            while peer["node_id"] != self.node_id and len(successors) < length:
+                successors.append(peer)
+                if len(successors) < length:
+                    peer = self.transport.post(peer, "/find_successor", json={
+                        "id": (peer["node_id"] + 1) % hashing.RING_SIZE}).json()["node"]
+        except Exception as e:
+            print(f"[SUCCESSORS] Node {self.node_id} failed to refresh its successor list: {e}")
+            return successors
+        self.successors = successors
+        return successors
+
+    def invalidate_successors(self, remaining):
+        """
+        Drop the successor list (it is rebuilt on next use) after the ring changed after this node.
+        In quorum mode the change is also passed to the `remaining` previous nodes, whose lists include this
+        node's successors; they are told in the background, as the new node may not be serving yet.
+        """
+        self.successors = None
+        self.successors_generation += 1
+        if self.consistency == "quorum" and remaining > 0 and self.predecessor["node_id"] != self.node_id:
+            self.quorum_pool.submit(self.transport.post, self.predecessor, "/invalidate_successors",
+                                    json={"remaining": remaining - 1})
+        return {"status": "success"}
+
+    def quorum_head(self, writes):
+        """
+        Apply writes (a list of (op, key, value); "set" appends value, "del" removes the key) at the keys' primary
+        and send them, numbered with new versions, to the other N - 1 replicas in parallel, one request per replica.
+        Returns a future resolved with True once W copies (this one included) hold the writes, or with False
+        once that can no longer happen. Replicas receive the appended value with the version and length of the
+        value it was appended to (see replica_append), the whole value only if their copy is not that one,
+        and keep the newest version.
+        """
+        _, write_quorum, _ = self.quorum_sizes()
+        entries = []
+        with self.chain_lock:
+            for op, key, value in writes:
+                base, offset, full = self.chain_applied.get(key), len(self.data_store.get(key) or ""), None
+                if op == "set":
+                    full = self.store_primary(key, value)
+                else:
+                    self.data_store.pop(key, None)
+                # Sequence numbers follow the clock, so a key's new owner numbers its writes after the old owner's.
+                self.chain_seq = max(self.chain_seq + 1, time.time_ns())
+                self.chain_applied[key] = (self.node_id, self.chain_seq)
+                entries.append({"op": op, "key": key, "value": value, "version": self.chain_applied[key],
+                                "base": base, "offset": offset, "full": full})
+        peers = self.quorum_peers()
+        futures = [self.quorum_pool.submit(self.send_quorum_write, peer,
+                                           [dict(entry, count=self.k_factor - 1 - position) for entry in entries])
+                   for position, peer in enumerate(peers)]
+        for future in futures:
+            self.quorum_sends.add(future)
+            future.add_done_callback(self.quorum_sends.discard)
+        return quorum(futures, min(write_quorum, len(peers) + 1) - 1)
+
+    def send_quorum_write(self, peer, entries):
+        """
+        Deliver quorum writes to one replica, with the whole value of those it could not append (see
+        quorum_write) sent right after. Returns whether it accepted them.
+        """
+        try:
+            response = self.transport.post(peer, "/quorum_write", json={"entries": sent_entries(entries)})
+            resync = response.json().get("resync") if response.status_code == 200 else None
+            if resync:
+                entries = [entries[position] for position in resync]
+                response = self.transport.post(peer, "/quorum_write",
+                                               json={"entries": sent_entries(entries, range(len(entries)))})
+            return response.status_code == 200
+        except Exception as e:
+            print(f"[ERROR] Quorum write to node {peer['node_id']} failed at node {self.node_id}: {e}")
+            return False
+
+    @replica_write("/quorum_write")
+    def quorum_write(self, entries):
+        """
+        Apply quorum writes sent by a key's primary (or by a read repair). A write older than the version
+        this node holds is skipped, so writes of a key that arrive out of order leave the newest value.
+        A replica that sits further down the key's chain than the sender knows (a node before it departed
+        and the sender's successor list is not rebuilt yet) passes the write on to its successor.
+        The positions of the appended values that do not fit this node's copy (see replica_append) are
+        returned as "resync", for the sender to send again as whole values.
+        """
+        applied, onward, resync = 0, [], []
+        with self.chain_lock:
+            for position, entry in enumerate(entries):
+                key, version = entry["key"], tuple(entry["version"])
+                self.chain_seq = max(self.chain_seq, version[1])
+                if version_order(version) <= version_order(self.chain_applied.get(key)):
+                    continue
+                count = self.replicas.get(key, (None, entry["count"]))[1]
+                if entry["op"] == "set":
+                    outcome = self.replica_append(key, entry, entry["count"])
+                    if outcome == "resync":
+                        resync.append(position)
+                        continue
+                    if outcome == "wrapped":
+                        continue  # the ring is smaller than N and this node is the key's primary
+                else:
+                    self.replicas.pop(key, None)
+                self.chain_applied[key] = version
+                applied += 1
+                if count > entry["count"] and self.successor["node_id"] != self.node_id:
+                    onward.append(dict(entry, count=count - 1, full=self.replicas.get(key, (None, 0))[0]))
+        if onward:
+            self.quorum_pool.submit(self.send_quorum_write, self.successor, onward)
+        return {"status": "success", "message": f"Applied {applied} quorum writes at node {self.node_id}",
+                "resync": resync}
+
+    def quorum_copies(self, keys):
+        """
+        This node's copy of each key (primary or replica, None if it has none) with its version.
+        """
+        copies = {}
+        with self.chain_lock:
+            for key in keys:
+                value = self.data_store.get(key) if key in self.data_store else self.replicas.get(key, (None, 0))[0]
+                copies[key] = {"value": value, "version": self.chain_applied.get(key)}
+        return {"status": "success", "node_id": self.node_id, "copies": copies}
+
+    def fetch_copies(self, peer, keys):
+        """
+        A replica's copies of keys (see quorum_copies), or None if it did not answer.
+        """
+        try:
+            return self.transport.post(peer, "/quorum_read", json={"keys": keys}).json()["copies"]
+        except Exception as e:
+            print(f"[ERROR] Quorum read from node {peer['node_id']} failed at node {self.node_id}: {e}")
+            return None
+
+    def quorum_read(self, keys):
+        """
+        Read keys from R copies: this node's (the primary's) and R - 1 replicas asked in parallel, a replica
+        that does not answer being replaced by the next one. Returns {key: message} (see quorum_replies).
+        """
+        _, _, read_quorum = self.quorum_sizes()
+        peers = self.quorum_peers()
+        needed = min(read_quorum, len(peers) + 1) - 1
+        answers = [(None, self.quorum_copies(keys)["copies"])]
+        pending = {self.quorum_pool.submit(self.fetch_copies, peer, keys): position
+                   for position, peer in enumerate(peers[:needed])}
+        spares = iter(range(needed, len(peers)))
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                position = pending.pop(future)
+                if future.result() is not None:
+                    answers.append((position, future.result()))
+                    continue
+                position = next(spares, None)
+                if position is not None:
+                    pending[self.quorum_pool.submit(self.fetch_copies, peers[position], keys)] = position
+        return self.quorum_replies(keys, answers, needed + 1, peers)
+
+    def quorum_replies(self, keys, answers, needed, peers):
+        """
+        Read answers from the copies gathered by a quorum read, as a list of (position in peers, {key: copy})
+        (position None for this node): every key is answered with its newest copy, and the replicas that
+        returned an older one are repaired in the background. Fewer than `needed` answers is an error.
+        """
+        if len(answers) < needed:
+            return {key: {"status": "error", "message": f"Read quorum not reached for key '{key}':"
+                                                        f" {len(answers)} of {needed} copies answered"}
+                    for key in keys}
+        results, repairs = {}, {}
+        for key in keys:
+            newest = max((copies[key] for _, copies in answers), key=lambda copy: version_order(copy["version"]))
+            for position, copies in answers:
+                if position is not None and version_order(copies[key]["version"]) < version_order(newest["version"]):
+                    repairs.setdefault(position, []).append({
+                        "op": "del" if newest["value"] is None else "set", "key": key, "value": newest["value"],
+                        "replace": True, "version": newest["version"], "count": self.k_factor - 1 - position})
+            if newest["value"] is None:
+                results[key] = {"status": "error", "message": f"Key '{key}' not found in node {self.node_id}"}
+            else:
+                print(f"[READ-QUORUM] Node {self.node_id} returning value '{newest['value']}' for key '{key}'")
+                results[key] = {"status": f"success from  NODE {self.ip}:{self.port} (quorum of {len(answers)})",
+                                "key": key, "value": newest["value"]}
+        for position, entries in repairs.items():
+            print(f"[READ-REPAIR] Node {self.node_id} repairing {len(entries)} stale keys at node {peers[position]['node_id']}")
+            self.quorum_pool.submit(self.send_quorum_write, peers[position], entries)
+        return results
+
+    # BATCH RELATED METHODS
+    def insert_batch(self, items, client_ip=None, client_port=None, hops=0):
+        """
+        Insert many (key, value) pairs at once.
+
+        items is a list of {"key": ..., "value": ...}. Pairs owned by this node are written locally
+        and replicated down the chain as one message per hop; the rest is split per next hop and
+        forwarded as one sub-batch each (in parallel), so every owner receives a single sub-batch.
+        Returns per-key results in input order of each owner.
+        """
+        by_key = {}
+        for item in items:
+            by_key.setdefault(item["key"], []).append(item)
+        local_keys, groups = self.group_by_next_hop(list(by_key))
+
+        results = []
+        with ThreadPoolExecutor(max_workers=max(1, len(groups))) as executor:
+            futures = [executor.submit(self.send_to_hop, hop, "/insert_batch",
+                                       {"items": [item for key in keys for item in by_key[key]], "hops": hops})
+                       for hop, keys in groups.values()]
+            local_items = [item for key in local_keys for item in by_key[key]]
+            if local_items:
+                with self.write_guard():
+                    if not self.departed:
+                        local_results, acks = self.apply_insert_batch(local_items, hops)
+                        local_items = []
+                if not local_items:
+                    results.extend(self.await_acks({"results": local_results}, acks)["results"])
+            if local_items:
+                # This node handed its keys off in the meantime: its successor owns them now.
+                results.extend(self.send_to_hop(self.successor, "/insert_batch",
+                                                {"items": local_items, "hops": hops}).get("results", []))
+            for future in futures:
+                try:
+                    results.extend(future.result().get("results", []))
+                except Exception as e:
+                    print(f"[ERROR] Batch insert forwarding failed at node {self.node_id}: {e}")
+        response = {"status": "success", "message": f"Batch of {len(items)} inserts handled",
+                    "results": results, "hops": hops}
+        if client_ip:
+            self.notify_client(client_ip, client_port, response)
+        return response
+
+    def apply_insert_batch(self, items, hops=0):
+        """
+        Write a batch owned by this node and replicate it (down the chain pipeline for linearizability,
+        through the replication queue for eventual consistency, as one request per replica for quorum
+        consistency). Returns the results and the acks to wait for.
+        """
+        acks = []
+        if self.consistency == "eventual":
+            for item in items:
+                self.store_primary(item["key"], item["value"])
+            if self.k_factor > 1:
+                self.replication_queue.submit_many([item["key"] for item in items], "set")
+        elif self.consistency == "quorum":
+            acks = [self.quorum_head([("set", item["key"], item["value"]) for item in items])]
+        else:
+            acks = [self.chain_head("set", item["key"], item["value"]) for item in items]
+        print(f"[WRITE-BATCH] Node {self.node_id} stored {len(items)} keys")
+        return [{"key": item["key"], "status": "success", "node_id": self.node_id, "hops": hops} for item in items], acks
+
+    @replica_write("/insertReplicas_batch")
+    def insert_replicas_batch(self, items, replication_count, join=False, starting_node=None):
+        """
+        Replica insertion of a whole batch; the batch is forwarded to the successor as a single message.
+        An appended value that does not fit this node's copy (an item with an "offset", see replica_append)
+        is neither stored nor forwarded: its position is returned as "resync", for the sender to send the
+        whole value.
+        """
+        stored, resync = [], []
+        for position, item in enumerate(items):
+            if "offset" in item and not join:
+                if self.replica_append(item["key"], item, replication_count, versioned=False) == "resync":
+                    resync.append(position)
+                    continue
+            else:
+                self.store_replica(item["key"], item["value"], replication_count, join, item.get("replace", False))
+            stored.append(item)
+        self.forward_replicate_batch(stored, replication_count, join, starting_node)
+        return {"status": "success", "message": f"Stored {len(stored)} replicas at node {self.node_id}",
+                "resync": resync}
+
+    def flush_replication(self, updates):
+        """
+        Send a batch of queued eventual-consistency updates ({key: "set" | "del"}) down the chain:
+        for every set key the text appended since its last flush, with the length the replicas' copy must
+        have (its whole value when that length is not known), and the deleted keys, one request per hop each.
+        Keys this node no longer owns (moved by a join) are skipped.
+        """
+        items, lengths = [], {}
+        epoch = self.replicated_epoch
+        for key, op in updates.items():
+            if op == "set":
+                value = self.data_store.get(key)
+                if value is None:
+                    continue
+                offset = self.replicated_lengths.get(key)
+                if offset is None or offset > len(value):
+                    items.append({"key": key, "value": value, "replace": True})
+                else:
+                    items.append({"key": key, "value": rope.suffix(value, offset), "offset": offset})
+                lengths[key] = len(value)
+        deleted = [key for key, op in updates.items() if op == "del"]
+        if items:
+            accepted = self.forward_replicate_batch(items, self.k_factor, False, self.node_id)
+            with self.replicated_lock:
+                if accepted and epoch == self.replicated_epoch:
+                    self.replicated_lengths.update(lengths)
+                else:
+                    # The replicas may have missed these, or a key was deleted meanwhile: send whole values next time.
+                    for key in lengths:
+                        self.replicated_lengths.pop(key, None)
+        if deleted:
+            self.forward_delete_replicas_batch(deleted, self.k_factor - 1, self.node_id)
+        print(f"[REPLICATE] Node {self.node_id} flushed {len(items)} updates and {len(deleted)} deletes")
+
+    def forget_replicated(self, keys):
+        """
+        Deleted keys: their next flush sends the whole value (see flush_replication).
+        """
+        with self.replicated_lock:
+            self.replicated_epoch += 1
+            for key in keys:
+                self.replicated_lengths.pop(key, None)
+
+    def forward_replicate_batch(self, items, replication_count, join, starting_node):
+        """
+        Send a replica batch one hop down the chain with a decremented replication count. Appended values the
+        successor could not apply (see insert_replicas_batch) are sent again as this node's whole value.
+        Returns whether the successor accepted it.
+        """
+        successor = self.replication_next(replication_count, starting_node)
+        if successor is None:
+            print(f"Circular replication completed for batch of {len(items)} keys")
+            return True
+        try:
+            response = self.transport.post(successor, "/insertReplicas_batch", json={
+                "items": items,
+                "replication_count": int(replication_count) - 1,
+                "join": join,
+                "starting_node": starting_node
+            })
+            resync = response.json().get("resync") if response.status_code == 200 else None
+            if resync:
+                items = [{"key": items[position]["key"], "value": self.local_value(items[position]["key"]),
+                          "replace": True} for position in resync]
+                response = self.transport.post(successor, "/insertReplicas_batch", json={
+                    "items": [item for item in items if item["value"] is not None],
+                    "replication_count": int(replication_count) - 1,
+                    "join": join,
+                    "starting_node": starting_node
+                })
+            return response.status_code == 200
+        except Exception as e:
+            print(f"[ERROR] Forward batch replication failed at node {self.node_id}: {e}")
+            return False
+
+    def multi_get(self, keys, client_ip=None, client_port=None, hops=0):
+        """
+        Read many keys at once (scatter-gather).
+
+        Every key is planned like a single query (plan_query), so the consistency mode is respected:
+        with eventual consistency any local primary or replica answers, with linearizability the
+        owner reads from the chain tail. Keys answered here are collected, chain reads of owned keys
+        travel down the chain as one /query_chain_batch, quorum reads of owned keys ask every replica once
+        for all of them, and the remaining keys are sent as one /query_batch per next hop.
+        All sub-requests run concurrently and the results are merged.
+        """
+        results, chain_keys, quorum_keys, remote = {}, [], [], []
+        for key in dict.fromkeys(keys):
+            action, message = self.plan_query(key, hf.hash_function(key))
+            if action == "reply":
+                results[key] = message
+            elif action == "chain":
+                chain_keys.append(key)
+            elif action == "quorum":
+                quorum_keys.append(key)
+            else:
+                remote.append(key)
+        _, groups = self.group_by_next_hop(remote)
+
+        with ThreadPoolExecutor(max_workers=len(groups) + 2) as executor:
+            futures = [executor.submit(self.send_to_hop, hop, "/query_batch", {"keys": group, "hops": hops})
+                       for hop, group in groups.values()]
+            if chain_keys:
+                futures.append(executor.submit(self.forward_chain_batch, chain_keys, self.k_factor - 1, self.node_id))
+            if quorum_keys:
+                futures.append(executor.submit(lambda: {"results": self.quorum_read(quorum_keys)}))
+            for future in futures:
+                try:
+                    results.update(future.result().get("results", {}))
+                except Exception as e:
+                    print(f"[ERROR] Multi-get sub-request failed at node {self.node_id}: {e}")
+        response = {"status": "success", "results": results, "hops": hops}
+        if client_ip:
+            self.notify_client(client_ip, client_port, response)
+        return response
+
+    def query_chain_batch(self, keys, replication_count, starting_id):
+        """
+        Batched query_chain: answer the keys this node is the tail for and pass the rest down the chain at once.
+        """
+        results, pending = {}, []
+        for key in keys:
+            action, result = self.chain_read_step(key, replication_count, starting_id)
+            if action == "next":
+                pending.append(key)
+            elif action == "check":
+                results[key] = self.check_version(key, result, starting_id)
+            else:
+                results[key] = result
+        if pending:
+            results.update(self.forward_chain_batch(pending, replication_count - 1, starting_id).get("results", {}))
+        return {"status": "success", "results": results}
+
+    def forward_chain_batch(self, keys, replication_count, starting_id):
+        """
+        Send a batched chain read to the next member of the chain.
+        """
+        response = self.transport.post(self.chain_successor(starting_id) or self.successor, "/query_chain_batch", json={
+            "keys": keys,
+            "replication_count": replication_count,
+            "starting_id": starting_id
+        })
+        return response.json()
+
+    def delete_batch(self, keys, hops=0):
+        """
+        Delete many keys at once, grouped per owner like insert_batch.
+        """
+        local_keys, groups = self.group_by_next_hop(list(dict.fromkeys(keys)))
+        results = []
+        with ThreadPoolExecutor(max_workers=max(1, len(groups))) as executor:
+            futures = [executor.submit(self.send_to_hop, hop, "/delete_batch", {"keys": group, "hops": hops})
+                       for hop, group in groups.values()]
+            if local_keys:
+                with self.write_guard():
+                    if not self.departed:
+                        local_results, acks = self.apply_delete_batch(local_keys, hops)
+                        local_keys = []
+                if not local_keys:
+                    results.extend(self.await_acks({"results": local_results}, acks)["results"])
+            if local_keys:
+                # This node handed its keys off in the meantime: its successor owns them now.
+                results.extend(self.send_to_hop(self.successor, "/delete_batch",
+                                                {"keys": local_keys, "hops": hops}).get("results", []))
+            for future in futures:
+                try:
+                    results.extend(future.result().get("results", []))
+                except Exception as e:
+                    print(f"[ERROR] Batch delete forwarding failed at node {self.node_id}: {e}")
+        return {"status": "success", "message": f"Batch of {len(keys)} deletes handled", "results": results,
+                "hops": hops}
+
+    def apply_delete_batch(self, keys, hops=0):
+        """
+        Delete a batch of keys owned by this node and their replicas down the chain.
+        Returns the results and the acks to wait for.
+        """
+        results, acks = [], []
+        for key in keys:
+            found = key in self.data_store
+            if self.consistency == "eventual":
+                self.data_store.pop(key, None)
+            elif self.consistency == "linearizability":
+                acks.append(self.chain_head("del", key))
+            results.append({"key": key, "status": "success" if found else "not found",
+                            "node_id": self.node_id, "hops": hops})
+        if self.consistency == "quorum":
+            acks.append(self.quorum_head([("del", key, None) for key in keys]))
+        if self.k_factor > 1 and self.consistency == "eventual":
+            self.forget_replicated(keys)
+            self.replication_queue.submit_many(keys, "del")
+        return results, acks
+
+    @replica_write("/deleteReplicas_batch")
+    def delete_replicas_batch(self, keys, replication_count, starting_node):
+        """
+        Delete a batch of replicas and forward the keys that were present to the successor.
+        """
+        present = [key for key in keys if self.replicas.pop(key, None) is not None]
+        if present and replication_count > 1:
+            self.forward_delete_replicas_batch(present, replication_count - 1, starting_node)
+        return {"status": "success", "message": f"Deleted {len(present)} replicas from node {self.node_id}"}
+
+    def forward_delete_replicas_batch(self, keys, replication_count, starting_node):
+        following = self.chain_successor(starting_node)
+        if following is None:
+            return
+        try:
+            self.transport.post(following, "/deleteReplicas_batch", json={
+                "keys": keys,
+                "replication_count": replication_count,
+                "starting_node": starting_node
+            })
+        except Exception as e:
+            print(f"[ERROR] Forward batch delete replication failed at node {self.node_id}: {e}")
 
     # JOIN RELATED METHODS
-    def join(self, new_ip, new_port):
+    def join(self, new_ip, new_port, hops=0, digest=None, replica_digest=None, routing="recursive", node_id=None,
+             vnode=0):
         """
         Handle a join request from a new node.
 
         If the new node's ID is between this node's predecessor and this node,
         then:
           - Update the predecessor pointer.
-          - Transfer keys (and their replicas) that now belong to the new node.
-          - Shift the replica chain so that the (k_factor - 1) nodes after the new node
-            hold replicas for the transferred keys.
+          - Transfer the keys that now belong to the new node, and this node's replicas: the new node
+            takes this node's place in every replica chain it was part of.
+          - Keep the transferred keys as replicas and send the replica delta to the next
+            (k_factor - 1) nodes (see rebalance_replicas).
           - Inform the old predecessor to update its successor pointer.
 
-        Otherwise, forward the join request to the successor.
+        A node restarting from its local storage sends digests (key -> value fingerprint) of what it
+        recovered; it is then sent only the keys and replicas that changed, plus the stale keys to drop.
+
+        Otherwise, forward the join request towards the node owning the new id.
+
+        A token after the first of a process (vnode > 0) joins with the ring position it was given (node_id).
         """
-        new_node_id = hf.hash_function(f"{new_ip}:{new_port}")
+        new_node = vnodes.peer(new_ip, new_port, hf.hash_function(f"{new_ip}:{new_port}") if node_id is None
+                               else int(node_id), vnode)
+        new_node_id = new_node["node_id"]
         # Case 1: New node is between this node and its predecessor.
         if hf.in_interval(new_node_id, self.predecessor["node_id"], self.node_id):
+            if new_node_id == self.node_id and vnodes.host(new_node) != vnodes.host(self.address()):
+                return {"status": "error", "message": f"Ring position {new_node_id} is taken", "hops": hops}
             # Save old predecessor for later use.
             old_predecessor = self.predecessor.copy()
             replicas_to_transfer = {}
             # Transfer keys that now belong to the new node.
             # Keys with hash in (old_predecessor, new_node_id] should be transferred.
-            keys_to_transfer = {
-                k: v for k, v in self.data_store.items()
-                if hf.in_interval(hf.hash_function(k), old_predecessor["node_id"], new_node_id)
-            }
-            for k in keys_to_transfer:
-                del self.data_store[k]
+            # The store's hash index splits the range off without hashing every stored key.
+            keys_to_transfer = self.data_store.pop_range(old_predecessor["node_id"], new_node_id)
             if self.k_factor > 1:
-                # Also transfer any replicas for these keys.
-                replicas_to_transfer = {
-                    k: v for k, v in self.replicas.items()
-                }
-
-                self.shift_replicas(keys_to_transfer, replicas_to_transfer, self.node_id)
-
-            # for key in data_store_copy.keys():
-            #     url_node_info = f"http://{old_predecessor['ip']}:{old_predecessor['port']}/node_info"
-            #     node_info_resp = requests.get(url_node_info).json()
-            #     pred_replicas = node_info_resp.get("replicas")
-            #     if key in pred_replicas:
-            #         a = pred_replicas[key][1]
-            #
-            #         if  a > 1:
-            #             print(f"key {key} has {a} replicas")
-            #             replicas_to_transfer[key] = (self.data_store[key], a-1)
+                # The new node now sits before this node in every chain this node was part of,
+                # so it gets this node's replicas with their current counts.
+                replicas_to_transfer = dict(self.replicas)
+                if old_predecessor["node_id"] == self.node_id:
+                    # Two-node ring: the new node's chain also holds this node's own keys.
+                    replicas_to_transfer.update(
+                        {k: (v, self.k_factor - 1) for k, v in self.data_store.items()})
+                replicas_to_transfer.update(self.rebalance_replicas(
+                    new_node, self.node_id, self.k_factor - 1, moved=keys_to_transfer)["wrapped"])
+
+            keys_to_send, stale_keys = keys_to_transfer, []
+            replicas_to_send, stale_replicas = replicas_to_transfer, []
+            if digest is not None:
+                keys_to_send, stale_keys = hf.store_delta(keys_to_transfer, digest)
+            if replica_digest is not None:
+                replicas_to_send, stale_replicas = hf.store_delta(replicas_to_transfer, replica_digest)
+            bytes_moved = len(rope.dumps(keys_to_send)) + len(rope.dumps(replicas_to_send))
+            print(f"[JOIN] Node {self.node_id} handed {len(keys_to_send)} keys and {len(replicas_to_send)} replicas"
+                  f" ({bytes_moved} bytes) to node {new_node_id}")
 
             # Update this node's predecessor pointer.
-            self.predecessor = {"ip": new_ip, "port": new_port, "node_id": new_node_id}
+            self.predecessor = new_node
+            self.membership_event(self.predecessor, "alive")
             # Inform the old predecessor to update its successor pointer
             try:
-                url = f"http://{old_predecessor['ip']}:{old_predecessor['port']}/update_successor"
-                requests.post(url, json={"new_successor": {"ip": new_ip, "port": new_port, "node_id": new_node_id}})
+                self.transport.post(old_predecessor, "/update_successor",
+                                    json={"new_successor": new_node})
             except Exception as e:
                 print(f"[ERROR] Failed to update old predecessor's successor: {e}")
 
@@ -428,31 +1935,29 @@ class Node:
 
             return {
                 "status": "success",
-                "new_successor": {"ip": self.ip, "port": self.port, "node_id": self.node_id},
+                "new_successor": self.address(),
                 "new_predecessor": old_predecessor,
-                "transferred_keys": keys_to_transfer,
-                "transferred_replicas": replicas_to_transfer,
+                "transferred_keys": keys_to_send,
+                "transferred_replicas": replicas_to_send,
+                "stale_keys": stale_keys,
+                "stale_replicas": stale_replicas,
+                "bytes_moved": bytes_moved,
                 "consistency": self.consistency,
-                "k_factor": self.k_factor
+                "k_factor": self.k_factor,
+                "w": self.quorum_w,
+                "r": self.quorum_r,
+                "membership": self.membership.entries(),
+                "m_bits": hashing.M_BITS,
+                "hops": hops
             }
+        elif routing == "iterative":
+            # Case 2 : Tell the joining node which node to ask next.
+            return self.next_hop_reply(new_node_id, hops)
         else:
-            # Case 2 : Forward the join request to the successor.
-            url = f"http://{self.successor['ip']}:{self.successor['port']}/join"
-            response = requests.post(url, json={"ip": new_ip, "port": new_port})
-            return response.json()
-
-    def transfer_replicas(self, replicas):
-        """
-        Transfer replicas to this node.
-        Update the local replica store with the provided replicas.
-        """
-        for key, (value, rep_count) in replicas.items():
-            if key not in self.data_store:
-                self.replicas[key] = (value, rep_count)
-                print(
-                    f"[TRANSFER REPLICAS] Node {self.node_id} received replica for key '{key}' with count {rep_count}")
-                # Propagate only if there is more than one node in the ring.
-                self.forward_replicate(key, value, rep_count, True, self.node_id)
+            # Case 3 : Forward the join request towards the responsible node.
+            return self.forward(new_node_id, "/join", {"ip": new_ip, "port": new_port, "hops": hops,
+                                                       "digest": digest, "replica_digest": replica_digest,
+                                                       "node_id": node_id, "vnode": vnode})
 
     def updateReplicas(self, replicas, new_node_id):
         """
@@ -465,58 +1970,60 @@ class Node:
         # Propagate only if there is more than one node in the ring.
         if self.successor["node_id"] != self.node_id:
             try:
-                url = f"http://{self.successor['ip']}:{self.successor['port']}/updateReplicas"
-                requests.post(url, json={"replicas": replicas, "new_node_id": new_node_id})
+                self.transport.post(self.successor, "/updateReplicas",
+                                    json={"replicas": replicas, "new_node_id": new_node_id})
             except Exception as e:
                 print(f"[ERROR] Failed to propagate updateReplicas: {e}")
 
         return {"status": "success", "message": "Replicas updated", "node_id": self.node_id}
 
-    def shift_replicas(self, data, replicas, starting_node):
-        """
-        For every key in 'keys' that exists in the local replica store:
-          - Decrement the replication count.
-          - If the count reaches 0, remove the replica.
-        Then propagate the shift to the successor (unless this is the only node).
-        """
-        for key in data:
-            if key in self.replicas.keys():
-                value, rep_count = self.replicas[key]
-                new_count = rep_count - 1
-                if new_count == 0:
-                    assert new_count >= 0, "Replication count cannot be negative"
-                    del self.replicas[key]
-                    print(f"[SHIFT REPLICA] Node {self.node_id} removed replica for key '{key}'")
-                else:
-                    self.replicas[key] = (value, new_count)
-                    print(
-                        f"[SHIFT REPLICA] Node {self.node_id} decremented replica count for key '{key}' to {new_count}")
-        for key in replicas:
-            if key in self.replicas.keys() and replicas[key][1] >= self.replicas[key][1]:
-                value, rep_count = self.replicas[key]
-                new_count = rep_count - 1
-                if new_count == 0:
-                    assert new_count >= 0, "Replication count cannot be negative"
-                    del self.replicas[key]
-                    print(f"[SHIFT REPLICA] Node {self.node_id} removed replica for key '{key}'")
-                else:
-                    self.replicas[key] = (value, new_count)
-                    print(
-                        f"[SHIFT REPLICA] Node {self.node_id} decremented replica count for key '{key}' to {new_count}")
-        # Propagate only if there is more than one node.
-        if self.successor["node_id"] != starting_node:
+    def rebalance_replicas(self, new_node, source_id, remaining, moved=None):
+        """
+        Apply the replica delta of a join at this node.
+
+        new_node joined just before node source_id. Every chain that ran through the gap now has one
+        more node in front of this node, so the replicas of keys hashing into (self, new_node] move one
+        step down the chain: their count is decremented and a replica whose count reaches 0 is dropped.
+        The source node also keeps the keys it handed over (`moved`) as replicas with count k_factor - 1.
+
+        The delta walks the `remaining` next nodes. If it gets back around to the new node first
+        (a ring smaller than k_factor), the replicas the new node needs beyond the source's are returned
+        in "wrapped" so the source can add them to the join response.
+        """
+        for key in self.replicas.keys_in_range(self.node_id, new_node["node_id"]):
+            value, rep_count = self.replicas[key]
+            if rep_count <= 1:
+                del self.replicas[key]
+            else:
+                self.replicas[key] = (value, rep_count - 1)
+        if moved:
+            self.replicas.update({k: (v, self.k_factor - 1) for k, v in moved.items()})
+        print(f"[REBALANCE] Node {self.node_id} shifted its replicas for new node {new_node['node_id']}")
+
+        wrapped = {}
+        if remaining > 0 and self.successor["node_id"] in (new_node["node_id"], source_id):
+            # The new node is also down the chain of the source's own keys.
+            wrapped = {key: (value, rep_count - 1)
+                       for key, (value, rep_count) in self.replicas.items_in_range(new_node["node_id"], source_id).items()
+                       if rep_count > 1}
+        elif remaining > 0:
             try:
-                url = f"http://{self.successor['ip']}:{self.successor['port']}/shift_replicas"
-                requests.post(url, json={"keys": data, "replicas": replicas, "starting_node": starting_node})
+                wrapped = self.transport.post(self.successor, "/rebalance_replicas", json={
+                    "new_node": new_node,
+                    "source_id": source_id,
+                    "remaining": remaining - 1
+                }).json().get("wrapped", {})
             except Exception as e:
-                print(f"[ERROR] Failed to propagate shiftReplicas: {e}")
-        return {"status": "success", "message": "Replicas shifted", "node_id": self.node_id}
+                print(f"[ERROR] Failed to propagate the replica delta: {e}")
+        return {"status": "success", "wrapped": wrapped}
 
     def update_successor(self, new_successor):
         """
         Update this node's successor pointer.
         """
         self.successor = new_successor
+        self.fingers[0] = new_successor
+        self.invalidate_successors(self.k_factor - 2)
         print(f"[UPDATE] Node {self.node_id} updated its successor to {new_successor['node_id']}")
         return {"status": "success", "message": "Successor updated"}
 
@@ -528,79 +2035,311 @@ class Node:
         print(f"[UPDATE] Node {self.node_id} updated its predecessor to {new_predecessor['node_id']}")
         return {"status": "success", "message": "Predecessor updated"}
 
-    def transfer_keys(self, keys):
+    def generate_replicas(self, keys):
         """
-        Transfer keys to this node.
+        (Re)build the replica chains of the given key-value pairs, which this node owns.
+        The pairs go down the chain in batches (see replication.ReplicationPipeline), one request per hop per batch.
         """
-        self.data_store.update(keys)
-        return {"status": "success", "message": "Keys transferred successfully"}
+        if self.k_factor <= 1:
+            return {"status": "success", "message": "No replicas with k_factor 1"}
+        items = [{"key": key, "value": value} for key, value in keys.items()]
+        pipeline = ReplicationPipeline(
+            lambda batch: self.forward_replicate_batch(batch, self.k_factor, True, self.node_id),
+            self.replication_batch_size, self.replication_concurrency)
+        self.replication_progress = pipeline.progress
+        report = pipeline.run(items)
+        status = "success" if report["batches_failed"] == 0 else "partial"
+        return dict(report, status=status)
 
-    def generate_replicas(self, keys):
+    def try_enter_write(self):
         """
-        Generate replicas for a key-value pair.
+        Register a write unless a hand-off is in progress; returns False instead of waiting.
         """
-        # Replicate the transferred keys to the k_factor - 1 nodes after the new node.
-        for key, value in keys.items():
-            self.forward_replicate(key, value, self.k_factor, True, self.node_id)
+        with self.write_gate:
+            if self.departing and not self.departed:
+                return False
+            self.active_writes += 1
+            return True
+
+    def enter_write(self):
+        """
+        Register a write, waiting while a hand-off is in progress.
+        Once the node has departed the write goes ahead and is routed to the successor.
+        """
+        with self.write_gate:
+            while self.departing and not self.departed:
+                self.write_gate.wait()
+            self.active_writes += 1
+
+    def exit_write(self):
+        with self.write_gate:
+            self.active_writes -= 1
+            self.write_gate.notify_all()
+
+    @contextmanager
+    def write_guard(self):
+        """
+        Hold the write gate around a routing decision and the local writes that follow from it.
+        Nothing inside may wait on a request that can come back to this node.
+        """
+        self.enter_write()
+        try:
+            yield
+        finally:
+            self.exit_write()
 
     def depart(self):
         """
-        Handle graceful departure of this node.
-        Inform neighbors, transfer keys, and clear local state.
-        """
-        # Inform predecessor to update its successor.
-        url_pred = f"http://{self.predecessor['ip']}:{self.predecessor['port']}/update_successor"
-        requests.post(url_pred, json={"new_successor": self.successor})
-        # Inform successor to update its predecessor.
-        url_succ = f"http://{self.successor['ip']}:{self.successor['port']}/update_predecessor"
-        requests.post(url_succ, json={"new_predecessor": self.predecessor})
-        # Transfer keys to the successor.
-        url_transfer = f"http://{self.successor['ip']}:{self.successor['port']}/transfer_keys"
-        requests.post(url_transfer, json={"keys": self.data_store})
-        # Transfer replicas to the successor.
-        url_transfer_replicas = f"http://{self.successor['ip']}:{self.successor['port']}/transfer_replicas"
-        requests.post(url_transfer_replicas, json={"replicas": self.replicas})
-        # Make the successor generate replicas for the transferred keys.
-        url_replicas = f"http://{self.successor['ip']}:{self.successor['port']}/generate_replicas"
-        requests.post(url_replicas, json={"keys": self.data_store})
-
-        # Make the successor update its replicas by removing the keys that were transferred.
-        url_update_replicas = f"http://{self.successor['ip']}:{self.successor['port']}/remove_transferred_replicas"
-        requests.post(url_update_replicas, json={"keys": self.data_store})
-
-        # Clear local state
-        self.data_store.clear()
-        self.replicas.clear()
-        self.successor = None
-        self.predecessor = None
-        # suicide
-        print(f"[DEPART] Node {self.node_id} departed gracefully.")
-        return {"status": "success", "message": f"Node {self.node_id} departed gracefully"}
-
-    def remove_transferred_replicas(self, data):
-        """
-        Remove the replicas of the transferred keys.
-        """
-        for key in data.keys():
-            self.replicas.pop(key, None)
-        return {"status": "success", "message": "Transferred replicas removed"}
-
-    def overlay(self, visited=None):
-        """
-        Retrieve the overlay (list of nodes) starting from this node.
-        The 'visited' list prevents infinite loops.
-        """
-        if visited is None:
-            visited = []
-        if self.node_id in visited:
-            return {"status": "success", "overlay": []}
-        visited.append(self.node_id)
-        overlay_list = [{"node_id": self.node_id, "ip": self.ip, "port": self.port}]
-        url = f"http://{self.successor['ip']}:{self.successor['port']}/overlay"
-        response = requests.get(url, params={"visited_ids": visited})
-        if response.json().get("status") == "success":
-            overlay_list.extend(response.json().get("overlay", []))
-        return {"status": "success", "overlay": overlay_list}
+        Handle graceful departure of this node with a single streamed hand-off to the successor.
+
+        Only the primaries and the replicas with count 1 are sent: the successor already holds every
+        other replica of this node one step further down its chain (see handoff). The hand-off starts once
+        the writes in progress are done; writes arriving meanwhile wait and are then routed to the successor.
+        """
+        if self.successor["node_id"] == self.node_id:
+            return {"status": "error", "message": f"Node {self.node_id} is the last node of the ring"}
+        with self.handoff_lock:
+            with self.write_gate:
+                self.departing = True
+                while self.active_writes:
+                    self.write_gate.wait()
+            # Replicate the queued writes before the stores are handed off: the eventual-consistency queue,
+            # the chain writes waiting for the successor, the acks owed to chain heads and the quorum writes
+            # still on their way to replicas.
+            wait(list(self.quorum_sends), timeout=self.chain_timeout)
+            self.replication_queue.drain()
+            self.chain_sender.drain()
+            for sender in list(self.ack_senders.values()):
+                sender.drain()
+            self.chain_acks.wait_idle(self.chain_timeout)
+            try:
+                result = self.transport.post(self.successor, "/handoff",
+                                             data=self.handoff_stream(dict(self.data_store), dict(self.replicas)),
+                                             headers={"Content-Type": "application/x-ndjson"}).json()
+            except Exception as e:
+                result = {"status": "error", "message": str(e)}
+            with self.write_gate:
+                if result.get("status") == "success":
+                    self.departed = True
+                    # Clear local state (durable stores keep their files for a later rejoin)
+                    self.data_store.release()
+                    self.replicas.release()
+                else:
+                    # Nothing was applied at the successor: keep serving.
+                    self.departing = False
+                self.write_gate.notify_all()
+        if not self.departed:
+            print(f"[DEPART] Node {self.node_id} hand-off failed: {result.get('message')}")
+            return result
+        # The successor spreads the departure; this node's own view only has to stop listing it.
+        self.membership.record(self.address(), "left")
+        print(f"[DEPART] Node {self.node_id} departed gracefully ({result.get('bytes_moved')} bytes handed off).")
+        return {"status": "success", "message": f"Node {self.node_id} departed gracefully",
+                "bytes_moved": result.get("bytes_moved")}
+
+    def handoff_stream(self, data, replicas, chunk_size=1000):
+        """
+        Encode the hand-off as NDJSON chunks: a header, the primaries and the count-1 replicas.
+        Appended values are streamed as their segments (see rope.to_record).
+        """
+        def records():
+            yield {"type": "header", "departed": self.address(),
+                   "predecessor": self.predecessor}
+            for key, value in data.items():
+                yield dict(rope.to_record(value), type="key", key=key)
+            for key, (value, rep_count) in replicas.items():
+                if rep_count == 1:
+                    yield dict(rope.to_record(value), type="replica", key=key)
+
+        chunk = []
+        for record in records():
+            chunk.append(json.dumps(record))
+            if len(chunk) >= chunk_size:
+                yield ("\n".join(chunk) + "\n").encode()
+                chunk = []
+        if chunk:
+            yield ("\n".join(chunk) + "\n").encode()
+
+    def handoff(self, records):
+        """
+        Receive the hand-off of the departing predecessor (an iterable of decoded NDJSON records).
+
+        The stream is staged first and then applied in one step: this node becomes the primary of the
+        departed node's keys, the chains that ran through the departed node move one step up
+        (see spill_replicas), and the departed node's predecessor becomes this node's predecessor.
+        """
+        header, keys, spill, size = None, {}, {}, 0
+        for record in records:
+            size += len(json.dumps(record))
+            if record["type"] == "header":
+                header = record
+            elif record["type"] == "key":
+                keys[record["key"]] = rope.from_record(record)
+            elif record["type"] == "replica":
+                spill[record["key"]] = (rope.from_record(record), 1)
+        if header is None:
+            return {"status": "error", "message": "Hand-off stream without header"}
+        departed, new_predecessor = header["departed"], header["predecessor"]
+
+        with self.handoff_lock:
+            spill_out = self.spill_replicas(departed["node_id"], spill, 0, self.node_id)["spill"]
+            self.data_store.update(keys)
+            for key in keys:
+                self.replicas.pop(key, None)
+            self.predecessor = new_predecessor
+            self.membership_event(departed, "left")
+            if new_predecessor["node_id"] == self.node_id:
+                self.update_successor(self.predecessor)
+            else:
+                self.transport.post(new_predecessor, "/update_successor",
+                                    json={"new_successor": self.address()})
+            if self.k_factor > 1 and self.successor["node_id"] != self.node_id:
+                self.forward_spill(departed["node_id"], spill_out, self.k_factor - 2, self.node_id)
+        print(f"[HANDOFF] Node {self.node_id} took over {len(keys)} keys from node {departed['node_id']} ({size} bytes)")
+        return {"status": "success", "bytes_moved": size}
+
+    def spill_replicas(self, departed_id, spill, remaining, source_id):
+        """
+        Apply the replica delta of a departure at this node.
+
+        Every chain that ran through the departed node is one node shorter in front of this node, so the
+        replicas of keys hashing into (self, departed] move one step up: their count is incremented.
+        Chains that ended here now end at the successor: those replicas (old count 1) are spilled to it,
+        and the spill received from the predecessor is stored with count 1. The delta walks `remaining`
+        more nodes, stopping early if it gets back to the source.
+        """
+        spill_out = {}
+        for key in self.replicas.keys_in_range(self.node_id, departed_id):
+            if key in spill:
+                continue
+            value, rep_count = self.replicas[key]
+            if rep_count == 1:
+                spill_out[key] = (value, 1)
+            self.replicas[key] = (value, rep_count + 1)
+        # A spilled key already held here was written by its new chain while the delta travelled:
+        # that value is newer than the spilled one.
+        self.replicas.update({key: (self.replicas[key][0] if key in self.replicas else value, rep_count)
+                              for key, (value, rep_count) in spill.items() if key not in self.data_store})
+        if remaining > 0:
+            self.forward_spill(departed_id, spill_out, remaining - 1, source_id)
+        return {"status": "success", "spill": spill_out}
+
+    def forward_spill(self, departed_id, spill, remaining, source_id):
+        if self.successor["node_id"] == source_id:
+            return
+        try:
+            self.transport.post(self.successor, "/spill_replicas", json={
+                "departed_id": departed_id,
+                "spill": spill,
+                "remaining": remaining,
+                "source_id": source_id
+            })
+        except Exception as e:
+            print(f"[ERROR] Failed to propagate the departure delta: {e}")
+
+    def overlay(self, version=None):
+        """
+        The ring's members in ring order starting from this node, answered from the local membership table.
+        A caller that already holds the table's current version gets "not_modified" instead of the list.
+        """
+        if version is not None and int(version) == self.membership.version:
+            return {"status": "not_modified", "version": self.membership.version}
+        members = self.membership.alive()
+        start = next((i for i, member in enumerate(members) if member["node_id"] >= self.node_id), 0)
+        return {"status": "success", "overlay": members[start:] + members[:start], "version": self.membership.version,
+                "consistency": self.consistency, "k_factor": self.k_factor, "m_bits": hashing.M_BITS}
+
+    # MEMBERSHIP GOSSIP
+    def membership_event(self, member, status):
+        """
+        Record a join ("alive") or departure ("left") seen by this node and start spreading it right away.
+        """
+        self.membership.record(member, status)
+        print(f"[MEMBERSHIP] Node {self.node_id} recorded node {member['node_id']} as {status}")
+        threading.Thread(target=self.gossip_round, daemon=True, name="gossip_event").start()
+
+    def gossip(self, version=None, members=None):
+        """
+        Handle a gossip exchange: merge the peer's entries (if sent) and answer with this node's table version,
+        plus its entries when the peer's version differs.
+        """
+        if members:
+            self.membership.merge(members)
+        if version is not None and int(version) == self.membership.version:
+            return {"status": "success", "version": self.membership.version}
+        return {"status": "success", "version": self.membership.version, "members": self.membership.entries()}
+
+    def gossip_round(self):
+        """
+        Exchange membership with the successor and one random member: send the table version only, pull the
+        peer's entries if the versions differ, and push ours back if the peer is still missing some.
+        """
+        others = [member for member in self.membership.alive() if member["node_id"] != self.node_id]
+        peers = {self.successor["node_id"]: self.successor} if self.successor["node_id"] != self.node_id else {}
+        if others:
+            member = random.choice(others)
+            peers.setdefault(member["node_id"], member)
+        for peer in peers.values():
+            try:
+                reply = self.transport.post(peer, "/gossip", json={"version": self.membership.version}, timeout=2).json()
+                if "members" in reply:
+                    self.membership.merge(reply["members"])
+                    if self.membership.version != reply["version"]:
+                        self.transport.post(peer, "/gossip", json={"members": self.membership.entries()}, timeout=2)
+            except Exception as e:
+                print(f"[GOSSIP] Node {self.node_id} could not reach node {peer['node_id']}: {e}")
+
+    def run_gossip(self, interval=1):
+        """
+        Gossip the membership table every interval seconds (meant to run in a daemon thread).
+        """
+        while not self.departed:
+            self.gossip_round()
+            self.align_replicas()
+            time.sleep(interval)
+
+    def align_replicas(self):
+        """
+        With virtual nodes, bring this node's replicas in line with the chains of the ring (see chain_from) once
+        its membership has not changed for a gossip round. Joins, departures and failures move replicas along
+        consecutive ring members, so where a chain skips a token of a process already in it they leave copies
+        behind: replicas of chains that do not include this node are dropped, the others get their position
+        in the chain as count, and the keys of this node are sent down its chain again if that chain skips
+        a member and changed since the last alignment.
+        """
+        version = self.membership.version
+        if version == self.aligned["version"] or not self.membership.shared_hosts or self.k_factor <= 1:
+            return
+        if version != self.aligned["seen"]:
+            self.aligned["seen"] = version  # the ring is still changing: wait a round
+            return
+        self.aligned["version"] = version
+        members = self.membership.alive()
+        ids = [member["node_id"] for member in members]
+        chains, dropped, recounted = {}, 0, 0
+        with self.handoff_lock:
+            for key in list(self.replicas):
+                primary = ids[bisect.bisect_left(ids, hashing.hash_key(key)) % len(ids)]
+                if primary not in chains:
+                    chains[primary] = [member["node_id"] for member in self.chain_from(primary, members)]
+                chain = chains[primary]
+                entry = self.replicas.get(key)
+                if entry is None or key in self.data_store:
+                    continue
+                if self.node_id not in chain[1:]:
+                    self.replicas.pop(key, None)
+                    dropped += 1
+                elif entry[1] != self.k_factor - chain.index(self.node_id):
+                    self.replicas[key] = (entry[0], self.k_factor - chain.index(self.node_id))
+                    recounted += 1
+        chain = [member["node_id"] for member in self.chain_from(self.node_id, members)]
+        start = bisect.bisect_left(ids, self.node_id)
+        consecutive = [ids[(start + distance) % len(ids)] for distance in range(min(self.k_factor, len(ids)))]
+        if chain != consecutive and chain != self.aligned["chain"]:
+            self.generate_replicas(dict(self.data_store))
+        self.aligned["chain"] = chain
+        print(f"[VNODES] Node {self.node_id} aligned its replicas with the ring: dropped {dropped}, "
+              f"recounted {recounted}")
 
     def get_node_info(self):
         """
@@ -610,8 +2349,22 @@ class Node:
             "node_id": self.node_id,
             "ip": self.ip,
             "port": self.port,
+            "vnode": self.vnode,
             "successor": self.successor,
             "predecessor": self.predecessor,
+            "fingers": [finger["node_id"] for finger in self.fingers],
+            "membership": {"version": self.membership.version, "members": len(self.membership.alive())},
+            "ownership": dict(vnodes.ownership(self.membership.alive()), host=vnodes.host(self.address())),
+            "stabilization": {"successors": [peer["node_id"] for peer in self.successors or []],
+                              "heartbeat_interval": self.heartbeat_interval, "failure_timeout": self.failure_timeout,
+                              "down": sorted(self.membership.down)},
+            "replication_progress": self.replication_progress,
+            "replication_queue": self.replication_queue.stats(),
+            "client_outbox": self.outbox.stats(),
+            "chain": dict(self.chain_sender.stats(), awaiting_acks=len(self.chain_acks), dirty_keys=len(self.dirty)),
+            "replica_reads": self.read_selector.stats(),
+            "quorum": dict(zip(("n", "w", "r"), self.quorum_sizes()),
+                           successors=[peer["node_id"] for peer in self.successors or []]),
             "data_store": self.data_store,
             "replicas": self.replicas
         }
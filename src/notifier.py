@@ -0,0 +1,96 @@
+import threading
+import time
+from collections import deque
+
+
+class ClientOutbox:
+    """
+    Asynchronous delivery of result messages to clients' /reception endpoints.
+
+    Every client endpoint has its own bounded queue and a sender thread, so a node never waits for a
+    client while serving a request. The sender waits `interval` seconds to collect messages and posts
+    them together as {"batch": [...]} (a lone message is posted as is). A failed post is retried up to
+    `retries` times with exponential backoff, then dropped. When a client's queue is full, the oldest
+    message is dropped ("drop_oldest") or the new one is refused ("drop_newest").
+    A sender with nothing to deliver for `idle_timeout` seconds exits; it is restarted on the next message.
+    """
+
+    def __init__(self, send, max_queue=1000, max_batch=100, interval=0.01, retries=3, backoff=0.1,
+                 timeout=5, drop_policy="drop_oldest", idle_timeout=30):
+        self.send = send
+        self.max_queue = max_queue
+        self.max_batch = max_batch
+        self.interval = interval
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.drop_policy = drop_policy
+        self.idle_timeout = idle_timeout
+        self._queues = {}   # (ip, port) -> deque of messages
+        self._senders = {}  # (ip, port) -> sender thread
+        self._cond = threading.Condition()
+        self.delivered = 0
+        self.dropped = 0
+
+    def put(self, client_ip, client_port, message):
+        """
+        Queue a message for the client at client_ip:client_port and return immediately.
+        """
+        endpoint = (client_ip, int(client_port))
+        with self._cond:
+            queue = self._queues.setdefault(endpoint, deque())
+            if len(queue) >= self.max_queue:
+                self.dropped += 1
+                if self.drop_policy == "drop_newest":
+                    return False
+                queue.popleft()
+            queue.append(message)
+            if endpoint not in self._senders:
+                sender = threading.Thread(target=self._run, args=(endpoint,), daemon=True,
+                                          name=f"outbox_{endpoint[0]}:{endpoint[1]}")
+                self._senders[endpoint] = sender
+                sender.start()
+            elif len(queue) >= self.max_batch:
+                self._cond.notify_all()
+        return True
+
+    def _run(self, endpoint):
+        idle_since = time.time()
+        while True:
+            with self._cond:
+                queue = self._queues[endpoint]
+                if len(queue) < self.max_batch:
+                    self._cond.wait(self.interval)
+                if not queue:
+                    if time.time() - idle_since >= self.idle_timeout:
+                        del self._senders[endpoint]
+                        del self._queues[endpoint]
+                        return
+                    continue
+                batch = [queue.popleft() for _ in range(min(len(queue), self.max_batch))]
+            self._deliver(endpoint, batch)
+            idle_since = time.time()
+
+    def _deliver(self, endpoint, batch):
+        payload = batch[0] if len(batch) == 1 else {"batch": batch}
+        peer = {"ip": endpoint[0], "port": endpoint[1]}
+        for attempt in range(self.retries + 1):
+            try:
+                response = self.send(peer, payload, self.timeout)
+                if response.status_code < 500:
+                    with self._cond:
+                        self.delivered += len(batch)
+                    return
+                error = f"HTTP {response.status_code}"
+            except Exception as e:
+                error = e
+            if attempt < self.retries:
+                time.sleep(self.backoff * 2 ** attempt)
+        with self._cond:
+            self.dropped += len(batch)
+        print(f"[OUTBOX] Dropped {len(batch)} messages for client {endpoint[0]}:{endpoint[1]}: {error}")
+
+    def stats(self):
+        with self._cond:
+            return {"clients": len(self._queues), "queued": sum(len(queue) for queue in self._queues.values()),
+                    "delivered": self.delivered, "dropped": self.dropped}
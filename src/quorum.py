@@ -0,0 +1,46 @@
+import threading
+from concurrent.futures import Future
+
+
+def version_order(version):
+    """
+    Sort key of a write version [head node_id, seq]: the newer sequence number wins, the head id breaks ties.
+    A copy without a version (received through a join or a hand-off) is older than any versioned one.
+    """
+    if not version:
+        return (-1, -1)
+    return (version[1], version[0])
+
+
+def quorum(futures, needed):
+    """
+    Combine the futures of a fan-out into one Future, resolved with True as soon as `needed` of them have
+    returned a true result, or with False once too many have failed (returned false or raised) for that to happen.
+    """
+    result = Future()
+    if needed <= 0:
+        result.set_result(True)
+        return result
+    if len(futures) < needed:
+        result.set_result(False)
+        return result
+    lock = threading.Lock()
+    counts = {"ok": 0, "failed": 0}
+
+    def done(future):
+        try:
+            ok = bool(future.result())
+        except Exception:
+            ok = False
+        with lock:
+            if result.done():
+                return
+            counts["ok" if ok else "failed"] += 1
+            if counts["ok"] >= needed:
+                result.set_result(True)
+            elif len(futures) - counts["failed"] < needed:
+                result.set_result(False)
+
+    for future in futures:
+        future.add_done_callback(done)
+    return result
@@ -0,0 +1,160 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+class ReplicationPipeline:
+    """
+    Send many key/value pairs down a replica chain in batches.
+
+    The items are cut into batches of batch_size; `send(batch)` ships one batch (one request per hop
+    of the chain) and returns True on success. Up to `concurrency` batches are in flight at once.
+    Progress is kept in `progress` and printed as batches complete.
+    """
+
+    def __init__(self, send, batch_size=500, concurrency=4, name="REPLICATE"):
+        self.send = send
+        self.batch_size = max(1, int(batch_size))
+        self.concurrency = max(1, int(concurrency))
+        self.name = name
+        self.progress = {"batches": 0, "batches_done": 0, "batches_failed": 0, "items": 0, "items_done": 0}
+        self._lock = threading.Lock()
+
+    def batches(self, items):
+        for start in range(0, len(items), self.batch_size):
+            yield items[start:start + self.batch_size]
+
+    def _send(self, batch):
+        try:
+            ok = self.send(batch)
+        except Exception as e:
+            print(f"[{self.name}] Batch of {len(batch)} items failed: {e}")
+            ok = False
+        with self._lock:
+            if ok:
+                self.progress["batches_done"] += 1
+                self.progress["items_done"] += len(batch)
+            else:
+                self.progress["batches_failed"] += 1
+            done = self.progress["batches_done"] + self.progress["batches_failed"]
+            print(f"[{self.name}] {done}/{self.progress['batches']} batches"
+                  f" ({self.progress['items_done']}/{self.progress['items']} items replicated)")
+
+    def run(self, items):
+        """
+        Replicate a list of {"key", "value"} items and return the final progress with the elapsed time.
+        """
+        started = time.time()
+        self.progress.update(batches=-(-len(items) // self.batch_size), items=len(items))
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            list(executor.map(self._send, self.batches(items)))
+        return dict(self.progress, seconds=round(time.time() - started, 3))
+
+
+class ReplicationQueue:
+    """
+    Per-node queue of pending replica updates for eventual consistency, drained by a fixed pool of workers.
+
+    Writes only mark a key dirty with its latest operation ("set" or "del"); repeated writes to a key that
+    is still pending coalesce into one update. Every `interval` seconds (or as soon as `max_batch` keys are
+    pending) a worker takes up to max_batch keys and calls `flush(updates)` with a {key: op} dict.
+    A key being flushed is not taken by another worker until that flush returns, so updates of one key
+    reach the successor in order. Once `max_pending` keys are pending, writers wait (backpressure).
+    """
+
+    def __init__(self, flush, workers=2, interval=0.005, max_batch=500, max_pending=100000):
+        self.flush = flush
+        self.workers = workers
+        self.interval = interval
+        self.max_batch = max_batch
+        self.max_pending = max_pending
+        self._pending = {}   # key -> (op, time it was first marked dirty)
+        self._inflight = set()
+        self._cond = threading.Condition()
+        self._threads = []
+        self.flushed_batches = 0
+        self.flushed_updates = 0
+        self.coalesced = 0
+        self.last_lag = 0.0
+
+    def _start(self):
+        # Workers are started on the first update (callers hold _cond).
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._work, daemon=True, name=f"replication_worker_{i}")
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, key, op="set"):
+        with self._cond:
+            if not self._threads:
+                self._start()
+            while len(self._pending) >= self.max_pending and key not in self._pending:
+                self._cond.wait()
+            if key in self._pending:
+                self.coalesced += 1
+                self._pending[key] = (op, self._pending[key][1])
+            else:
+                self._pending[key] = (op, time.time())
+            if len(self._pending) >= self.max_batch:
+                self._cond.notify_all()
+
+    def submit_many(self, keys, op="set"):
+        for key in keys:
+            self.submit(key, op)
+
+    def _take(self):
+        # Oldest pending keys first, skipping keys whose previous update is still being flushed.
+        batch = {}
+        for key in list(self._pending):
+            if key in self._inflight:
+                continue
+            batch[key] = self._pending.pop(key)
+            if len(batch) >= self.max_batch:
+                break
+        self._inflight.update(batch)
+        return batch
+
+    def _work(self):
+        while True:
+            with self._cond:
+                self._cond.wait(self.interval)
+                batch = self._take()
+                if batch:
+                    self._cond.notify_all()
+            if not batch:
+                continue
+            self.last_lag = time.time() - min(enqueued for _, enqueued in batch.values())
+            try:
+                self.flush({key: op for key, (op, _) in batch.items()})
+            except Exception as e:
+                print(f"[REPLICATE] Flush of {len(batch)} updates failed: {e}")
+            with self._cond:
+                self._inflight.difference_update(batch)
+                self.flushed_batches += 1
+                self.flushed_updates += len(batch)
+                self._cond.notify_all()
+
+    def drain(self, timeout=None):
+        """
+        Wait until every pending update has been flushed. Returns False on timeout.
+        """
+        deadline = None if timeout is None else time.time() + timeout
+        with self._cond:
+            while self._pending or self._inflight:
+                remaining = None if deadline is None else deadline - time.time()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.notify_all()
+                self._cond.wait(remaining if remaining is not None else self.interval)
+        return True
+
+    def stats(self):
+        """
+        Queue depth and replication lag (seconds since the oldest pending update was queued).
+        """
+        with self._cond:
+            oldest = min((enqueued for _, enqueued in self._pending.values()), default=None)
+            return {"depth": len(self._pending), "inflight": len(self._inflight),
+                    "lag": round(time.time() - oldest, 3) if oldest is not None else 0.0,
+                    "last_flush_lag": round(self.last_lag, 3), "flushed_batches": self.flushed_batches,
+                    "flushed_updates": self.flushed_updates, "coalesced": self.coalesced}
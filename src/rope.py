@@ -0,0 +1,140 @@
+import json
+import threading
+
+
+class Rope:
+    """
+    String value of an append-heavy key, kept as the list of its appended segments.
+
+    Appending does not copy the value. A Rope is immutable: `rope + text` returns a new Rope that shares the
+    segment list with the old one (the text is added to the end of the shared list when the old Rope is its
+    newest version, otherwise the list is copied first). The segments are only joined when the whole string is
+    needed (str(rope), which caches it), so n appends cost O(n) instead of the O(n^2) bytes copied by
+    string concatenation. An append that leaves more than compact_segments segments joins them into one,
+    which keeps the list of a value that is appended to but never read bounded (None turns it off).
+    """
+
+    compact_segments = 1024
+    _lock = threading.Lock()
+
+    __slots__ = ("_segments", "_count", "_length", "_joined")
+
+    def __init__(self, segments=()):
+        self._segments = [segment for segment in segments if segment]
+        self._count = len(self._segments)
+        self._length = sum(map(len, self._segments))
+        self._joined = None
+
+    @classmethod
+    def _view(cls, segments, count, length):
+        rope = cls.__new__(cls)
+        rope._segments, rope._count, rope._length, rope._joined = segments, count, length, None
+        return rope
+
+    def __add__(self, text):
+        text = str(text)
+        if not text:
+            return self
+        if self.compact_segments and self._count >= self.compact_segments:
+            return Rope([str(self), text])
+        with Rope._lock:
+            segments = self._segments
+            if len(segments) != self._count:
+                # Another version was appended to this one already: branch off a copy.
+                segments = segments[:self._count]
+            segments.append(text)
+        return Rope._view(segments, self._count + 1, self._length + len(text))
+
+    def __radd__(self, text):
+        return Rope([str(text)] + self.segments())
+
+    def since(self, offset):
+        """
+        The text appended after the first offset characters, read from the last segments only.
+        """
+        parts, missing, index = [], self._length - offset, self._count
+        while missing > 0:
+            index -= 1
+            segment = self._segments[index]
+            parts.append(segment[-missing:] if len(segment) > missing else segment)
+            missing -= len(segment)
+        return "".join(reversed(parts))
+
+    def segments(self):
+        """
+        The appended segments, in order (joined, they are the value).
+        """
+        return self._segments[:self._count]
+
+    def __str__(self):
+        if self._joined is None:
+            self._joined = "".join(self._segments[:self._count])
+        return self._joined
+
+    def __len__(self):
+        return self._length
+
+    def __eq__(self, other):
+        if isinstance(other, (Rope, str)):
+            return len(self) == len(other) and str(self) == str(other)
+        return NotImplemented
+
+    def __hash__(self):
+        return hash(str(self))
+
+    def __repr__(self):
+        return repr(str(self))
+
+    def __format__(self, spec):
+        return format(str(self), spec)
+
+
+def append(value, text):
+    """
+    A stored value (str or Rope) with text appended. A key's first write stays a plain string.
+    """
+    if isinstance(value, Rope):
+        return value + text
+    if not value:
+        return text
+    return Rope([value, text])
+
+
+def suffix(value, offset):
+    """
+    The text appended to a stored value (str or Rope) after its first offset characters.
+    """
+    if isinstance(value, Rope):
+        return value.since(offset)
+    return value[offset:]
+
+
+def json_default(value):
+    """
+    json.dumps hook sending a Rope as the plain string it stands for.
+    """
+    if isinstance(value, Rope):
+        return str(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(obj, **kwargs):
+    return json.dumps(obj, default=json_default, **kwargs)
+
+
+def to_record(value):
+    """
+    Fields of a streamed record carrying a stored value: a Rope travels as its segments, unjoined.
+    """
+    if isinstance(value, Rope):
+        return {"segments": value.segments()}
+    return {"value": value}
+
+
+def from_record(record):
+    """
+    The value carried by a record built with to_record.
+    """
+    if "segments" in record:
+        return Rope(record["segments"])
+    return record["value"]
@@ -0,0 +1,139 @@
+import asyncio
+import contextlib
+import json
+import queue
+import threading
+import vnodes
+
+
+def scan_pages(transport, peer, include_replicas=True, page_size=1000):
+    """
+    Yield every item stored at peer, following the /scan cursor page by page.
+    Each page is streamed as NDJSON, so only one page is ever in flight.
+    """
+    cursor = None
+    while True:
+        params = {"limit": page_size, "replicas": int(include_replicas)}
+        if cursor is not None:
+            params["cursor"] = cursor
+        next_cursor = None
+        with transport.get(peer, "/scan", params=params, stream=True) as response:
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                record = json.loads(line)
+                if "next_cursor" in record:
+                    next_cursor = record["next_cursor"]
+                    continue
+                yield record
+        if next_cursor is None:
+            return
+        cursor = next_cursor
+
+
+def scan_nodes(transport, nodes, include_replicas=True, page_size=1000, buffer_size=1024):
+    """
+    Scan several nodes in parallel (one thread each) and yield their items as they arrive.
+    Items pass through a bounded buffer, so memory stays bounded however large the stores are.
+    A node that fails yields a single {"error": ..., "node_id": ...} record.
+    When the caller stops early (closes the generator), the threads stop too and release their connections.
+    """
+    buffer = queue.Queue(maxsize=buffer_size)
+    done = object()
+    stopped = threading.Event()
+
+    def put(record):
+        # Wait for room in the buffer, unless the caller is gone. Returns whether the record was queued.
+        while not stopped.is_set():
+            try:
+                buffer.put(record, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def worker(peer):
+        try:
+            with contextlib.closing(scan_pages(transport, peer, include_replicas, page_size)) as records:
+                for record in records:
+                    if not put(record):
+                        return
+        except Exception as e:
+            put({"error": str(e), "node_id": peer.get("node_id")})
+        finally:
+            put(done)
+
+    workers = [threading.Thread(target=worker, args=(peer,), daemon=True, name="scan") for peer in nodes]
+    for thread in workers:
+        thread.start()
+    remaining = len(nodes)
+    try:
+        while remaining:
+            record = buffer.get()
+            if record is done:
+                remaining -= 1
+            else:
+                yield record
+    finally:
+        stopped.set()
+        for thread in workers:
+            thread.join()
+
+
+async def scan_pages_async(transport, peer, include_replicas=True, page_size=1000):
+    """
+    Awaitable counterpart of scan_pages over an AsyncTransport: yield every item stored at peer.
+    """
+    cursor = None
+    while True:
+        params = {"limit": page_size, "replicas": int(include_replicas)}
+        if cursor is not None:
+            params["cursor"] = cursor
+        next_cursor = None
+        async with transport.session().get(vnodes.url(peer, "/scan"), params=params) as response:
+            async for line in response.content:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                if "next_cursor" in record:
+                    next_cursor = record["next_cursor"]
+                    continue
+                yield record
+        if next_cursor is None:
+            return
+        cursor = next_cursor
+
+
+async def scan_nodes_async(transport, nodes, include_replicas=True, page_size=1000, buffer_size=1024):
+    """
+    Awaitable counterpart of scan_nodes: page several nodes concurrently (one task each) through a bounded
+    buffer and yield their items as they arrive. A node that fails yields a single error record.
+    When the caller stops early (closes the generator), the tasks are cancelled and awaited.
+    """
+    buffer = asyncio.Queue(maxsize=buffer_size)
+
+    async def worker(peer):
+        records = scan_pages_async(transport, peer, include_replicas, page_size)
+        try:
+            async for record in records:
+                await buffer.put(record)
+        except Exception as e:
+            await buffer.put({"error": str(e), "node_id": peer.get("node_id")})
+        finally:
+            await records.aclose()
+        # Not reached once cancelled: nobody reads the buffer any more.
+        await buffer.put(None)
+
+    tasks = [asyncio.create_task(worker(peer)) for peer in nodes]
+    remaining = len(tasks)
+    try:
+        while remaining:
+            record = await buffer.get()
+            if record is None:
+                remaining -= 1
+            else:
+                yield record
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
@@ -0,0 +1,297 @@
+import bisect
+import json
+import os
+import threading
+import hashing
+import rope
+
+
+class MemoryStore(dict):
+    """
+    In-memory key/value store used for a node's data_store and replicas.
+
+    It is a real dict (reads and iteration are unchanged); every mutation goes through
+    _on_set/_on_append/_on_delete/_on_clear so subclasses can persist it. The hooks run under the same lock
+    as the mutation, so a log sees the mutations in the order the map applied them and a snapshot taken
+    under that lock never misses (or repeats) a logged one. Appended values are kept as
+    rope.Rope segments (see append), so the store is JSON-encoded with rope.dumps.
+
+    Alongside the dict it keeps a secondary index of (hash(key), key) pairs sorted by hash, so the keys
+    of a ring interval (start, end] are found by bisection in O(log n + k) instead of hashing every key.
+    """
+
+    def __init__(self, data=None):
+        super().__init__()
+        self._index = []
+        self._lock = threading.RLock()
+        if data:
+            self.update(data)
+
+    # Hash index (callers hold _lock)
+    def _index_add(self, key):
+        bisect.insort(self._index, (hashing.hash_key(key), key))
+
+    def _index_remove(self, key):
+        entry = (hashing.hash_key(key), key)
+        position = bisect.bisect_left(self._index, entry)
+        if position < len(self._index) and self._index[position] == entry:
+            del self._index[position]
+
+    def reindex(self):
+        """
+        Rebuild the hash index from scratch (after recovery, or when the identifier space changes).
+        """
+        with self._lock:
+            keys = list(self)
+            self._index = sorted(zip(hashing.hash_many(keys), keys))
+
+    def keys_in_range(self, start, end):
+        """
+        Keys whose hash lies in the circular interval (start, end], in hash order.
+        """
+        with self._lock:
+            low = bisect.bisect_left(self._index, (start + 1,))
+            high = bisect.bisect_left(self._index, (end + 1,))
+            if start < end:
+                entries = self._index[low:high]
+            else:
+                # The interval wraps around zero (start == end covers the whole ring).
+                entries = self._index[low:] + self._index[:high]
+        return [key for _, key in entries]
+
+    def keys_after(self, position, limit):
+        """
+        Up to limit keys following position, a (hash, key) pair (None starts at the beginning), in hash order.
+        """
+        with self._lock:
+            start = 0 if position is None else bisect.bisect_right(self._index, tuple(position))
+            return [key for _, key in self._index[start:start + limit]]
+
+    def items_in_range(self, start, end):
+        """
+        The items whose key hash lies in (start, end].
+        """
+        return {key: self[key] for key in self.keys_in_range(start, end) if key in self}
+
+    def pop_range(self, start, end):
+        """
+        Remove and return the items whose key hash lies in (start, end].
+        """
+        items = self.items_in_range(start, end)
+        for key in items:
+            self.pop(key, None)
+        return items
+
+    # Hooks for subclasses
+    def _on_set(self, key, value):
+        pass
+
+    def _on_append(self, key, text, count):
+        pass
+
+    def _on_delete(self, key):
+        pass
+
+    def _on_clear(self):
+        pass
+
+    def __setitem__(self, key, value):
+        with self._lock:
+            if key not in self:
+                self._index_add(key)
+            super().__setitem__(key, value)
+            self._on_set(key, value)
+
+    def append(self, key, text, count=None):
+        """
+        Append text to the value of key without copying the value (see rope.append) and return the new value.
+        In a replica store, whose values are (value, count) pairs, count is the count of a new pair:
+        an existing pair keeps its own.
+        """
+        with self._lock:
+            if key not in self:
+                self._index_add(key)
+            value = append_value(dict.get(self, key), text, count)
+            super().__setitem__(key, value)
+            self._on_append(key, text, count)
+        return value
+
+    def __delitem__(self, key):
+        with self._lock:
+            super().__delitem__(key)
+            self._index_remove(key)
+            self._on_delete(key)
+
+    def pop(self, key, *default):
+        with self._lock:
+            found = key in self
+            if found:
+                value = super().pop(key)
+                self._index_remove(key)
+                self._on_delete(key)
+        if found:
+            return value
+        if default:
+            return default[0]
+        raise KeyError(key)
+
+    def popitem(self):
+        with self._lock:
+            key, value = super().popitem()
+            self._index_remove(key)
+            self._on_delete(key)
+        return key, value
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self[key] = default
+        return self[key]
+
+    def update(self, *args, **kwargs):
+        items = dict(*args, **kwargs)
+        with self._lock:
+            # Bulk path for transfers: hash the new keys in one go and merge them into the index
+            # (one sort of two sorted runs) instead of one insertion per key.
+            new_keys = [key for key in items if key not in self]
+            dict.update(self, items)
+            if len(new_keys) > 16:
+                self._index.extend(sorted(zip(hashing.hash_many(new_keys), new_keys)))
+                self._index.sort()
+            else:
+                for key in new_keys:
+                    self._index_add(key)
+            for key, value in items.items():
+                self._on_set(key, value)
+
+    def clear(self):
+        with self._lock:
+            super().clear()
+            self._index = []
+            self._on_clear()
+
+    def release(self):
+        """
+        Drop the in-memory contents when the node leaves the ring (nothing durable to keep).
+        """
+        self.clear()
+
+
+def append_value(current, text, count=None):
+    """
+    The value of a key (None if missing) after appending text; a (value, count) pair when count is given.
+    """
+    if count is None:
+        return rope.append(current or "", text)
+    value, count = current if current is not None else ("", count)
+    return rope.append(value, text), count
+
+
+class LogStore(MemoryStore):
+    """
+    Durable store: an append-only write-ahead log plus periodic compacted snapshots.
+
+    Every mutation is appended to <path>.log as one JSON line before returning. Once the log holds
+    `snapshot_every` records it is compacted: the whole map is written to <path>.snapshot (atomically,
+    via a temporary file) and the log is truncated. On start the snapshot is loaded and the log replayed,
+    so a restarted node gets its state back from local disk.
+    """
+
+    def __init__(self, path, snapshot_every=10000, fsync=False):
+        self.path = path
+        self.snapshot_every = snapshot_every
+        self.fsync = fsync
+        self._log = None
+        self._records = 0
+        super().__init__()
+        self._recover()
+        self._log = open(self.path + ".log", "a", encoding="utf-8")
+
+    def _recover(self):
+        snapshot_path, log_path = self.path + ".snapshot", self.path + ".log"
+        if os.path.exists(snapshot_path):
+            with open(snapshot_path, encoding="utf-8") as f:
+                dict.update(self, json.load(f))
+        if os.path.exists(log_path):
+            with open(log_path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        break  # torn last write
+                    self._replay(record)
+                    self._records += 1
+        self.reindex()
+        print(f"[STORAGE] Recovered {len(self)} keys from {self.path} ({self._records} log records)")
+
+    def _replay(self, record):
+        if record["op"] == "set":
+            dict.__setitem__(self, record["key"], record["value"])
+        elif record["op"] == "append":
+            value = append_value(dict.get(self, record["key"]), record["value"], record.get("count"))
+            dict.__setitem__(self, record["key"], value)
+        elif record["op"] == "del":
+            dict.pop(self, record["key"], None)
+        elif record["op"] == "clear":
+            dict.clear(self)
+
+    def _append(self, record):
+        if self._log is None:
+            return
+        with self._lock:
+            self._log.write(rope.dumps(record) + "\n")
+            self._log.flush()
+            if self.fsync:
+                os.fsync(self._log.fileno())
+            self._records += 1
+            if self._records >= self.snapshot_every:
+                self.compact()
+
+    def _on_set(self, key, value):
+        self._append({"op": "set", "key": key, "value": value})
+
+    def _on_append(self, key, text, count):
+        # Only the appended text is logged, not the whole value.
+        self._append({"op": "append", "key": key, "value": text, "count": count})
+
+    def _on_delete(self, key):
+        self._append({"op": "del", "key": key})
+
+    def _on_clear(self):
+        self._append({"op": "clear"})
+
+    def compact(self):
+        """
+        Write a snapshot of the current map and truncate the log.
+        """
+        with self._lock:
+            tmp_path = self.path + ".snapshot.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(dict(self), f, default=rope.json_default)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path + ".snapshot")
+            self._log.close()
+            self._log = open(self.path + ".log", "w", encoding="utf-8")
+            self._records = 0
+
+    def release(self):
+        """
+        Leave the ring: keep the files on disk (to be delta-synced on the next join) and empty the memory.
+        """
+        with self._lock:
+            self.compact()
+            self._log.close()
+            self._log = None
+            dict.clear(self)
+            self._index = []
+
+
+def open_stores(storage_dir=None, snapshot_every=10000, fsync=False):
+    """
+    Create a node's (data_store, replicas) pair: durable LogStores under storage_dir, or MemoryStores.
+    """
+    if storage_dir is None:
+        return MemoryStore(), MemoryStore()
+    os.makedirs(storage_dir, exist_ok=True)
+    return (LogStore(os.path.join(storage_dir, "data_store"), snapshot_every, fsync),
+            LogStore(os.path.join(storage_dir, "replicas"), snapshot_every, fsync))
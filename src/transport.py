@@ -0,0 +1,99 @@
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+import rope
+import vnodes
+
+
+class Transport:
+    """
+    Outgoing HTTP layer of a node.
+
+    Every peer (successor, predecessor, fingers, clients) gets its own requests.Session
+    with a keep-alive connection pool, so consecutive calls to the same peer reuse an
+    open TCP connection instead of opening a new one per request.
+    """
+
+    def __init__(self, pool_size=16, timeout=None, connect_timeout=None):
+        self.pool_size = int(pool_size)
+        # Read timeout and connect timeout in seconds (None waits forever, like plain requests).
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def configure(self, pool_size=None, timeout=None, connect_timeout=None):
+        """
+        Change pool size and/or timeouts. Existing pools are dropped and rebuilt lazily.
+        """
+        if timeout is not None:
+            self.timeout = float(timeout)
+        if connect_timeout is not None:
+            self.connect_timeout = float(connect_timeout)
+        if pool_size is not None and int(pool_size) != self.pool_size:
+            self.pool_size = int(pool_size)
+            self.close()
+
+    def session(self, ip, port):
+        """
+        Return the pooled session for the peer at ip:port, creating it on first use.
+        """
+        peer = (ip, int(port))
+        session = self._sessions.get(peer)
+        if session is None:
+            with self._lock:
+                session = self._sessions.get(peer)
+                if session is None:
+                    session = requests.Session()
+                    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size)
+                    session.mount("http://", adapter)
+                    self._sessions[peer] = session
+        return session
+
+    def _timeout(self, timeout):
+        if timeout is not None:
+            return timeout
+        if self.connect_timeout is None and self.timeout is None:
+            return None
+        return self.connect_timeout, self.timeout
+
+    def post(self, peer, endpoint, json=None, timeout=None, **kwargs):
+        """
+        POST to endpoint on peer (a ring member or client, see vnodes.url) and return the response.
+        A json payload may hold stored values (rope.Rope), which are sent as strings.
+        """
+        url = vnodes.url(peer, endpoint)
+        if json is not None:
+            kwargs["data"] = rope.dumps(json)
+            kwargs["headers"] = dict(kwargs.get("headers") or {}, **{"Content-Type": "application/json"})
+        return self.session(peer["ip"], peer["port"]).post(url, timeout=self._timeout(timeout), **kwargs)
+
+    def get(self, peer, endpoint, params=None, timeout=None, **kwargs):
+        """
+        GET endpoint on peer (a ring member or client, see vnodes.url) and return the response.
+        """
+        url = vnodes.url(peer, endpoint)
+        return self.session(peer["ip"], peer["port"]).get(url, params=params, timeout=self._timeout(timeout), **kwargs)
+
+    def iterate(self, peer, endpoint, payload, max_hops=256):
+        """
+        Send a routed request with iterative routing: every node that does not own the key answers with
+        its next hop instead of forwarding, and the request is re-sent there until a node answers.
+        Returns the final JSON answer; its "hops" counts the nodes asked along the way.
+        """
+        payload = dict(payload, routing="iterative")
+        for _ in range(max_hops):
+            result = self.post(peer, endpoint, json=payload).json()
+            if not isinstance(result, dict) or result.get("status") != "next_hop":
+                return result
+            peer, payload = result["next_hop"], dict(payload, hops=result["hops"])
+        raise RuntimeError(f"Iterative lookup for {endpoint} did not converge in {max_hops} hops")
+
+    def close(self):
+        """
+        Close every pooled connection.
+        """
+        with self._lock:
+            sessions, self._sessions = self._sessions, {}
+        for session in sessions.values():
+            session.close()
@@ -0,0 +1,175 @@
+import bisect
+import contextvars
+import json
+import os
+import re
+import hashing
+import helper_functions as hf
+
+# Virtual nodes.
+#
+# A process (ip:port, the physical node) may own several tokens on the ring. Every token is a full Node, so
+# joins, transfers, replication and routing all work per token; a ring member's address carries the index of
+# its token in the process as "vnode" (absent for the first token, which keeps the id hash(ip:port) and the
+# plain URLs). Requests for token i are sent to http://ip:port/v/i/<endpoint>.
+
+_prefix = re.compile(r"^/v/(\d+)(/.*)$")
+
+# Index of the token serving the current request (set by the servers from the URL prefix).
+current = contextvars.ContextVar("vnode", default=0)
+
+
+def peer(ip, port, node_id, vnode=0):
+    """
+    Address of a ring member: ip and port of its process, its node id and, for tokens after the first,
+    their index in the process.
+    """
+    member = {"ip": ip, "port": port, "node_id": node_id}
+    if vnode:
+        member["vnode"] = int(vnode)
+    return member
+
+
+def url(member, endpoint):
+    """
+    URL of endpoint on the ring member (or client) member.
+    """
+    prefix = f"/v/{member['vnode']}" if member.get("vnode") else ""
+    return f"http://{member['ip']}:{member['port']}{prefix}{endpoint}"
+
+
+def split_path(path):
+    """
+    (token index, endpoint) of a request path: "/v/2/query" -> (2, "/query"), "/query" -> (0, "/query").
+    """
+    match = _prefix.match(path)
+    if match is None:
+        return 0, path
+    return int(match.group(1)), match.group(2)
+
+
+def host(member):
+    return f"{member['ip']}:{member['port']}"
+
+
+def chain(members, key_hash, length):
+    """
+    The replica chain of the key hash key_hash among the ring members `members` (sorted by node id): its
+    primary, then the next members, skipping the tokens of a process already in the chain, up to length members.
+    """
+    start = bisect.bisect_left([member["node_id"] for member in members], key_hash)
+    replicas, hosts = [], set()
+    for distance in range(len(members)):
+        member = members[(start + distance) % len(members)]
+        if host(member) in hosts:
+            continue
+        replicas.append(member)
+        hosts.add(host(member))
+        if len(replicas) == length:
+            break
+    return replicas
+
+
+def choose_token(ip, port, vnode, members, k_factor):
+    """
+    Ring position for token vnode of the process ip:port, joining the ring members `members`.
+
+    Replicas of a key go to the k_factor - 1 successors of its primary, so two members of one process share a
+    replica chain when they are less than k_factor members apart. The token goes into the range (between two
+    consecutive members) with the fewest members of its own process within k_factor - 1 on either side: none,
+    once the ring has enough other members. Ties go to the range that moves apart the most pairs of members of
+    another process that shared a chain, then to the widest range of the processes owning the most of the
+    ring (width times the share of its owner's process), which is split near its middle.
+    """
+    owner = f"{ip}:{port}"
+    ordered = sorted(members, key=lambda member: member["node_id"])
+    hosts = [host(member) for member in ordered]
+    widths = [(member["node_id"] - ordered[index - 1]["node_id"]) % hashing.RING_SIZE or hashing.RING_SIZE
+              for index, member in enumerate(ordered)]
+    shares = {}
+    for name, width in zip(hosts, widths):
+        shares[name] = shares.get(name, 0) + width
+    reach, size = k_factor - 1, len(ordered)
+    best = None
+    for index, width in enumerate(widths):
+        # The range (ordered[index - 1], ordered[index]]: a token placed in it sits before ordered[index].
+        if width < 2:
+            continue
+        conflicts = sum(hosts[i] == owner for i in {(index + offset) % size for offset in range(-reach, reach)})
+        separated = sum(hosts[(index + offset) % size] == hosts[(index + offset + reach) % size] != owner
+                        for offset in range(-reach, 0)) if size > reach else 0
+        score = (conflicts, -separated, -width * shares[hosts[index]])
+        if best is None or score < best[0]:
+            best = score, ordered[index - 1]["node_id"], width
+    if best is None:
+        raise RuntimeError(f"No free ring position for token {vnode} of {owner}")
+    _, start, width = best
+    # Off the exact middle by a per-token amount, so two processes splitting the same range do not collide.
+    jitter = hf.hash_function(f"{owner}#{vnode}") % max(1, width // 8) - width // 16
+    return (start + width // 2 + jitter) % hashing.RING_SIZE
+
+
+def saved_token(directory, choose):
+    """
+    The ring position recorded in directory by an earlier run of this token (a restarted token keeps it,
+    so its recovered stores still match its range), otherwise choose() recorded there.
+    """
+    if directory is None:
+        return choose()
+    path = os.path.join(directory, "token.json")
+    if os.path.exists(path):
+        with open(path) as f:
+            return json.load(f)["node_id"]
+    node_id = choose()
+    os.makedirs(directory, exist_ok=True)
+    with open(path, "w") as f:
+        json.dump({"node_id": node_id}, f)
+    return node_id
+
+
+def ownership(members):
+    """
+    Range ownership of the ring: the share of the identifier space every member owns ((predecessor, member]),
+    the share of every process (the sum over its tokens), and the imbalance, the largest process share over
+    the mean share (1.0 is a perfectly even ring).
+    """
+    ordered = sorted(members, key=lambda member: member["node_id"])
+    tokens, hosts = {}, {}
+    for index, member in enumerate(ordered):
+        span = (member["node_id"] - ordered[index - 1]["node_id"]) % hashing.RING_SIZE or hashing.RING_SIZE
+        tokens[member["node_id"]] = span / hashing.RING_SIZE
+        hosts[host(member)] = hosts.get(host(member), 0) + span / hashing.RING_SIZE
+    return {"tokens": {node_id: round(share, 6) for node_id, share in tokens.items()},
+            "hosts": {name: round(share, 6) for name, share in hosts.items()},
+            "imbalance": round(max(hosts.values()) * len(hosts), 3) if hosts else None}
+
+
+class Local:
+    """
+    Stand-in for the Node of the token serving the current request (see current), looked up in nodes.
+    """
+
+    def __init__(self, nodes):
+        self._nodes = nodes
+
+    def __getattr__(self, name):
+        return getattr(self._nodes[current.get()], name)
+
+
+class Dispatch:
+    """
+    WSGI middleware for the virtual nodes of a process: strips the /v/<i> prefix of a request and selects
+    token i for it (see Local). A token the process does not have (yet) is answered with 404.
+    """
+
+    def __init__(self, app, nodes):
+        self.app = app
+        self.nodes = nodes
+
+    def __call__(self, environ, start_response):
+        vnode, environ["PATH_INFO"] = split_path(environ.get("PATH_INFO", ""))
+        if vnode not in self.nodes:
+            start_response("404 NOT FOUND", [("Content-Type", "application/json")])
+            return [json.dumps({"status": "error", "message": f"No virtual node {vnode} here"}).encode()]
+        current.set(vnode)
+        return self.app(environ, start_response)
@@ -0,0 +1,206 @@
+import contextvars
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+import app
+import helper_functions as hf
+import rope
+from node import Node
+from storage import open_stores
+from transport import Transport
+
+# An in-process ring for Node-level tests: every node is served by app.py's handlers through Flask's test client
+# (each one as a token of app.nodes, reached under /v/<i>), so requests between nodes take the same code paths as
+# over HTTP, without sockets. Messages to clients (/reception) are recorded instead.
+
+
+class Response:
+    """
+    The parts of a requests.Response the nodes use, for a test client response.
+    """
+
+    def __init__(self, response):
+        self.status_code = response.status_code
+        self.text = response.get_data(as_text=True)
+
+    def json(self):
+        return json.loads(self.text)
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise RuntimeError(f"HTTP {self.status_code}: {self.text}")
+
+    def iter_lines(self):
+        return iter(self.text.encode().splitlines())
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class LocalTransport:
+    """
+    Transport of the nodes of a LocalRing (same interface as transport.Transport).
+    """
+
+    iterate = Transport.iterate
+
+    def __init__(self, ring):
+        self.ring = ring
+        self.pool_size = 16
+        self.timeout = None
+        self.connect_timeout = None
+
+    def configure(self, pool_size=None, timeout=None, connect_timeout=None):
+        pass
+
+    def request(self, method, peer, endpoint, **kwargs):
+        if endpoint == "/reception" and method == "post":
+            self.ring.received.append(json.loads(kwargs["data"]))
+            return Response(app.app.response_class("{}", mimetype="application/json"))
+        token = self.ring.tokens.get((peer["port"], peer.get("vnode", 0)))
+        if token is None or token in self.ring.stopped:
+            raise ConnectionError(f"Node {peer.get('node_id')} at port {peer['port']} is not running")
+        if (token, endpoint) in self.ring.blocked:
+            raise ConnectionError(f"{endpoint} of node {peer.get('node_id')} is blocked")
+        client = app.app.test_client()
+        # The token is selected per request (vnodes.current): keep that out of the caller's context.
+        return Response(contextvars.copy_context().run(getattr(client, method), f"/v/{token}{endpoint}", **kwargs))
+
+    def post(self, peer, endpoint, json=None, timeout=None, data=None, headers=None, **kwargs):
+        if json is not None:
+            data = rope.dumps(json)
+        elif data is not None and not isinstance(data, (str, bytes)):
+            data = b"".join(chunk if isinstance(chunk, bytes) else chunk.encode() for chunk in data)
+        return self.request("post", peer, endpoint, data=data, content_type="application/json")
+
+    def get(self, peer, endpoint, params=None, timeout=None, **kwargs):
+        return self.request("get", peer, endpoint, query_string=params)
+
+    def close(self):
+        pass
+
+
+class LocalRing:
+    """
+    Nodes joined into one ring the way app.py joins them (see app.join_ring), with membership spread by gossip.
+    Ports tell processes apart: tokens of one process share a port and differ in their vnode index.
+    """
+
+    def __init__(self, consistency="linearizability", k_factor=3):
+        self.consistency = consistency
+        self.k_factor = k_factor
+        self.transport = LocalTransport(self)
+        self.tokens = {}  # (port, vnode) -> index in app.nodes
+        self.stopped = set()
+        self.blocked = set()  # (index in app.nodes, endpoint) of requests that fail
+        self.received = []
+        app.nodes.clear()
+
+    @property
+    def nodes(self):
+        """
+        The nodes still in the ring.
+        """
+        return [node for _, node in sorted(app.nodes.items()) if not node.departed]
+
+    def add(self, port, vnode=0, node_id=None):
+        """
+        Start a node (token vnode of the process at port), alone in a new ring if it is the first one, otherwise
+        joined through the first node.
+        """
+        data_store, replicas = open_stores()
+        if not app.nodes:
+            node = Node("127.0.0.1", port, self.consistency, self.k_factor, data_store=data_store, replicas=replicas,
+                        vnode=vnode, node_id=node_id)
+        else:
+            transport, app.Transport = app.Transport, lambda: self.transport
+            try:
+                node = app.join_ring(app.nodes[0].address(), "127.0.0.1", port, data_store, replicas, vnode, node_id)
+            finally:
+                app.Transport = transport
+        node.transport = self.transport
+        node.join_grace = 0
+        index = len(app.nodes)
+        self.tokens[(port, vnode)] = index
+        app.nodes[index] = node
+        self.settle()
+        return node
+
+    def stop(self, node):
+        """
+        Stop serving node, as if its process crashed.
+        """
+        node.departed = True
+        self.stopped.add(self.tokens[(node.port, node.vnode)])
+
+    def block(self, node, endpoint, blocked=True):
+        """
+        Make the requests to endpoint on node fail (as if they were lost), or deliver them again.
+        """
+        (self.blocked.add if blocked else self.blocked.discard)((self.tokens[(node.port, node.vnode)], endpoint))
+
+    def settle(self, rounds=None):
+        """
+        Run gossip until every node has the same membership table, then rebuild the successor lists.
+        """
+        for _ in range(rounds or 4 * len(self.nodes)):
+            for node in self.nodes:
+                node.gossip_round()
+            if len({node.membership.version for node in self.nodes}) == 1:
+                break
+        for node in self.nodes:
+            node.successors = None
+            if node.successor["node_id"] != node.node_id:
+                node.refresh_successors()
+
+    def owner(self, key):
+        return next(node for node in self.nodes if node.is_responsible(hf.hash_function(key)))
+
+    def chain(self, key):
+        """
+        The node ids of the replica chain of key, primary first, as the ring's nodes see it.
+        """
+        return [member["node_id"] for member in self.nodes[0].replica_set(hf.hash_function(key))]
+
+    def expected_copies(self, key, value):
+        """
+        copies(key) of a key fully replicated along its chain with this value.
+        """
+        chain = self.chain(key)
+        return {node_id: (value, self.k_factor - position if position else None)
+                for position, node_id in enumerate(chain)}
+
+    def copies(self, key):
+        """
+        {node_id: (value, replication count)} of every copy of key in the ring (count None for a primary copy).
+        """
+        copies = {}
+        for node in self.nodes:
+            if key in node.data_store:
+                copies[node.node_id] = (str(node.data_store[key]), None)
+            elif key in node.replicas:
+                value, count = node.replicas[key]
+                copies[node.node_id] = (str(value), count)
+        return copies
+
+    def close(self):
+        for node in app.nodes.values():
+            node.departed = True
+        app.nodes.clear()
+
+
+def wait_for(condition, timeout=5):
+    """
+    Wait until condition() is true (background replication), returning its last value.
+    """
+    deadline = time.time() + timeout
+    while not condition() and time.time() < deadline:
+        time.sleep(0.02)
+    return condition()
+
@@ -0,0 +1,79 @@
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+from balancer import ReplicaSelector
+
+PEERS = [{"node_id": node_id} for node_id in (1, 2, 3)]
+
+
+def test_least_outstanding_picks_the_idle_replica():
+    selector = ReplicaSelector("least_outstanding")
+    selector._begin(PEERS[0])
+    selector._begin(PEERS[2])
+    assert all(selector.pick(PEERS) is PEERS[1] for _ in range(20))
+
+
+def test_p2c_never_picks_the_worse_of_its_two():
+    selector = ReplicaSelector("p2c")
+    for _ in range(3):
+        selector._begin(PEERS[0])
+    assert all(selector.pick(PEERS) is not PEERS[0] for _ in range(50))
+
+
+def test_random_spreads_reads():
+    selector = ReplicaSelector("random")
+    assert {selector.pick(PEERS)["node_id"] for _ in range(200)} == {1, 2, 3}
+
+
+def test_failures_are_penalised():
+    selector = ReplicaSelector("least_outstanding", failure_penalty=1.0)
+
+    def fail(peer):
+        raise ConnectionError()
+
+    try:
+        selector.call(PEERS[0], fail)
+    except ConnectionError:
+        pass
+    selector.call(PEERS[1], lambda peer: "ok")
+    assert selector.load(PEERS[0]) == (0, 1.0)
+    assert selector.pick(PEERS[:2]) is PEERS[1]
+
+
+def test_hedge_delay_needs_samples():
+    selector = ReplicaSelector(min_samples=5, hedge_percentile=50)
+    assert selector.hedge_delay() is None
+    for _ in range(5):
+        selector.call(PEERS[0], lambda peer: None)
+    assert selector.hedge_delay() is not None
+    assert ReplicaSelector(hedge_percentile=None).hedge_delay() is None
+
+
+def test_read_moves_on_to_an_accepted_answer():
+    selector = ReplicaSelector("random")
+    answers = {1: None, 2: None, 3: "value"}
+    with ThreadPoolExecutor(4) as pool:
+        peer, answer = selector.read(pool, PEERS, lambda peer: answers[peer["node_id"]], lambda a: a is not None)
+    assert (peer["node_id"], answer) == (3, "value")
+
+
+def test_read_hedges_a_slow_replica():
+    selector = ReplicaSelector("random", min_samples=1, hedge_percentile=50)
+    selector.call(PEERS[0], lambda peer: None)  # one fast sample: hedge almost at once
+    calls = []
+
+    def request(peer):
+        calls.append(peer["node_id"])
+        time.sleep(1.0 if len(calls) == 1 else 0.05)
+        return peer["node_id"]
+
+    start = time.monotonic()
+    with ThreadPoolExecutor(4) as pool:
+        _, answer = selector.read(pool, PEERS, request, lambda a: True)
+        elapsed = time.monotonic() - start
+    assert elapsed < 0.8
+    assert answer == calls[1] != calls[0]
+    assert selector.hedged == 1
@@ -0,0 +1,54 @@
+import json
+import os
+import sys
+from collections import Counter
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+from local_ring import LocalRing, wait_for
+
+KEYS = [f"key{i}" for i in range(60)]
+
+
+@pytest.mark.parametrize("consistency", ["linearizability", "eventual", "quorum"])
+def test_batches_reach_each_owner_once_and_replicate_down_the_chain(consistency):
+    ring = LocalRing(consistency, 3)
+    try:
+        for port in range(5000, 5006):
+            ring.add(port)
+        for node in ring.nodes:
+            node.fix_fingers()
+        received = Counter()  # (endpoint, node_id) -> sub-batches that node received holding keys it owns
+        request = ring.transport.request
+
+        def counting_request(method, peer, endpoint, **kwargs):
+            if endpoint in ("/insert_batch", "/delete_batch"):
+                batch = json.loads(kwargs["data"])
+                keys = [item["key"] for item in batch["items"]] if "items" in batch else batch["keys"]
+                if any(ring.owner(key).node_id == peer["node_id"] for key in keys):
+                    received[(endpoint, peer["node_id"])] += 1
+            return request(method, peer, endpoint, **kwargs)
+
+        ring.transport.request = counting_request
+        # Values of a key repeated in the batch are appended in order.
+        items = [{"key": key, "value": "a"} for key in KEYS] + [{"key": KEYS[0], "value": "b"}]
+        response = ring.nodes[0].insert_batch(items)
+        assert response["status"] == "success"
+        assert sorted(result["key"] for result in response["results"]) == sorted(item["key"] for item in items)
+        assert all(result["node_id"] == ring.owner(result["key"]).node_id for result in response["results"])
+        assert received and all(count == 1 for count in received.values())
+        values = {key: "ab" if key == KEYS[0] else "a" for key in KEYS}
+        assert all(wait_for(lambda: ring.copies(key) == ring.expected_copies(key, values[key])) for key in KEYS)
+        results = ring.nodes[3].multi_get(KEYS)["results"]
+        # With eventual consistency a replica may answer, as "replica value".
+        assert {key: result.get("value", result.get("replica value")) for key, result in results.items()} == values
+
+        received.clear()
+        response = ring.nodes[2].delete_batch(KEYS + KEYS[:5])
+        assert sorted(result["key"] for result in response["results"]) == sorted(KEYS)
+        assert all(result["status"] == "success" for result in response["results"])
+        assert received and all(count == 1 for count in received.values())
+        assert all(wait_for(lambda: ring.copies(key) == {}) for key in KEYS)
+    finally:
+        ring.close()
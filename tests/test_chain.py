@@ -0,0 +1,120 @@
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+from chain import OrderedSender, AckTracker
+from local_ring import LocalRing, wait_for
+
+
+def test_batches_arrive_in_order():
+    received = []
+    sender = OrderedSender(received.extend, max_batch=7)
+    for i in range(100):
+        sender.submit(i)
+    assert sender.drain(5)
+    assert received == list(range(100))
+    assert sender.stats() == {"queued": 0, "sent": 100, "dropped": 0}
+
+
+def test_bounded_retries_drop_the_batch():
+    def send(batch):
+        raise ConnectionError("down")
+
+    sender = OrderedSender(send, retries=2, backoff=0.001)
+    sender.submit("a")
+    assert sender.drain(5)
+    assert sender.stats()["dropped"] == 1
+
+
+def test_keeps_retrying_and_resends_to_the_replacement():
+    # The first peer never answers; once it is "declared failed" the send function reaches the replacement.
+    state = {"target": "failed", "attempts": 0}
+    received = []
+
+    def send(batch):
+        state["attempts"] += 1
+        if state["target"] == "failed":
+            if state["attempts"] == 10:
+                state["target"] = "replacement"
+            raise ConnectionError("no answer")
+        received.extend(batch)
+
+    sender = OrderedSender(send, retries=3, backoff=0.001, keep_trying=lambda: True)
+    for i in range(5):
+        sender.submit(i)
+    assert sender.drain(5)
+    assert received == list(range(5))
+    assert sender.stats()["dropped"] == 0
+    assert state["attempts"] > 4
+
+
+def test_gives_up_once_keep_trying_fails():
+    give_up = threading.Event()
+
+    def send(batch):
+        give_up.set()
+        raise ConnectionError("no answer")
+
+    sender = OrderedSender(send, retries=1, backoff=0.001, keep_trying=lambda: not give_up.is_set())
+    sender.submit("a")
+    assert sender.drain(5)
+    assert sender.stats()["dropped"] == 1
+
+
+def test_ack_tracker_resolves_and_forgets():
+    tracker = AckTracker()
+    first, second = tracker.expect("k", 1), tracker.expect("k", 2)
+    tracker.resolve("k", 1)
+    assert first.result(0) is True
+    assert not tracker.wait_idle(0)
+    tracker.forget([second])
+    assert tracker.wait_idle(0)
+    assert len(tracker) == 0
+
+
+def test_pipelined_chain_writes_apply_in_head_order():
+    # Node level: concurrent appends to one key through its head reach every chain member in the head's order.
+    ring = LocalRing("linearizability", 3)
+    try:
+        for port in (5000, 5001, 5002, 5003):
+            ring.add(port)
+        head = ring.owner("log")
+        head.chain_wait = False
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            list(executor.map(lambda i: head.insert("log", f"{i},", None, None), range(60)))
+        value = str(head.data_store["log"])
+        assert sorted(value.split(",")[:-1], key=int) == [str(i) for i in range(60)]
+        assert wait_for(lambda: ring.copies("log") == ring.expected_copies("log", value))
+        assert wait_for(lambda: "log" not in head.dirty)
+        assert head.chain_acks.wait_idle(5)
+    finally:
+        ring.close()
+
+
+def test_dirty_reads_answer_the_version_the_tail_committed():
+    # CRAQ: while a write has not reached the tail, the head and the middle of the chain answer the old value.
+    ring = LocalRing("linearizability", 3)
+    try:
+        for port in (5000, 5001, 5002, 5003):
+            ring.add(port)
+        head = ring.owner("k")
+        middle, tail = (next(node for node in ring.nodes if node.node_id == node_id) for node_id in ring.chain("k")[1:])
+        head.chain_wait = False
+        head.insert("k", "v1", None, None)
+        assert wait_for(lambda: ring.copies("k") == ring.expected_copies("k", "v1") and "k" not in head.dirty)
+
+        ring.block(tail, "/chain_write")
+        head.insert("k", "v2", None, None)
+        assert wait_for(lambda: str(middle.replicas["k"][0]) == "v1v2")
+        assert "k" in head.dirty and "k" in middle.dirty
+        assert head.query("k", None, None)["value"] == "v1"
+        assert middle.query_chain("k", 2, head.node_id)["value"] == "v1"
+
+        ring.block(tail, "/chain_write", blocked=False)
+        assert wait_for(lambda: "k" not in head.dirty)
+        assert head.query("k", None, None)["value"] == "v1v2"
+        assert tail.query_chain("k", 1, head.node_id)["value"] == "v1v2"
+    finally:
+        ring.close()
@@ -0,0 +1,58 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+import helper_functions as hf
+from chordify_client import RingView
+
+# Two processes with two tokens each, interleaved so that a key's ring successor is often a token of its
+# own primary's process: A0 < A1 < B0 < B1 on the ring.
+MEMBERS = [
+    {"ip": "127.0.0.1", "port": 5000, "node_id": 10000},
+    {"ip": "127.0.0.1", "port": 5000, "node_id": 20000, "vnode": 1},
+    {"ip": "127.0.0.1", "port": 5001, "node_id": 40000},
+    {"ip": "127.0.0.1", "port": 5001, "node_id": 50000, "vnode": 1},
+]
+
+
+def ring(consistency="linearizability", k_factor=2):
+    view = RingView()
+    view.update({"status": "success", "overlay": MEMBERS, "version": 1, "consistency": consistency,
+                 "k_factor": k_factor, "m_bits": 16})
+    return view
+
+
+def key_owned_by(node_id):
+    ids = [member["node_id"] for member in MEMBERS]
+    previous = ids[ids.index(node_id) - 1]
+    return next(key for key in (f"key{i}" for i in range(10000))
+                if hf.in_interval(hf.hash_function(key), previous, node_id))
+
+
+def test_chain_skips_tokens_of_the_same_process():
+    view = ring()
+    key = key_owned_by(10000)
+    assert [member["node_id"] for member in view.replicas(key)] == [10000, 40000]
+    assert view.tail(key)["node_id"] == 40000
+    readers = [view.reader(key) for _ in range(100)]
+    assert {(member["node_id"], count) for member, count in filter(None, readers)} == {(40000, 1)}
+
+
+def test_chain_wraps_around_the_ring():
+    view = ring()
+    key = key_owned_by(50000)
+    assert [member["node_id"] for member in view.replicas(key)] == [50000, 10000]
+
+
+def test_chain_is_as_long_as_the_distinct_processes():
+    view = ring(k_factor=3)
+    key = key_owned_by(20000)
+    assert [member["node_id"] for member in view.replicas(key)] == [20000, 40000]
+    assert view.tail(key)["node_id"] == 40000
+
+
+def test_eventual_reads_go_through_the_owner():
+    view = ring("eventual")
+    key = key_owned_by(40000)
+    assert view.tail(key) is None and view.reader(key) is None
+    assert [member["node_id"] for member in view.replicas(key)] == [40000, 10000]
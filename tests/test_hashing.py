@@ -0,0 +1,58 @@
+import hashlib
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+import hashing
+from local_ring import LocalRing, wait_for
+
+KEYS = [f"key{i}" for i in range(100)] + ["", "Like a Rolling Stone", "Ελληνικά"]
+
+
+@pytest.fixture
+def m_bits():
+    # Restore the default identifier space after a test that changes it.
+    default = hashing.M_BITS
+    yield hashing.configure
+    hashing.configure(default)
+
+
+@pytest.mark.parametrize("bits", [16, 7, 20, 160])
+def test_hashes_are_sha1_modulo_the_identifier_space(m_bits, bits):
+    m_bits(bits)
+    expected = [int(hashlib.sha1(key.encode()).hexdigest(), 16) % 2 ** bits for key in KEYS]
+    assert [hashing.hash_key(key) for key in KEYS] == expected
+    assert hashing.hash_many(KEYS) == expected
+    # Memoized results are those of the current space.
+    assert [hashing.hash_key(key) for key in KEYS] == expected
+
+
+def test_configure_rejects_spaces_sha1_cannot_fill():
+    with pytest.raises(ValueError):
+        hashing.configure(0)
+    with pytest.raises(ValueError):
+        hashing.configure(161)
+
+
+@pytest.mark.parametrize("consistency", ["linearizability", "eventual"])
+def test_ring_in_a_larger_identifier_space(m_bits, consistency):
+    m_bits(24)
+    ring = LocalRing(consistency, 3)
+    try:
+        for port in (5000, 5001, 5002, 5003):
+            ring.add(port)
+        assert any(node.node_id >= 2 ** 16 for node in ring.nodes)
+        for node in ring.nodes:
+            node.fix_fingers()
+            assert len(node.fingers) == 24
+        for i, key in enumerate(KEYS):
+            ring.nodes[i % 4].insert(key, "v", None, None)
+        assert all(wait_for(lambda: ring.copies(key) == ring.expected_copies(key, "v")) for key in KEYS)
+        # A joining node takes the keys of its range from its successor.
+        new_node = ring.add(5004)
+        assert new_node.node_id < 2 ** 24
+        assert all(wait_for(lambda: ring.copies(key) == ring.expected_copies(key, "v")) for key in KEYS)
+    finally:
+        ring.close()
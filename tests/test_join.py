@@ -2,15 +2,15 @@ import pytest
 import time
 import requests
 import subprocess
-import hashlib
+import os
+import sys
 from tests.kill_ports import kill_ports
 
 from tests.visualize_script import visualize_chord_ring
 
-
-def hash_function(key):
-    """Compute SHA-1 hash of a key mod 2^16."""
-    return int(hashlib.sha1(key.encode()).hexdigest(), 16) % (2 ** 16)
+# Hash keys exactly like the nodes do.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+from hashing import hash_key as hash_function
 
 
 keys = []
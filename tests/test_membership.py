@@ -0,0 +1,67 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+from membership import MembershipTable
+
+
+def entry(node_id, status, version, port=None):
+    return {"node_id": node_id, "ip": "127.0.0.1", "port": port or 5000 + node_id, "status": status, "version": version}
+
+
+def test_merge_keeps_the_newer_entry():
+    table = MembershipTable()
+    assert table.merge([entry(1, "alive", 10), entry(2, "alive", 10)])
+    assert not table.merge([entry(1, "failed", 9)])
+    assert table.merge([entry(1, "failed", 11)])
+    assert table.down == {1}
+    assert [member["node_id"] for member in table.alive()] == [2]
+
+
+def test_a_failed_node_is_not_revived_by_stale_gossip():
+    table = MembershipTable()
+    table.merge([entry(3, "alive", 10)])
+    table.record({"node_id": 3, "ip": "127.0.0.1", "port": 5003}, "failed")
+    assert not table.merge([entry(3, "alive", 10)])
+    assert 3 in table.down
+
+
+def test_same_version_means_same_entries():
+    first, second = MembershipTable(), MembershipTable()
+    first.merge([entry(1, "alive", 10), entry(2, "alive", 20)])
+    second.merge([entry(2, "alive", 20), entry(1, "alive", 10)])
+    assert first.version == second.version
+
+    # The same sum of entry versions, but not the same view.
+    third = MembershipTable()
+    third.merge([entry(1, "alive", 11), entry(2, "alive", 19)])
+    assert third.version != first.version
+    fourth = MembershipTable()
+    fourth.merge([entry(1, "left", 10), entry(2, "alive", 20)])
+    assert fourth.version != first.version
+
+
+def test_version_follows_replaced_entries():
+    table, fresh = MembershipTable(), MembershipTable()
+    table.merge([entry(1, "alive", 10), entry(2, "alive", 10)])
+    table.merge([entry(2, "failed", 15)])
+    fresh.merge([entry(2, "failed", 15), entry(1, "alive", 10)])
+    assert table.version == fresh.version
+
+
+def test_gossip_exchange_converges():
+    # One gossip_round between two nodes: pull the peer's entries when the versions differ, then push ours back.
+    tables = [MembershipTable() for _ in range(4)]
+    for index, table in enumerate(tables):
+        table.record({"node_id": index, "ip": "127.0.0.1", "port": 5000 + index}, "alive")
+    tables[0].record({"node_id": 9, "ip": "127.0.0.1", "port": 5009}, "failed")
+    for _ in range(3):
+        for index, table in enumerate(tables):
+            peer = tables[(index + 1) % len(tables)]
+            if peer.version != table.version:
+                table.merge(peer.entries())
+                if table.version != peer.version:
+                    peer.merge(table.entries())
+    assert len({table.version for table in tables}) == 1
+    assert all(table.down == {9} for table in tables)
+    assert [member["node_id"] for member in tables[2].alive()] == [0, 1, 2, 3]
@@ -0,0 +1,59 @@
+import os
+import sys
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+from local_ring import LocalRing, wait_for
+
+KEYS = [f"key{i}" for i in range(10)]
+
+
+def messages(received):
+    # Messages posted together arrive as {"batch": [...]}.
+    return [message for post in received for message in post.get("batch", [post])]
+
+
+@pytest.mark.parametrize("consistency", ["linearizability", "eventual", "quorum"])
+def test_every_request_reaches_the_client_once(consistency):
+    ring = LocalRing(consistency, 3)
+    try:
+        for port in (5000, 5001, 5002, 5003):
+            ring.add(port)
+        for key in KEYS:
+            ring.nodes[0].insert(key, "v", "127.0.0.1", 9000)
+        ring.nodes[1].query(KEYS[0], "127.0.0.1", 9000)
+        assert wait_for(lambda: len(messages(ring.received)) == len(KEYS) + 1)
+        # Messages of different nodes arrive in any order.
+        delivered = messages(ring.received)
+        assert sorted(message["key"] for message in delivered) == sorted(KEYS + KEYS[:1])
+        assert all(message["status"].startswith("success") and message["value"] == "v" for message in delivered)
+        assert sum(node.outbox.stats()["delivered"] for node in ring.nodes) == len(KEYS) + 1
+    finally:
+        ring.close()
+
+
+def test_an_unreachable_client_does_not_hold_up_writes():
+    ring = LocalRing("linearizability", 3)
+    try:
+        for port in (5000, 5001, 5002, 5003):
+            ring.add(port)
+        request = ring.transport.request
+
+        def unreachable_client(method, peer, endpoint, **kwargs):
+            if endpoint == "/reception":
+                time.sleep(0.2)
+                raise ConnectionError("client is down")
+            return request(method, peer, endpoint, **kwargs)
+
+        ring.transport.request = unreachable_client
+        started = time.time()
+        for key in KEYS:
+            assert ring.nodes[0].insert(key, "v", "127.0.0.1", 9000)["status"] == "success"
+        assert time.time() - started < 0.2 * len(KEYS)
+        assert all(ring.copies(key) == ring.expected_copies(key, "v") for key in KEYS)
+        # The messages are retried, then dropped.
+        assert wait_for(lambda: sum(node.outbox.stats()["dropped"] for node in ring.nodes) == len(KEYS), 10)
+    finally:
+        ring.close()
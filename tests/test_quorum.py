@@ -0,0 +1,51 @@
+import os
+import sys
+from concurrent.futures import Future
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+from quorum import quorum, version_order
+
+
+def resolved(value):
+    future = Future()
+    future.set_result(value)
+    return future
+
+
+def test_newer_sequence_number_wins():
+    assert version_order([900, 2]) > version_order([100, 1])
+    assert version_order([100, 2]) > version_order([900, 1])
+
+
+def test_head_id_breaks_ties():
+    assert version_order([200, 5]) > version_order([100, 5])
+    assert max([[100, 5], [200, 5], [300, 4]], key=version_order) == [200, 5]
+
+
+def test_unversioned_copies_are_oldest():
+    assert version_order(None) < version_order([0, 0])
+    assert version_order([]) == version_order(None)
+
+
+def test_quorum_resolves_once_enough_succeed():
+    futures = [Future() for _ in range(3)]
+    result = quorum(futures, 2)
+    futures[0].set_result(True)
+    assert not result.done()
+    futures[1].set_exception(ConnectionError())
+    assert not result.done()
+    futures[2].set_result(True)
+    assert result.result(0) is True
+
+
+def test_quorum_fails_once_unreachable():
+    futures = [Future() for _ in range(3)]
+    result = quorum(futures, 2)
+    futures[0].set_result(False)
+    futures[1].set_exception(ConnectionError())
+    assert result.result(0) is False
+
+
+def test_quorum_edge_sizes():
+    assert quorum([], 0).result(0) is True
+    assert quorum([resolved(True)], 2).result(0) is False
@@ -0,0 +1,100 @@
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+from replication import ReplicationPipeline, ReplicationQueue
+from local_ring import LocalRing, wait_for
+
+
+def test_queue_coalesces_pending_updates():
+    flushed, release = [], threading.Event()
+
+    def flush(updates):
+        release.wait(5)
+        flushed.append(updates)
+
+    queue = ReplicationQueue(flush, workers=1, interval=0.01, max_batch=100)
+    queue.submit("busy")
+    time.sleep(0.05)  # "busy" is being flushed; the next writes queue up behind it
+    for _ in range(10):
+        queue.submit("a", "set")
+    queue.submit("b", "set")
+    queue.submit("b", "del")
+    release.set()
+    assert queue.drain(5)
+    merged = {key: op for updates in flushed for key, op in updates.items()}
+    assert merged == {"busy": "set", "a": "set", "b": "del"}
+    assert queue.stats()["coalesced"] == 10
+
+
+def test_updates_of_one_key_are_never_flushed_concurrently():
+    active, overlaps = set(), []
+    lock = threading.Lock()
+
+    def flush(updates):
+        with lock:
+            overlaps.extend(key for key in updates if key in active)
+            active.update(updates)
+        time.sleep(0.01)
+        with lock:
+            active.difference_update(updates)
+
+    queue = ReplicationQueue(flush, workers=4, interval=0.001, max_batch=3)
+    for i in range(200):
+        queue.submit(f"k{i % 5}")
+    assert queue.drain(10)
+    assert overlaps == []
+
+
+def test_failed_flush_does_not_stop_the_workers():
+    calls = []
+
+    def flush(updates):
+        calls.append(updates)
+        if len(calls) == 1:
+            raise ConnectionError("down")
+
+    queue = ReplicationQueue(flush, workers=1, interval=0.001)
+    queue.submit("a")
+    assert queue.drain(5)
+    queue.submit("b")
+    assert queue.drain(5)
+    assert [list(updates) for updates in calls] == [["a"], ["b"]]
+
+
+def test_pipeline_batches_and_reports_failures():
+    sent = []
+
+    def send(batch):
+        sent.append(len(batch))
+        return batch[0]["key"] != "k5"
+
+    items = [{"key": f"k{i}", "value": str(i)} for i in range(12)]
+    report = ReplicationPipeline(send, batch_size=5, concurrency=2).run(items)
+    assert sorted(sent) == [2, 5, 5]
+    assert (report["batches"], report["batches_done"], report["batches_failed"]) == (3, 2, 1)
+    assert (report["items"], report["items_done"]) == (12, 7)
+
+
+def test_eventual_delete_and_rewrite_replace_the_replicas_value():
+    # Node level: a delete and a new write of a key that coalesce into one update must not be sent as an append
+    # to the deleted value (replicas receive only the appended text of a key, see Node.flush_replication).
+    ring = LocalRing("eventual", 3)
+    try:
+        for port in (5000, 5001, 5002, 5003):
+            ring.add(port)
+        owner = ring.owner("k")
+        owner.insert("k", "abc", None, None)
+        owner.insert("k", "d", None, None)
+        assert wait_for(lambda: ring.copies("k") == ring.expected_copies("k", "abcd"))
+        with owner.replication_queue._cond:
+            # No flush can start before both are queued.
+            owner.delete("k")
+            owner.insert("k", "replaced", None, None)
+        assert wait_for(lambda: ring.copies("k") == ring.expected_copies("k", "replaced"))
+        owner.insert("k", "+", None, None)
+        assert wait_for(lambda: ring.copies("k") == ring.expected_copies("k", "replaced+"))
+    finally:
+        ring.close()
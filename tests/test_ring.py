@@ -0,0 +1,55 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+from local_ring import LocalRing, wait_for
+
+KEYS = [f"key{i}" for i in range(80)]
+
+
+@pytest.mark.parametrize("consistency", ["linearizability", "eventual"])
+def test_join_moves_keys_and_replicas_to_the_new_node(consistency):
+    ring = LocalRing(consistency, 3)
+    try:
+        for port in (5000, 5001, 5002):
+            ring.add(port)
+        for key in KEYS:
+            ring.nodes[0].insert(key, "v", None, None)
+        assert all(wait_for(lambda: ring.copies(key) == ring.expected_copies(key, "v")) for key in KEYS)
+        for port in (5003, 5004):
+            new_node = ring.add(port)
+            # Every key has exactly its new chain's copies, with counts by position in the chain.
+            for key in KEYS:
+                assert ring.copies(key) == ring.expected_copies(key, "v")
+            assert any(key in new_node.data_store for key in KEYS)
+    finally:
+        ring.close()
+
+
+@pytest.mark.parametrize("consistency", ["linearizability", "eventual", "quorum"])
+def test_depart_hands_keys_and_replicas_to_the_successor(consistency):
+    ring = LocalRing(consistency, 3)
+    try:
+        for port in (5000, 5001, 5002, 5003, 5004):
+            ring.add(port)
+        for key in KEYS:
+            ring.nodes[0].insert(key, "v", None, None)
+        assert all(wait_for(lambda: ring.copies(key) == ring.expected_copies(key, "v")) for key in KEYS)
+        for leaving in (ring.nodes[1], ring.nodes[3]):
+            owned = [key for key in KEYS if key in leaving.data_store]
+            assert leaving.depart()["status"] == "success"
+            ring.settle()
+            assert leaving not in ring.nodes and len(leaving.data_store) == len(leaving.replicas) == 0
+            assert all(wait_for(lambda: ring.copies(key) == ring.expected_copies(key, "v")) for key in KEYS)
+            assert all(key in ring.owner(key).data_store for key in owned)
+            # Writes reaching the departed node go on to its successor.
+            assert leaving.insert(KEYS[0], "w", None, None)["status"] == "success"
+            assert wait_for(lambda: ring.copies(KEYS[0]) == ring.expected_copies(KEYS[0], "vw"))
+            ring.owner(KEYS[0]).delete(KEYS[0])
+            ring.owner(KEYS[0]).insert(KEYS[0], "v", None, None)
+            # Quorum writes reach the copies past W in the background: let them land before the next departure.
+            assert wait_for(lambda: ring.copies(KEYS[0]) == ring.expected_copies(KEYS[0], "v"))
+    finally:
+        ring.close()
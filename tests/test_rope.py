@@ -0,0 +1,57 @@
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+import rope
+from rope import Rope
+
+
+def test_append_keeps_earlier_versions():
+    first = rope.append("a", "b")
+    second = first + "c"
+    branch = first + "x"
+    assert (str(first), str(second), str(branch)) == ("ab", "abc", "abx")
+    assert len(second) == 3
+    assert second.segments() == ["a", "b", "c"]
+
+
+def test_first_write_stays_a_string():
+    assert rope.append(None, "a") == "a"
+    assert not isinstance(rope.append("", "a"), Rope)
+
+
+def test_compaction_bounds_the_segments(monkeypatch):
+    monkeypatch.setattr(Rope, "compact_segments", 8)
+    value = "start"
+    for i in range(50):
+        value = rope.append(value, str(i))
+    assert str(value) == "start" + "".join(str(i) for i in range(50))
+    assert len(value.segments()) <= 8
+
+
+def test_suffix_reads_only_the_appended_text():
+    value = rope.append("abc", "de")
+    value = value + "fgh"
+    for offset in range(len(value) + 1):
+        assert rope.suffix(value, offset) == str(value)[offset:]
+    assert rope.suffix("abc", 1) == "bc"
+
+
+def test_json_round_trip():
+    value = rope.append("abc", "def")
+    encoded = rope.dumps({"key": "k", "value": value, "pair": [value, 2]})
+    assert json.loads(encoded) == {"key": "k", "value": "abcdef", "pair": ["abcdef", 2]}
+
+    record = rope.to_record(value)
+    assert record == {"segments": ["abc", "def"]}
+    restored = rope.from_record(json.loads(json.dumps(record)))
+    assert restored == value and isinstance(restored, Rope)
+    assert rope.from_record(rope.to_record("plain")) == "plain"
+
+
+def test_equality_and_hashing_follow_the_string():
+    value = rope.append("ab", "c")
+    assert value == "abc" and value == Rope(["a", "bc"])
+    assert hash(value) == hash("abc")
+    assert f"{value:>5}" == "  abc"
@@ -0,0 +1,58 @@
+import math
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+import hashing
+from local_ring import LocalRing
+
+KEYS = [f"key{i}" for i in range(200)]
+
+
+def ring_successor(ids, point):
+    return next((node_id for node_id in ids if node_id >= point), ids[0])
+
+
+def query_hops(ring):
+    nodes = ring.nodes
+    return [nodes[i % len(nodes)].query(key, None, None)["hops"] for i, key in enumerate(KEYS)]
+
+
+def test_fix_fingers_points_every_finger_at_the_successor_of_its_start():
+    ring = LocalRing("linearizability", 1)
+    try:
+        for port in range(5000, 5010):
+            ring.add(port)
+        for node in ring.nodes:
+            node.fix_fingers()
+        ids = sorted(node.node_id for node in ring.nodes)
+        for node in ring.nodes:
+            assert len(node.fingers) == hashing.M_BITS
+            assert [finger["node_id"] for finger in node.fingers] == [
+                ring_successor(ids, (node.node_id + 2 ** i) % hashing.RING_SIZE) for i in range(hashing.M_BITS)]
+    finally:
+        ring.close()
+
+
+def test_finger_routing_takes_fewer_hops_than_the_successors():
+    ring = LocalRing("linearizability", 1)
+    try:
+        for port in range(5000, 5010):
+            ring.add(port)
+        for i, key in enumerate(KEYS):
+            # Inserted through any node, the key lands at its owner.
+            assert ring.nodes[i % 10].insert(key, "v", None, None)["status"] == "success"
+            assert ring.copies(key) == ring.expected_copies(key, "v")
+        by_successor = query_hops(ring)  # a new node's fingers are all its successor
+        for node in ring.nodes:
+            node.fix_fingers()
+        by_finger = query_hops(ring)
+        assert max(by_finger) <= math.ceil(math.log2(len(ring.nodes))) + 1 < max(by_successor)
+        assert sum(by_finger) < sum(by_successor)
+        # A finger that left is skipped: the request still reaches the owner.
+        ring.nodes[5].depart()
+        ring.settle()
+        for i, key in enumerate(KEYS):
+            assert ring.nodes[i % 9].query(key, None, None)["value"] == "v"
+    finally:
+        ring.close()
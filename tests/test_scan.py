@@ -0,0 +1,120 @@
+import asyncio
+import contextlib
+import json
+import os
+import sys
+import threading
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+from scan import scan_nodes, scan_nodes_async
+
+NODES = [{"ip": "127.0.0.1", "port": 5000 + index, "node_id": index} for index in range(4)]
+
+
+def page(cursor, limit):
+    # An endless store: every page is full and points to the next one.
+    start = int(cursor or 0)
+    lines = [json.dumps({"key": f"k{start + offset}"}) for offset in range(limit)]
+    return lines + [json.dumps({"next_cursor": str(start + limit)})]
+
+
+class Response:
+    def __init__(self, lines, opened):
+        self.lines = lines
+        self.opened = opened
+
+    def iter_lines(self):
+        return iter(self.lines)
+
+    def __enter__(self):
+        self.opened.append(self)
+        return self
+
+    def __exit__(self, *exc):
+        self.opened.remove(self)
+
+
+class Transport:
+    def __init__(self):
+        self.opened = []
+
+    def get(self, peer, endpoint, params=None, stream=False):
+        if peer["node_id"] == 3:
+            raise ConnectionError("node down")
+        return Response(page(params.get("cursor"), params["limit"]), self.opened)
+
+
+def scan_threads():
+    return [thread for thread in threading.enumerate() if thread.name == "scan"]
+
+
+def test_failed_node_yields_an_error_record():
+    transport = Transport()
+    with contextlib.closing(scan_nodes(transport, NODES, page_size=10, buffer_size=4)) as records:
+        errors = []
+        for record in records:
+            if "error" in record:
+                errors.append(record)
+                break
+    assert errors == [{"error": "node down", "node_id": 3}]
+
+
+def test_closing_the_scan_stops_the_workers():
+    transport = Transport()
+    records = scan_nodes(transport, NODES[:3], page_size=10, buffer_size=4)
+    assert len([next(records) for _ in range(5)]) == 5
+    assert scan_threads()
+    records.close()
+    assert not scan_threads()
+    assert transport.opened == []
+
+
+class AsyncContent:
+    def __init__(self, lines):
+        self.lines = iter(lines)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        await asyncio.sleep(0)
+        line = next(self.lines, None)
+        if line is None:
+            raise StopAsyncIteration
+        return line.encode() + b"\n"
+
+
+class AsyncSession:
+    def __init__(self, opened):
+        self.opened = opened
+
+    @contextlib.asynccontextmanager
+    async def get(self, url, params=None):
+        response = type("Response", (), {"content": AsyncContent(page(params.get("cursor"), params["limit"]))})
+        self.opened.append(response)
+        try:
+            yield response
+        finally:
+            self.opened.remove(response)
+
+
+class AsyncTransport:
+    def __init__(self):
+        self.opened = []
+
+    def session(self):
+        return AsyncSession(self.opened)
+
+
+def test_closing_the_async_scan_cancels_the_tasks():
+    async def scan():
+        transport = AsyncTransport()
+        records = scan_nodes_async(transport, NODES[:3], page_size=10, buffer_size=4)
+        received = [await records.__anext__() for _ in range(5)]
+        await records.aclose()
+        pending = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+        return received, pending, transport.opened
+
+    received, pending, opened = asyncio.run(scan())
+    assert len(received) == 5
+    assert pending == [] and opened == []
@@ -0,0 +1,89 @@
+import os
+import sys
+import threading
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+import hashing
+from storage import MemoryStore, LogStore
+
+
+def test_log_replay_restores_every_operation(tmp_path):
+    path = str(tmp_path / "data_store")
+    store = LogStore(path)
+    store["a"] = "1"
+    store["b"] = "2"
+    store.append("a", "x")
+    store.append("r", "y", 3)
+    store.pop("b")
+    store.release()
+
+    recovered = LogStore(path)
+    assert sorted(recovered) == ["a", "r"]
+    assert str(recovered["a"]) == "1x"
+    value, count = recovered["r"]
+    assert (str(value), count) == ("y", 3)
+    assert "b" not in recovered
+    assert recovered.keys_in_range(0, 0) == [key for _, key in sorted((hashing.hash_key(k), k) for k in ["a", "r"])]
+
+
+def test_torn_last_record_is_ignored(tmp_path):
+    path = str(tmp_path / "data_store")
+    store = LogStore(path, snapshot_every=1000)
+    store["a"] = "1"
+    store._log.write('{"op": "set", "key": "b", "val')
+    store._log.flush()
+
+    recovered = LogStore(path)
+    assert dict(recovered) == {"a": "1"}
+
+
+def test_compaction_truncates_the_log_and_keeps_the_state(tmp_path):
+    path = str(tmp_path / "data_store")
+    store = LogStore(path, snapshot_every=5)
+    for i in range(12):
+        store[f"k{i}"] = str(i)
+    store.append("k0", "+")
+
+    assert os.path.exists(path + ".snapshot")
+    with open(path + ".log") as f:
+        assert len(f.readlines()) < 5
+
+    recovered = LogStore(path, snapshot_every=5)
+    assert len(recovered) == 12
+    assert str(recovered["k0"]) == "0+"
+
+
+def test_concurrent_writes_survive_compaction(tmp_path):
+    path = str(tmp_path / "data_store")
+    store = LogStore(path, snapshot_every=7)
+
+    def writer(name):
+        for i in range(200):
+            store[f"{name}{i}"] = str(i)
+            store.append(f"{name}{i}", "!")
+            if i % 3 == 0:
+                store.pop(f"{name}{i}")
+
+    threads = [threading.Thread(target=writer, args=(name,)) for name in "abcd"]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    expected = {key: str(value) for key, value in store.items()}
+    recovered = LogStore(path, snapshot_every=7)
+    assert {key: str(value) for key, value in recovered.items()} == expected
+
+
+def test_memory_store_index_follows_mutations():
+    store = MemoryStore({f"k{i}": i for i in range(40)})
+    del store["k1"]
+    store.pop("k2")
+    store["new"] = 1
+    everything = store.keys_in_range(0, 0)
+    assert sorted(everything) == sorted(store)
+    assert [hashing.hash_key(key) for key in everything] == sorted(hashing.hash_key(key) for key in everything)
+
+    first = store.keys_after(None, 10)
+    rest = store.keys_after((hashing.hash_key(first[-1]), first[-1]), 100)
+    assert first + rest == everything
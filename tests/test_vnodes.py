@@ -0,0 +1,68 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+from local_ring import LocalRing, wait_for
+
+# Three processes (ports), the first two with two tokens each, so that the ring successor of a token is often
+# a token of its own process: A0 < A1 < B0 < B1 < C0.
+TOKENS = [(5000, 0, 10000), (5000, 1, 20000), (5001, 0, 30000), (5001, 1, 40000), (5002, 0, 50000)]
+
+
+def vnode_ring(consistency, k_factor):
+    ring = LocalRing(consistency, k_factor)
+    for port, vnode, node_id in TOKENS:
+        ring.add(port, vnode, node_id)
+    return ring
+
+
+def node(ring, node_id):
+    return next(member for member in ring.nodes if member.node_id == node_id)
+
+
+def ports(ring, key):
+    return [node(ring, node_id).port for node_id in ring.copies(key)]
+
+
+def test_chains_skip_tokens_of_a_process_already_in_them():
+    ring = vnode_ring("linearizability", 3)
+    try:
+        keys = [f"key{i}" for i in range(40)]
+        for key in keys:
+            ring.nodes[0].insert(key, "v", None, None)
+        for key in keys:
+            assert len(ring.chain(key)) == 3
+            assert ring.copies(key) == ring.expected_copies(key, "v")
+            assert sorted(ports(ring, key)) == [5000, 5001, 5002]
+        for key in keys:
+            ring.nodes[0].delete(key)
+        assert all(ring.copies(key) == {} for key in keys)
+    finally:
+        ring.close()
+
+
+def test_replica_delete_follows_the_chain_without_its_primary():
+    # A /deleteReplicas that does not name the key's primary walks the chain the membership table gives.
+    ring = vnode_ring("linearizability", 3)
+    try:
+        key = next(key for key in (f"key{i}" for i in range(1000)) if ring.chain(key)[0] == 10000)
+        ring.nodes[0].insert(key, "v", None, None)
+        assert ring.chain(key) == [10000, 30000, 50000]
+        assert ring.copies(key) == ring.expected_copies(key, "v")
+        node(ring, 30000).deleteReplicas(key, 2)
+        assert ring.copies(key) == {10000: ("v", None)}
+    finally:
+        ring.close()
+
+
+def test_eventual_replication_skips_tokens_of_the_same_process():
+    ring = vnode_ring("eventual", 2)
+    try:
+        keys = [f"key{i}" for i in range(40)]
+        for key in keys:
+            ring.nodes[0].insert(key, "v", None, None)
+        for key in keys:
+            assert wait_for(lambda: ring.copies(key) == ring.expected_copies(key, "v"))
+            assert len(set(ports(ring, key))) == 2
+    finally:
+        ring.close()